@@ -1,14 +1,32 @@
 """
 The `phlorest` package provides functionality to curate Phlorest phylogenies.
 """
-from .dataset import Dataset
-from .cldfwriter import CLDFWriter
-from .metadata import Metadata
-from .beast import BeastFile
-from .nexuslib import NexusFile
+import importlib
+
 from . import commands
 
 __version__ = '2.0.1.dev0'
-__all__ = ['Dataset', 'Metadata', 'BeastFile', 'NexusFile', 'CLDFWriter']
+__all__ = ['Dataset', 'Metadata', 'BeastFile', 'NexusFile', 'CLDFWriter', 'TreeArchive']
+
+# The public API is imported lazily, because importing it pulls in heavy dependencies like
+# `cldfviz`, which light-weight entry points like the client in `phlorest.worker` do not need.
+_MODULES = {
+    'Dataset': 'dataset',
+    'CLDFWriter': 'cldfwriter',
+    'Metadata': 'metadata',
+    'BeastFile': 'beast',
+    'NexusFile': 'nexuslib',
+    'TreeArchive': 'archive',
+}
 
 assert commands
+
+
+def __getattr__(name):
+    if name in _MODULES:
+        return getattr(importlib.import_module(f'.{_MODULES[name]}', __name__), name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,183 @@
+"""
+Handling of node annotations in Newick, i.e. comments like `[&height=1.5,rate=0.3]` as written by
+BEAST or TreeAnnotator.
+
+Annotations are processed on Newick strings - before parsing them into `newick.Node` objects.
+"""
+import re
+from typing import Union
+from collections.abc import Generator, Iterable
+
+import newick
+import numpy as np
+
+from .nexuslib import Tree, TreeType
+
+__all__ = ['parse_annotation', 'filter_annotations', 'NodeAnnotations']
+
+# The Newick tokens relevant for assigning comments to nodes: punctuation, comments and quoted
+# labels (which may contain brackets).
+TOKEN = re.compile(r"[(),;]|\[[^\]]*]|'(?:[^']|'')*'")
+ITEM = re.compile(
+    r'\s*(?P<key>[^=,{}"]+?)\s*=\s*'
+    r'(?P<value>\{(?:[^{}]|\{[^{}]*})*}|"[^"]*"|[^,{}]*)\s*(?:,|$)')
+VALUE = re.compile(r'"[^"]*"|[^\s{},"]+')
+ANNOTATION_COMMENT = re.compile(r'\[&[^\]]*]')
+NODE_KEY = re.compile(r'\[&node=\d+]')
+
+
+def parse_annotation(comment: str) -> dict[str, Union[str, list[str]]]:
+    """
+    Parse the key-value pairs of an annotation comment.
+
+    .. code-block:: python
+
+        >>> parse_annotation('[&height=1.5,height_95%_HPD={1.2,1.8},location="A"]')
+        {'height': '1.5', 'height_95%_HPD': ['1.2', '1.8'], 'location': 'A'}
+
+    :param comment: Comment text, with or without brackets and leading `&`.
+    :return: `dict` mapping keys to values - or lists of values for sets like `{1.2,1.8}`, \
+    flattened if nested. Values are returned unconverted, i.e. as found in the Newick.
+    """
+    comment = comment.strip()
+    if comment.startswith('['):
+        comment = comment[1:-1]
+    res = {}
+    for m in ITEM.finditer(comment.lstrip('&')):
+        value = m.group('value').strip()
+        if value.startswith('{'):
+            res[m.group('key')] = [v.strip('"') for v in VALUE.findall(value)]
+        else:
+            res[m.group('key')] = value.strip('"')
+    return res
+
+
+def filter_annotations(text: str, keep: Union[Iterable[str], re.Pattern]) -> str:
+    """
+    Remove annotations from all annotation comments in Newick or Nexus content - e.g. to drop HPD
+    intervals and ranges from the trees written by TreeAnnotator - before the content is parsed.
+
+    .. code-block:: python
+
+        >>> filter_annotations('(A[&height=0,height_range={0,1}],B[&rate=1]);', {'height'})
+        '(A[&height=0],B);'
+
+    Comments which do not contain key-value pairs, like the rooting comment `[&R]`, are kept.
+
+    :param keep: Keys of the annotations to keep - or a regular expression pattern matching them.
+    """
+    matches = keep.fullmatch if isinstance(keep, re.Pattern) else set(keep).__contains__
+
+    def repl(m):
+        items = list(ITEM.finditer(m.group()[2:-1]))
+        if not items:
+            return m.group()
+        kept = [
+            f"{i.group('key')}={i.group('value').strip()}"
+            for i in items if matches(i.group('key'))]
+        return f"[&{','.join(kept)}]" if kept else ''
+
+    return ANNOTATION_COMMENT.sub(repl, text)
+
+
+class NodeAnnotations:
+    """
+    A columnar table of node annotations, extracted from Newick strings in one pass.
+
+    Annotation comments are replaced with a node key - a comment `[&node=<n>]` - which identifies
+    the row of the table holding the node's annotations. Multiple annotation comments of a node,
+    e.g. node and branch annotations `A[&height=2]:[&rate=0.3]1.0`, are merged.
+
+    Set-valued annotations like `height_95%_HPD={1.2,1.8}` are stored in columns `<key>[1]`,
+    `<key>[2]`, etc. Thus, consumers can read heights and HPD intervals from the table, without
+    parsing any Newick.
+
+    .. code-block:: python
+
+        >>> annotations = NodeAnnotations()
+        >>> annotations('(A[&height=0]:1,B[&height=0]:1)[&height=1];')
+        '(A[&node=0]:1,B[&node=1]:1)[&node=2];'
+        >>> annotations.columns
+        {'height': ['0', '0', '1']}
+    """
+    def __init__(self):
+        #: Maps column names to lists of values - one per node key, `None` where missing.
+        self.columns: dict[str, list] = {}
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def _add(self, annotations: dict) -> None:
+        for key, value in annotations.items():
+            values = value if isinstance(value, list) else [value]
+            for i, v in enumerate(values, start=1):
+                col = f'{key}[{i}]' if isinstance(value, list) else key
+                column = self.columns.setdefault(col, [])
+                column.extend([None] * (self._n - len(column)))
+                column.append(v)
+        self._n += 1
+
+    def extract(self, nwk: str) -> str:
+        """
+        Extract the annotations from a Newick string.
+
+        :return: The Newick string with annotation comments replaced with node keys.
+        """
+        chunks, pos, nodes, keyed = [], 0, [], False
+        for m in TOKEN.finditer(nwk):
+            token = m.group()
+            if token.startswith('[&'):
+                chunks.append(nwk[pos:m.start()])
+                pos = m.end()
+                if not keyed:  # The first annotation comment of a node.
+                    chunks.append(f'[&node={self._n + len(nodes)}]')
+                    nodes.append({})
+                    keyed = True
+                nodes[-1].update(parse_annotation(token))
+            elif token in '(),;':
+                keyed = False
+        chunks.append(nwk[pos:])
+        for annotations in nodes:
+            self._add(annotations)
+        return ''.join(chunks)
+
+    @staticmethod
+    def strip_comments(nwk: str) -> str:
+        """
+        Remove all comments - except node keys - from a Newick string with extracted annotations.
+        """
+        return TOKEN.sub(
+            lambda m: '' if m.group().startswith('[') and not NODE_KEY.fullmatch(m.group())
+            else m.group(),
+            nwk)
+
+    def __call__(self, tree: TreeType) -> TreeType:
+        """
+        Extract the annotations from a tree, returning the tree in the form it was passed.
+        """
+        if isinstance(tree, Tree):
+            return Tree(tree.name, self.extract(str(tree)), tree.rooted)
+        if isinstance(tree, str):
+            return self.extract(tree)
+        return newick.loads(self.extract(f'{tree.newick};'))[0]
+
+    def array(self, column: str) -> np.ndarray:
+        """
+        The values of a - numeric - column as array over node keys, with `nan` where missing.
+        """
+        values = self.columns[column]
+        return np.array(
+            [np.nan if v is None else float(v) for v in values]
+            + [np.nan] * (self._n - len(values)), dtype=np.float64)
+
+    @property
+    def header(self) -> list[str]:
+        """Column names of the table."""
+        return ['Node'] + list(self.columns)
+
+    def iter_rows(self) -> Generator[list, None, None]:
+        """Yields the rows of the table, with values in the order of `header`."""
+        columns = list(self.columns.values())
+        for i in range(self._n):
+            yield [i] + [col[i] if i < len(col) else None for col in columns]
@@ -0,0 +1,271 @@
+"""
+Random access to the trees in Nexus files written by `phlorest.NexusFile`, e.g. the posterior
+sample in `cldf/posterior.trees.zip`.
+
+.. code-block:: python
+
+    >>> from phlorest.archive import TreeArchive
+    >>> with TreeArchive('cldf/posterior.trees.zip') as trees:
+    ...     tree = trees['STATE_7345']
+    ...     sample = trees[1000:2000]
+    ...     for tree in trees:  # Read all trees sequentially.
+    ...         pass
+"""
+import re
+import pathlib
+import functools
+import itertools
+import zipfile
+from typing import Optional, Union, IO
+from collections.abc import Generator
+
+import newick
+
+from .nexuslib import Tree, PathType, index_path
+
+__all__ = ['TreeArchive', 'parse_tree_command']
+
+TREE_COMMAND = re.compile(
+    r"\s*tree\s+(?P<name>'(?:[^']|'')*'|[^\s=]+)\s*=\s*(?:\[&(?P<rooted>[RUru])]\s*)?"
+    r"(?P<newick>.+);\s*$",
+    flags=re.IGNORECASE | re.DOTALL)
+TRANSLATE_COMMAND = re.compile(r'\btranslate\s+(?P<mappings>[^;]+);', flags=re.IGNORECASE)
+TRANSLATE_MAPPING = re.compile(r"(?P<token>[^\s,]+)\s+(?P<name>'(?:[^']|'')*'|[^\s,]+)")
+LEAF_LABEL = re.compile(r"(?<=[(,])(?P<space>\s*)(?P<label>[^\s(),:;\[\]']+)")
+
+
+def _unquote(s: str) -> str:
+    return s[1:-1].replace("''", "'") if s.startswith("'") else s
+
+
+def parse_tree_command(text: str, parse: bool = True) -> Tree:
+    """
+    Parse the text of a single `TREE` command as written by `NexusFile`.
+
+    :param text: The command text, e.g. `tree STATE_1 = [&R] (A,B);`
+    :param parse: Flag signaling whether to parse the Newick string into a `newick.Node`.
+    """
+    match = TREE_COMMAND.match(text)
+    if not match:
+        raise ValueError(f'Invalid TREE command: {text[:50]}')
+    name = _unquote(match.group('name'))
+    rooted = match.group('rooted')
+    nwk = match.group('newick') + ';'
+    return Tree(
+        name,
+        newick.loads(nwk)[0] if parse else nwk,
+        None if rooted is None else rooted.upper() == 'R')
+
+
+class TreeArchive:
+    """
+    Random access to single trees or slices of trees in a (zipped) Nexus file.
+
+    If the file was written with an index (see `NexusFile(index=True)`), looking up a tree only
+    requires reading and parsing the corresponding TREE command. Otherwise, the index is computed
+    upon first access, by scanning the file line by line - without parsing any Newick.
+
+    Trees are returned with leaf labels translated according to a TRANSLATE command, if the file
+    contains one.
+
+    Zip archives which have been appended to (see `NexusFile(append=True)`) contain multiple Nexus
+    files. The trees of all of these are accessible - in the order of the archive.
+
+    .. note::
+
+        Nexus files in zip archives are deflated, i.e. can only be read sequentially. Thus, the
+        cost of a lookup is dominated by decompressing the file up to the tree - not by parsing
+        it. To make reading trees in file order cheap, the stream of each file is kept open, and
+        lookups of trees further down the file continue decompressing from the position of the
+        previous lookup. Only looking up a tree before the previous one requires decompressing
+        from the start of the file again. So, access trees in file order where possible - or
+        iterate over the archive to read all trees in one pass.
+
+        Since open streams are shared, a `TreeArchive` must not be used from multiple threads.
+    """
+    def __init__(self, path: PathType, member: Optional[str] = None):
+        """
+        :param path: Path to a Nexus file or a zip archive containing Nexus files.
+        :param member: Name of the Nexus file within the zip archive (defaults to all Nexus files \
+        in the archive).
+        """
+        self.path = pathlib.Path(path)
+        self._zip = None
+        self.members: list[Optional[str]] = [None]
+        if self.path.suffix == '.zip':
+            self._zip = zipfile.ZipFile(self.path)
+            self.members = [member] if member else [
+                name for name in self._zip.namelist() if not name.endswith('.idx')]
+        self.member = self.members[0]
+        self._index: Optional[dict[str, tuple[int, int]]] = None
+        self._member: dict[str, Optional[str]] = {}  # Maps tree names to archive members.
+        self._mappings: dict[Optional[str], dict[str, str]] = {}  # TRANSLATE mapping per member.
+        self._streams: dict[Optional[str], IO[bytes]] = {}  # Open stream per member.
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Close the underlying zip archive."""
+        for f in self._streams.values():
+            f.close()
+        self._streams = {}
+        if self._zip:
+            self._zip.close()
+
+    def _open(self, member: Optional[str] = None):
+        if self._zip:
+            return self._zip.open(member or self.member)
+        return self.path.open('rb')
+
+    def _read_index(self, member: Optional[str]) -> Optional[str]:
+        if self._zip:
+            name = index_path(member).name
+            if name in self._zip.namelist():
+                return self._zip.read(name).decode('utf8')
+        elif index_path(self.path).exists():
+            return index_path(self.path).read_text(encoding='utf8')
+        return None
+
+    @property
+    def index(self) -> dict[str, tuple[int, int]]:
+        """
+        Maps tree names to (offset, length) of the TREE command in the uncompressed Nexus file.
+        """
+        if self._index is None:
+            self._index = {}
+            for member in self.members:
+                text = self._read_index(member)
+                if text is not None:
+                    for line in text.splitlines():
+                        name, offset, length = line.split('\t')
+                        self._index[name] = (int(offset), int(length))
+                        self._member[name] = member
+                else:
+                    offset = 0
+                    with self._open(member) as f:
+                        for line in f:
+                            if line.lstrip()[:5].lower() == b'tree ':
+                                tree = parse_tree_command(line.decode('utf8'), parse=False)
+                                self._index[tree.name] = (offset, len(line))
+                                self._member[tree.name] = member
+                            offset += len(line)
+        return self._index
+
+    @functools.cached_property
+    def translate_mapping(self) -> dict[str, str]:
+        """
+        Maps tokens used as leaf labels to taxon names, according to a TRANSLATE command (in the
+        first Nexus file of the archive).
+        """
+        return self._translate_mapping(self.member)
+
+    def _translate_mapping(self, member: Optional[str]) -> dict[str, str]:
+        if member not in self._mappings:
+            self._mappings[member] = {}
+            offsets = [o for name, (o, _) in self.index.items() if self._member[name] == member]
+            if offsets:
+                # The header is read from a separate stream, to not rewind the shared one.
+                with self._open(member) as f:
+                    header = f.read(min(offsets)).decode('utf8')
+                match = TRANSLATE_COMMAND.search(header)
+                if match:
+                    self._mappings[member] = {
+                        m.group('token'): _unquote(m.group('name'))
+                        for m in TRANSLATE_MAPPING.finditer(match.group('mappings'))}
+        return self._mappings[member]
+
+    @functools.cached_property
+    def names(self) -> list[str]:
+        """The tree names in the order of the file."""
+        return list(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def _read(self, offset: int, length: int, member: Optional[str] = None) -> bytes:
+        f = self._streams.get(member)
+        if f is None or f.tell() > offset:
+            # Seeking backwards in a deflated stream means decompressing from the start anyway.
+            if f is not None:
+                f.close()
+            f = self._streams[member] = self._open(member)
+        f.seek(offset)
+        return f.read(length)
+
+    def __iter__(self) -> Generator[Tree, None, None]:
+        """
+        Yields all trees in the order of the archive, reading each Nexus file in one pass - without
+        requiring an index.
+        """
+        return self.iter_trees()
+
+    def iter_trees(self, parse: bool = True) -> Generator[Tree, None, None]:
+        """
+        Yields all trees in the order of the archive, reading each Nexus file in one pass.
+
+        :param parse: Flag signaling whether to parse the Newick strings into `newick.Node` \
+        objects. If `False`, leaf labels are translated in the Newick string - which is much \
+        cheaper, e.g. when the trees are parsed into a different structure anyway.
+        """
+        for member in self.members:
+            header, mapping = [], None
+            with self._open(member) as f:
+                for line in f:
+                    if line.lstrip()[:5].lower() == b'tree ':
+                        if mapping is None:
+                            match = TRANSLATE_COMMAND.search(b''.join(header).decode('utf8'))
+                            mapping = {
+                                m.group('token'): _unquote(m.group('name'))
+                                for m in TRANSLATE_MAPPING.finditer(match.group('mappings'))
+                            } if match else {}
+                            self._mappings.setdefault(member, mapping)
+                            # Leaf labels to substitute for tokens in the Newick string:
+                            labels = {
+                                k: newick.Node(v, auto_quote=True).name
+                                for k, v in mapping.items()}
+                        if parse:
+                            yield self._parse(line.decode('utf8'), member)
+                            continue
+                        tree = parse_tree_command(line.decode('utf8'), parse=False)
+                        if labels:
+                            tree.newick = LEAF_LABEL.sub(
+                                lambda m: m.group('space') + labels.get(  # pylint: disable=W0640
+                                    m.group('label'), m.group('label')),
+                                tree.newick)
+                        yield tree
+                    elif mapping is None:
+                        header.append(line)
+
+    def __getitem__(self, item: Union[int, str, slice]) -> Union[Tree, list[Tree]]:
+        """
+        Access trees by name, by (0-based) position or as slice of positions.
+        """
+        if isinstance(item, slice):
+            names = self.names[item]
+            if (item.step or 1) != 1:
+                return [self[name] for name in names]
+            res = []
+            # Read the consecutive TREE commands from each Nexus file in one go:
+            for member, group in itertools.groupby(names, key=lambda n: self._member[n]):
+                group = list(group)
+                offset = self.index[group[0]][0]
+                end = sum(self.index[group[-1]])
+                text = self._read(offset, end - offset, member).decode('utf8')
+                res.extend(self._parse(line, member) for line in text.splitlines() if line.strip())
+            return res
+        if isinstance(item, int):
+            item = self.names[item]
+        offset, length = self.index[item]
+        member = self._member[item]
+        return self._parse(self._read(offset, length, member).decode('utf8'), member)
+
+    def _parse(self, text: str, member: Optional[str] = None) -> Tree:
+        tree = parse_tree_command(text)
+        mapping = self._translate_mapping(member)
+        if mapping:
+            tree.newick.rename(auto_quote=True, **mapping)
+        return tree
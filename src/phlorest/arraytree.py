@@ -0,0 +1,321 @@
+"""
+Array representation of trees, to compute tree statistics with NumPy rather than by walking
+`newick.Node` objects in Python.
+"""
+import re
+import dataclasses
+from typing import Optional, Union
+from collections.abc import Iterable, Container
+
+import numpy as np
+import newick
+
+__all__ = ['ArrayTree', 'TreeStats', 'mean_patristic_distances', 'NewickArrays', 'Pruner']
+
+NEWICK_TOKEN = re.compile(
+    r"\s*(?:(?P<punctuation>[(),;])|(?P<comment>\[[^\]]*])|:\s*(?P<length>[^\s(),:;\[\]]+)"
+    r"|(?P<label>'(?:[^']|'')*'|[^\s(),:;\[\]']+))")
+COMMENT = re.compile(r"\[[^\]]*]")
+LENGTH = re.compile(r":\s*[^\s(),:;\[\]]+")
+ANNOTATION = re.compile(r"\[[^\]]*]|:\s*[^\s(),:;\[\]]+")
+
+
+@dataclasses.dataclass
+class TreeStats:
+    """Summary statistics of a tree, as stored in TreeTable."""
+    ntips: int
+    height: Optional[float] = None
+    length: Optional[float] = None
+    ultrametric: Optional[bool] = None
+
+
+class ArrayTree:
+    """
+    A tree as arrays over its nodes in preorder, i.e. with the root at index 0 and each node
+    following its parent.
+    """
+    def __init__(self, parent: np.ndarray, lengths: np.ndarray, names: list[Optional[str]]):
+        """
+        :param parent: Index of the parent node for each node, `-1` for the root.
+        :param lengths: Branch lengths, `nan` where not specified.
+        :param names: Node names (unquoted).
+        """
+        self.parent = parent
+        self.lengths = lengths
+        self.names = names
+        self.is_leaf = np.ones(len(parent), dtype=bool)
+        self.is_leaf[parent[parent >= 0]] = False
+
+    @classmethod
+    def from_newick(cls, tree: Union[str, newick.Node]) -> 'ArrayTree':
+        """Create an `ArrayTree` from a Newick string or a `newick.Node`."""
+        if isinstance(tree, str):
+            tree = newick.loads(tree)[0]
+        index, parent, lengths, names = {}, [], [], []
+        for i, node in enumerate(tree.walk()):
+            index[id(node)] = i
+            parent.append(index[id(node.ancestor)] if i else -1)
+            lengths.append(node.length if node._length else np.nan)  # pylint: disable=W0212
+            names.append(node.unquoted_name)
+        return cls(
+            np.array(parent, dtype=np.int64), np.array(lengths, dtype=np.float64), names)
+
+    def __len__(self):
+        return len(self.parent)
+
+    @property
+    def tips(self) -> np.ndarray:
+        """Indices of the tips, i.e. leaf nodes, in preorder."""
+        return np.flatnonzero(self.is_leaf)
+
+    @property
+    def has_lengths(self) -> bool:
+        """Flag signaling whether any branch length is specified."""
+        return bool(np.any(~np.isnan(self.lengths[1:])))
+
+    @property
+    def depths(self) -> np.ndarray:
+        """
+        The distance of each node from the root - computed by "pointer jumping", i.e. in
+        O(log(depth)) vectorised steps. Missing branch lengths count as 0.
+        """
+        depths = np.nan_to_num(self.lengths)
+        depths[0] = 0
+        ancestor = self.parent.copy()
+        active = ancestor >= 0
+        while active.any():
+            depths[active] += depths[ancestor[active]]
+            ancestor[active] = ancestor[ancestor[active]]
+            active = ancestor >= 0
+        return depths
+
+    def stats(self, rtol: float = 1e-5) -> TreeStats:
+        """
+        Compute summary statistics of the tree.
+
+        :param rtol: Relative tolerance - with respect to the tree height - for root-to-tip \
+        distances to be considered equal when testing for ultrametricity.
+        """
+        res = TreeStats(ntips=int(self.is_leaf.sum()))
+        if self.has_lengths:
+            tips = self.depths[self.is_leaf]
+            res.height = float(tips.max())
+            res.length = float(np.nansum(self.lengths[1:]))
+            res.ultrametric = bool(tips.max() - tips.min() <= rtol * res.height)
+        return res
+
+    def patristic_distances(self) -> tuple[list[str], np.ndarray]:
+        """
+        Compute the matrix of pairwise distances between tips along the tree.
+
+        The distance between tips `i` and `j` is `depth(i) + depth(j) - 2 * depth(lca(i, j))`.
+        In preorder, the lowest common ancestor (LCA) of two consecutive tips is the parent of
+        the node following the first tip, and the depth of the LCA of any two tips is the minimum
+        of the LCA depths of the consecutive tips between them (the Euler tour trick). Thus, each
+        row of the matrix can be computed with vectorised operations.
+
+        :return: Pair (tip names in preorder, distance matrix).
+        """
+        depths, tips = self.depths, self.tips
+        tip_depths = depths[tips]
+        lca_depths = depths[self.parent[tips[:-1] + 1]]
+        res = np.zeros((len(tips), len(tips)))
+        for i in range(len(tips) - 1):
+            res[i, i + 1:] = \
+                tip_depths[i] + tip_depths[i + 1:] - 2 * np.minimum.accumulate(lca_depths[i:])
+        return [self.names[i] for i in tips], res + res.T
+
+
+def mean_patristic_distances(trees: Iterable[ArrayTree]) -> tuple[list[str], np.ndarray]:
+    """
+    Compute the mean patristic distances over a sample of trees - e.g. a posterior - in one pass.
+
+    :return: Pair (sorted tip names, matrix of mean distances).
+    """
+    names, total, n = None, None, 0
+    for tree in trees:
+        tips, distances = tree.patristic_distances()
+        if names is None:
+            names = sorted(tips)
+            total = np.zeros((len(names), len(names)))
+        elif sorted(tips) != names:
+            raise ValueError('All trees must have the same tips')
+        order = np.argsort(tips)
+        total += distances[np.ix_(order, order)]
+        n += 1
+    if not n:
+        raise ValueError('No trees')
+    return names, total / n
+
+
+@dataclasses.dataclass
+class NewickArrays:
+    """Node data of a tree in preorder, with labels and branch lengths as found in Newick."""
+    parent: list[int]
+    labels: list[str]
+    lengths: list[Optional[str]]
+    comments: list[str]
+    #: (node index, is comment) for the comments and branch lengths in the order of the Newick.
+    annotations: list[tuple[int, bool]]
+
+    @classmethod
+    def from_newick(cls, nwk: str) -> 'NewickArrays':
+        """Tokenize a Newick string - without creating `newick.Node` objects."""
+        res = cls([-1], [''], [None], [''], [])
+        stack, current = [], 0
+        for m in NEWICK_TOKEN.finditer(nwk):
+            punctuation = m.group('punctuation')
+            if punctuation in ('(', ','):
+                if punctuation == '(':
+                    stack.append(current)
+                current = len(res.parent)
+                res.parent.append(stack[-1])
+                res.labels.append('')
+                res.lengths.append(None)
+                res.comments.append('')
+            elif punctuation == ')':
+                current = stack.pop()
+            elif punctuation == ';':
+                break
+            elif m.group('comment'):
+                res.comments[current] += m.group('comment')
+                res.annotations.append((current, True))
+            elif m.group('length'):
+                res.lengths[current] = m.group('length')
+                res.annotations.append((current, False))
+            else:
+                res.labels[current] = m.group('label')
+        return res
+
+
+class _PruningPlan:  # pylint: disable=R0903
+    """
+    The induced subtree for one topology: Which nodes to keep, how to connect them and which
+    branch lengths to sum up when collapsing unary nodes.
+    """
+    def __init__(self, tree: NewickArrays, keep: Container[str]):
+        parent, labels, n = tree.parent, tree.labels, len(tree.parent)
+        self.labels = labels
+        self.annotations = tree.annotations
+        is_leaf = [True] * n
+        for p in parent[1:]:
+            is_leaf[p] = False
+        counts = [
+            1 if leaf and (label[1:-1].replace("''", "'") if label.startswith("'") else label)
+            in keep else 0 for leaf, label in zip(is_leaf, labels)]
+        for i in range(n - 1, 0, -1):
+            counts[parent[i]] += counts[i]
+        total = counts[0]
+        if not total:
+            raise ValueError('None of the taxa to keep is in the tree')
+        kept_children = [0] * n
+        for i in range(1, n):
+            if counts[i]:
+                kept_children[parent[i]] += 1
+        kept = [bool(c) and (leaf or k > 1) for c, leaf, k in zip(counts, is_leaf, kept_children)]
+
+        # The kept node below each node on a path of unary nodes:
+        target = list(range(n))
+        for i in range(n - 1, 0, -1):
+            if counts[i] and not kept[parent[i]]:
+                target[parent[i]] = target[i]
+        # The nearest kept ancestor-or-self of each node:
+        ancestor = list(range(n))
+        for i in range(1, n):
+            if not kept[i]:
+                ancestor[i] = ancestor[parent[i]]
+
+        self.nodes = [i for i in range(n) if kept[i]]  # In preorder, i.e. the LCA comes first.
+        index = {i: j for j, i in enumerate(self.nodes)}
+        self.children = [[] for _ in self.nodes]
+        for j, i in enumerate(self.nodes[1:], start=1):
+            self.children[index[ancestor[parent[i]]]].append(j)
+        # The kept node to which the branch length of each node is added - with nodes not below
+        # the LCA of the kept taxa assigned to an additional "discard" bucket:
+        self.bucket = np.array(
+            [index[target[i]] if 0 < counts[i] < total else len(self.nodes) for i in range(n)],
+            dtype=np.int64)
+        self.single = np.bincount(self.bucket, minlength=len(self.nodes) + 1) == 1
+
+    def apply(self, lengths: list[Optional[str]], comments: list[str]) -> str:
+        """
+        Format the induced subtree as Newick string.
+
+        :param lengths: Branch lengths of the nodes of a tree with the plan's topology.
+        :param comments: Comments of the nodes of a tree with the plan's topology.
+        """
+        labels = self.labels
+        values = np.array([float(lg) if lg else np.nan for lg in lengths])
+        specified = ~np.isnan(values)
+        sums = np.bincount(self.bucket, weights=np.where(specified, values, 0))
+        nspecified = np.bincount(self.bucket, weights=specified)
+
+        def node(j):
+            i = self.nodes[j]
+            res = labels[i] + comments[i]
+            if j and self.single[j]:
+                res += f':{lengths[i]}' if lengths[i] else ''
+            elif j and nspecified[j]:
+                res += f':{float(sums[j])!r}'
+            return res
+
+        chunks, stack = [], [(0, 0)]
+        while stack:  # Serialize iteratively, to not run into recursion limits for deep trees.
+            j, k = stack.pop()
+            children = self.children[j]
+            if k < len(children):
+                chunks.append('(' if k == 0 else ',')
+                stack.append((j, k + 1))
+                stack.append((children[k], 0))
+            else:
+                chunks.append((')' if children else '') + node(j))
+        return ''.join(chunks) + ';'
+
+
+class Pruner:
+    """
+    Prunes trees to the subtree induced by a set of taxa.
+
+    Trees are tokenized into arrays rather than parsed into `newick.Node` objects, and the induced
+    subtree is computed only once per topology (i.e. per distinct tree shape and leaf labels) - as
+    in a posterior sample, topologies are typically shared by many trees. For each tree, unary
+    nodes are then collapsed by summing branch lengths with `numpy.bincount`. Pruning plans are
+    kept in a bounded LRU cache, thus samples with many distinct topologies do not exhaust memory.
+
+    .. code-block:: python
+
+        >>> prune = Pruner({'A', 'C'})
+        >>> prune('((A:1,B:1):1,C:2);')
+        '(A:2.0,C:2);'
+    """
+    def __init__(self, keep: Container[str], maxsize: int = 1024):
+        """
+        :param keep: Container of (unquoted) labels of the tips to keep.
+        :param maxsize: Maximal number of pruning plans - i.e. topologies - to cache.
+        """
+        from .nexuslib import TreeCache  # pylint: disable=C0415  # Avoid a circular import.
+
+        self.keep = keep
+        self._plans = TreeCache(maxsize=maxsize)
+
+    def __call__(self, nwk: str) -> str:
+        # Trees with the same topology and the same pattern of comments and branch lengths (but
+        # possibly different values) have the same key:
+        key = LENGTH.sub(':', COMMENT.sub('[]', nwk)) if "'" not in nwk else None
+        plan = self._plans.get(key) if key else None
+        if plan is None:
+            tree = NewickArrays.from_newick(nwk)
+            key = key or (tuple(tree.parent), tuple(tree.labels), tuple(tree.annotations))
+            plan = self._plans.get(key)
+            if plan is None:
+                plan = self._plans.set(key, _PruningPlan(tree, self.keep))
+            return plan.apply(tree.lengths, tree.comments)
+
+        # We only need to extract comments and branch lengths and assign them to nodes:
+        lengths, comments = [None] * len(plan.labels), [''] * len(plan.labels)
+        for (i, is_comment), token in zip(plan.annotations, ANNOTATION.findall(nwk)):
+            if is_comment:
+                comments[i] += token
+            else:
+                lengths[i] = token[1:].strip()
+        return plan.apply(lengths, comments)
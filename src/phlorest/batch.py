@@ -0,0 +1,143 @@
+"""
+Running `makecldf` for many phlorest datasets - e.g. to rebuild the full catalogue after a new
+Glottolog release - on a process pool.
+
+Each worker process imports the heavy dependencies and opens the Glottolog catalog only once -
+caching languoids across builds - and then builds datasets one after the other. Each dataset
+build is isolated: Failures are logged to the dataset's log file and reported, but do not affect
+other builds.
+"""
+import time
+import logging
+import pathlib
+import argparse
+import traceback
+import dataclasses
+import concurrent.futures
+from typing import Optional
+from collections.abc import Iterable
+
+from pyglottolog import Glottolog
+from cldfbench.dataset import dataset_from_module
+
+from .nexuslib import PathType
+
+__all__ = ['BuildResult', 'build_datasets', 'build_dataset', 'load_dataset', 'glottolog_catalog']
+
+# The Glottolog catalog of a worker process.
+_GLOTTOLOG: Optional[argparse.Namespace] = None
+
+
+@dataclasses.dataclass
+class BuildResult:
+    """The outcome of building one dataset."""
+    directory: str
+    dataset: Optional[str] = None
+    success: bool = False
+    seconds: float = 0.0
+    error: Optional[str] = None
+    log: Optional[str] = None
+
+
+def glottolog_catalog(path: PathType) -> argparse.Namespace:
+    """
+    A stand-in for an entered `cldfbench.catalogs.Glottolog` catalog, providing `dir` and an `api`
+    which caches `Languoid` objects - thus, repeated builds do not re-read the languoid INI files.
+
+    We only open the repository - checking out a particular version must be done beforehand,
+    because workers must not run git commands in the same clone concurrently.
+    """
+    return argparse.Namespace(dir=pathlib.Path(path), api=Glottolog(path, cache=True))
+
+
+def _init_worker(glottolog: Optional[str]):
+    global _GLOTTOLOG  # pylint: disable=W0603
+    _GLOTTOLOG = glottolog_catalog(glottolog) if glottolog else None
+
+
+def load_dataset(directory: PathType):
+    """
+    Load the dataset from the cldfbench module in `directory` - re-loading the module if it has
+    been imported before.
+    """
+    modules = sorted(pathlib.Path(directory).glob('cldfbench_*.py'))
+    if not modules:
+        raise ValueError(f'No cldfbench module in {directory}')
+    return dataset_from_module(modules[0])
+
+
+def build_dataset(
+        directory: PathType,
+        log_dir: Optional[PathType] = None,
+        handler: Optional[logging.Handler] = None,
+) -> BuildResult:
+    """
+    Run `makecldf` for the dataset in `directory`, using the Glottolog catalog of the process.
+
+    :param log_dir: Directory to write the log file `<dataset ID>.log` to.
+    :param handler: Additional log handler to pass the build's log records to.
+    """
+    directory = pathlib.Path(directory)
+    res = BuildResult(str(directory))
+    start = time.perf_counter()
+    log = logging.getLogger(f'{__name__}.{directory.name}')
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    handlers = [handler] if handler else []
+    for h in handlers:
+        log.addHandler(h)
+    try:
+        ds = load_dataset(directory)
+        res.dataset = ds.id
+        if log_dir:
+            res.log = str(pathlib.Path(log_dir) / f'{ds.id}.log')
+            handlers.append(logging.FileHandler(res.log, mode='w', encoding='utf8'))
+            handlers[-1].setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+            log.addHandler(handlers[-1])
+        ds._cmd_makecldf(  # pylint: disable=W0212
+            argparse.Namespace(log=log, glottolog=_GLOTTOLOG, dev=False))
+        res.success = True
+    except Exception as e:  # pylint: disable=W0718
+        res.error = f'{e.__class__.__name__}: {e}'
+        log.error(traceback.format_exc())
+    finally:
+        res.seconds = time.perf_counter() - start
+        for h in handlers:
+            log.removeHandler(h)
+        if log_dir and res.log:
+            handlers[-1].close()
+    return res
+
+
+def build_datasets(
+        directories: Iterable[PathType],
+        glottolog: Optional[PathType] = None,
+        workers: Optional[int] = None,
+        log_dir: Optional[PathType] = None,
+) -> Iterable[BuildResult]:
+    """
+    Build datasets concurrently, yielding results in the order in which builds finish.
+
+    :param glottolog: Path to a Glottolog clone - checked out at the desired version.
+    :param workers: Number of worker processes. If `None` or `1`, datasets are built in the \
+    current process.
+    """
+    directories = [str(d) for d in directories]
+    glottolog = str(glottolog) if glottolog else None
+    if log_dir:
+        pathlib.Path(log_dir).mkdir(parents=True, exist_ok=True)
+    if not workers or workers == 1:
+        _init_worker(glottolog)
+        for d in directories:
+            yield build_dataset(d, log_dir)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(glottolog,)) as executor:
+        futures = {executor.submit(build_dataset, d, log_dir): d for d in directories}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:  # pylint: disable=W0718
+                # The worker process died, e.g. because it ran out of memory.
+                yield BuildResult(futures[future], error=f'{e.__class__.__name__}: {e}')
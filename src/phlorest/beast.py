@@ -3,13 +3,15 @@ Functionality to extract information from BEAST files.
 """
 import typing
 import pathlib
-import collections
+import itertools
 from collections.abc import Generator
 from xml.etree import ElementTree
 
 from commonnexus import Nexus
 from commonnexus.blocks import Characters
 
+from .nexuslib import CharacterData
+
 __all__ = ['BeastFile']
 
 
@@ -31,29 +33,50 @@ class BeastFile:
         :return: A Nexus instance with a CHARACTERS block encoding the data from the BEAST file as \
         MATRIX.
         """
+        return Nexus.from_blocks(Characters.from_data(self.character_data(valid_states).matrix()))
+
+    def character_data(self, valid_states: str = '01?') -> CharacterData:
+        """
+        Read the character data used in a BEAST file, such that it can be written to a NEXUS file
+        one sequence at a time.
+
+        :param valid_states: String listing one-character state labels.
+        """
         try:  # Read the character labels.
             chars = dict(self.iter_characters())
         except (ValueError, KeyError):  # pragma: no cover
             chars = {}  # No character labels.
 
-        matrix = collections.OrderedDict()
+        sequences = self.iter_sequences(valid_states)
+        first = next(sequences, None)
+        if first is None:
+            raise ValueError('No sequences found in BEAST file')
+        return CharacterData(
+            rows=itertools.chain([first], sequences),
+            charlabels={i: chars.get(i, str(i)) for i in range(1, len(first[1]) + 1)})
 
-        def add_row(taxon, seq):
-            matrix[taxon] = collections.OrderedDict()
-            for i, state in enumerate([s for s in seq if s != ' '], start=1):
+    def iter_sequences(self, valid_states: str = '01?') -> Generator[tuple[str, str], None, None]:
+        """
+        Yield (taxon, sequence) pairs for the character data used in a BEAST file.
+
+        :param valid_states: String listing one-character state labels.
+        """
+        def clean(seq):
+            seq = seq.replace(' ', '')
+            for state in set(seq):
                 assert state in valid_states, f'Invalid State {state}'
-                matrix[taxon][chars.get(i, str(i))] = None if state == '?' else state
+            return seq
 
+        found = False
         for seq in self.xml.findall('./data/sequence'):
-            add_row(seq.get('taxon'), seq.get('value'))
+            found = True
+            yield seq.get('taxon'), clean(seq.get('value'))
 
-        if not matrix:
+        if not found:
             for seq in self.xml.findall('.//sequence[taxon]'):
                 data = (seq.text.strip() if seq.text else None) or seq.find('taxon').tail.strip()
                 assert data, ElementTree.tostring(seq).decode('utf8').replace('\n', '')
-                add_row(seq.find('taxon').attrib['idref'], data)
-
-        return Nexus.from_blocks(Characters.from_data(matrix))
+                yield seq.find('taxon').attrib['idref'], clean(data)
 
     def iter_characters(self) -> Generator[tuple[int, str], None, None]:
         """Yield (position, label) pairs for the characters described in the BEAST file."""
@@ -0,0 +1,167 @@
+"""
+A persistent, content-addressed cache for the results of running external tools like
+`treeannotator` or `Rscript` - or of expensive computations like normalising NEXUS.
+
+.. code-block:: python
+
+    >>> from phlorest.cache import ResultCache, tool_version
+    >>> cache = ResultCache()
+    >>> key = cache.key('Rscript', tool_version('Rscript'), script)
+    >>> res = cache.get(key)
+    >>> if res is None:
+    ...     res = cache.set(key, run_script(script))
+"""
+import os
+import pickle
+import shutil
+import hashlib
+import pathlib
+import tempfile
+import threading
+import collections
+from typing import Optional, Union, Any
+
+import platformdirs
+
+from .nexuslib import PathType
+
+__all__ = ['ResultCache', 'MemoryCache', 'tool_version']
+
+
+def tool_version(cmd: str) -> str:
+    """
+    A cheap proxy for the version of an external tool - without starting it: The resolved path,
+    size and modification time of the executable.
+    """
+    path = shutil.which(cmd) or cmd
+    try:
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+    except OSError:
+        return cmd
+    return f'{path}:{stat.st_size}:{stat.st_mtime_ns}'
+
+
+class ResultCache:
+    """
+    Results - i.e. text - stored in files named by the SHA-256 hash of everything the result depends
+    on, i.e. input content, command line and tool version.
+
+    If the total size of the cache exceeds `max_size` bytes, the least recently used results are
+    evicted.
+
+    .. warning::
+
+        Cached results are trusted: Some of them - e.g. normalised `Nexus` objects - are pickles,
+        which are loaded without further checks. So the cache directory must not be writable by
+        anyone untrusted.
+    """
+    def __init__(self, path: Optional[PathType] = None, max_size: int = 2 ** 30):
+        """
+        :param path: Cache directory - defaults to `phlorest` in the user cache directory of CLDF \
+        tools, e.g. `~/.cache/cldf/phlorest`.
+        :param max_size: Maximal total size of cached results in bytes.
+        """
+        self.path = pathlib.Path(path) if path else \
+            pathlib.Path(platformdirs.user_cache_dir('cldf')) / 'phlorest'
+        self.max_size = max_size
+
+    @staticmethod
+    def key(*parts: Union[str, bytes, pathlib.Path, None]) -> str:
+        """
+        Compute the cache key for a result depending on `parts`. For `pathlib.Path` objects, the
+        content of the file is hashed.
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, pathlib.Path):
+                with part.open('rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b''):  # pylint: disable=W0640
+                        digest.update(chunk)
+            elif part is not None:
+                digest.update(part if isinstance(part, bytes) else part.encode('utf8'))
+            digest.update(b'\0')  # Separate the parts, to make keys unambiguous.
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self.path / key[:2] / key
+
+    def get(self, key: str, binary: bool = False) -> Optional[Union[str, bytes]]:
+        """
+        Look up a result, marking it as recently used.
+
+        :param binary: Flag signaling whether the result was stored as `bytes`.
+        """
+        p = self._path(key)
+        try:
+            res = p.read_bytes() if binary else p.read_text(encoding='utf8')
+        except FileNotFoundError:
+            return None
+        os.utime(p)
+        return res
+
+    def set(self, key: str, result: Union[str, bytes]) -> Union[str, bytes]:
+        """Store a result - atomically, thus concurrent writers cannot corrupt the cache."""
+        p = self._path(key)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=p.parent, prefix='.')
+        binary = isinstance(result, bytes)
+        with os.fdopen(fd, 'wb' if binary else 'w', encoding=None if binary else 'utf8') as f:
+            f.write(result)
+        os.replace(tmp, p)
+        self.evict()
+        return result
+
+    def evict(self):
+        """Remove the least recently used results until the cache fits into `max_size`."""
+        entries = []
+        for p in self.path.glob('*/*'):
+            if not p.name.startswith('.'):
+                stat = p.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, p))
+        size = sum(e[1] for e in entries)
+        for _, fsize, p in sorted(entries, key=lambda e: e[0]):
+            if size <= self.max_size:
+                break
+            p.unlink(missing_ok=True)
+            size -= fsize
+
+
+class MemoryCache:
+    """
+    An in-process LRU cache of Python objects, stored pickled - thus, each lookup returns a fresh
+    copy, which callers may modify without affecting the cache. Unpickling is considerably faster
+    than parsing, e.g. Newick or Nexus.
+
+    If the total size of the pickled objects exceeds `max_size` bytes, the least recently used
+    objects are evicted.
+    """
+    def __init__(self, max_size: int = 2 ** 30):
+        self.max_size = max_size
+        self.size = 0
+        self._items: collections.OrderedDict[str, bytes] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Look up an object, marking it as recently used."""
+        with self._lock:
+            data = self._items.get(key)
+            if data is None:
+                return None
+            self._items.move_to_end(key)
+        return pickle.loads(data)
+
+    def set(self, key: str, obj: Any) -> Any:
+        """Store an object."""
+        data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            if key in self._items:
+                self.size -= len(self._items.pop(key))
+            self._items[key] = data
+            self.size += len(data)
+            while self.size > self.max_size and self._items:
+                self.size -= len(self._items.popitem(last=False)[1])
+        return obj
@@ -10,12 +10,17 @@ from pycldf import Dataset as CLDFDataset
 from cldfbench.dataset import dataset_from_module
 
 from phlorest import Dataset, Metadata
+from phlorest.concepticon import ConcepticonIndex
 
 # values in metadata.json that should be present and should not be empty
 METAKEYS = [f.name for f in dataclasses.fields(Metadata) if f.metadata.get('required')]
 
 
-def run_checks(d: typing.Union[CLDFDataset, Dataset], log: logging.Logger) -> bool:
+def run_checks(
+        d: typing.Union[CLDFDataset, Dataset],
+        log: logging.Logger,
+        concepticon: typing.Optional[ConcepticonIndex] = None,
+) -> bool:
     """
     Run a couple of Phlorest-specific checks on a dataset.
 
@@ -27,6 +32,8 @@ def run_checks(d: typing.Union[CLDFDataset, Dataset], log: logging.Logger) -> bo
             from phlorest.check import run_checks
             assert run_checks(cldf_dataset, cldf_logger)
 
+    :param concepticon: If a `ConcepticonIndex` is passed, `Concepticon_ID` values in \
+    characters.csv are checked against Concepticon.
     :return: `True` if all checks passed, `False` otherwise.
     """
     if isinstance(d, CLDFDataset):
@@ -78,6 +85,12 @@ def run_checks(d: typing.Union[CLDFDataset, Dataset], log: logging.Logger) -> bo
             all(char.get('Concepticon_ID', "") == "" for char in d.characters),
             "characters.csv file missing concepticon coding")
 
+    if concepticon is not None:
+        invalid = [
+            char['Concepticon_ID'] for char in d.characters
+            if char.get('Concepticon_ID') and not concepticon.gloss(char['Concepticon_ID'])]
+        success &= check(invalid, f"characters.csv has invalid Concepticon IDs: {invalid}")
+
     # check that we have the same number of entries in ./etc/characters.csv and
     # ./cldf/parameters.csv
     if d.characters:
@@ -1,13 +1,19 @@
 """
 Enhanced cldfbench.CLDFWriter
 """
+import io
+import csv
 import logging
 import pathlib
+import zipfile
+import functools
+import concurrent.futures
 from typing import Optional, Union, Any
-from collections.abc import Iterable, Container
+from collections.abc import Iterable, Container, Sized, Sequence
 
 import cldfbench
 import tqdm
+import numpy as np
 from pycldf.terms import TERMS
 from pycldf.dataset import TableType
 from commonnexus import Nexus
@@ -17,8 +23,26 @@ from commonnexus.blocks.characters import Characters
 from pyglottolog import Glottolog
 
 from .beast import BeastFile
+from .annotations import NodeAnnotations
+from .arraytree import ArrayTree, mean_patristic_distances
 from .metadata import Metadata
-from .nexuslib import NexusFile, norm_taxon_name, TreeType
+from .nexuslib import (
+    NexusFile, norm_taxon_name, TreeType, SpillList, CharacterData, rf_distances,
+    sampled_rf_distances, write_if_changed, zip_info,
+)
+
+TREE_TABLE_KEYS = (
+    'ID', 'Name', 'Media_ID', 'Tree_Is_Rooted', 'Tree_Type', 'Description',
+    'Tree_Branch_Length_Unit', 'Source', 'Number_Of_Tips', 'Tree_Height', 'Tree_Length',
+    'Tree_Is_Ultrametric')
+
+
+@functools.lru_cache(maxsize=None)
+def column_name(key: str) -> str:
+    """
+    The name of the column for values stored under `key`, which may be a CLDF term.
+    """
+    return TERMS[key].to_column().name if key in TERMS else key
 
 
 class CLDFWriter(cldfbench.CLDFWriter):
@@ -28,12 +52,26 @@ class CLDFWriter(cldfbench.CLDFWriter):
     summary: NexusFile
     posterior: NexusFile
     _lids: set
+    #: Maximal number of bytes of posterior trees - and of TreeTable rows - to keep in memory. \
+    #: Defaults to the `memory_budget` attribute of the dataset. See `phlorest.NexusFile` for \
+    #: what the budget does not cover.
+    memory_budget: Optional[int] = None
+    #: Flag signaling whether to write the Nexus files and the CSV files concurrently upon exit. \
+    #: Defaults to the `concurrent_exit` attribute of the dataset.
+    concurrent_exit: bool = False
 
     def __enter__(self):
         self._lids = set()
+        self.memory_budget = self.memory_budget or getattr(self.dataset, 'memory_budget', None)
+        self.concurrent_exit = \
+            self.concurrent_exit or getattr(self.dataset, 'concurrent_exit', False)
         self.summary: NexusFile = NexusFile(self.cldf_spec.dir / 'summary.trees')
         self.summary.__enter__()
-        self.posterior: NexusFile = NexusFile(self.cldf_spec.dir / 'posterior.trees', zipped=True)
+        self.posterior: NexusFile = NexusFile(
+            self.cldf_spec.dir / 'posterior.trees',
+            zipped=True,
+            index=True,
+            memory_budget=self.memory_budget)
         self.posterior.__enter__()
         res = cldfbench.CLDFWriter.__enter__(self)
         self.add_schema()
@@ -61,9 +99,22 @@ class CLDFWriter(cldfbench.CLDFWriter):
                     }
                 )
 
-        self.summary.__exit__(*args)
-        self.posterior.__exit__(*args)
-        return cldfbench.CLDFWriter.__exit__(self, *args)
+        outputs = [
+            functools.partial(self.summary.__exit__, *args),
+            functools.partial(self.posterior.__exit__, *args),
+            functools.partial(cldfbench.CLDFWriter.__exit__, self, *args),
+        ]
+        try:
+            if self.concurrent_exit:
+                # The outputs are independent, and compressing the posterior sample - with zlib
+                # releasing the GIL - as well as writing files can overlap.
+                with concurrent.futures.ThreadPoolExecutor(len(outputs)) as executor:
+                    futures = [executor.submit(output) for output in outputs]
+                return [future.result() for future in futures][-1]
+            return [output() for output in outputs][-1]
+        finally:
+            if isinstance(self.objects.get('TreeTable'), SpillList):
+                self.objects['TreeTable'].close()
 
     def add_schema(self):
         """Add phlorest-specifies."""
@@ -83,7 +134,33 @@ class CLDFWriter(cldfbench.CLDFWriter):
         t.common_props['dc:description'] = \
             "The LanguageTable lists the taxa, i.e. the leafs of the phylogeny, mapped to " \
             "languoids."
-        self.cldf.add_component('TreeTable')
+        self.cldf.add_component(
+            'TreeTable',
+            {
+                'name': 'Number_Of_Tips',
+                'datatype': 'integer',
+                'dc:description': 'Number of tips, i.e. leaf nodes, of the tree.',
+            },
+            {
+                'name': 'Tree_Height',
+                'datatype': 'decimal',
+                'dc:description':
+                    'Maximal distance between root and a tip, in units of '
+                    'Tree_Branch_Length_Unit (if the tree has branch lengths).',
+            },
+            {
+                'name': 'Tree_Length',
+                'datatype': 'decimal',
+                'dc:description': 'Sum of the branch lengths (if the tree has branch lengths).',
+            },
+            {
+                'name': 'Tree_Is_Ultrametric',
+                'datatype': 'boolean',
+                'dc:description':
+                    'Flag signaling whether all tips are at the same distance from the root (if '
+                    'the tree has branch lengths).',
+            },
+        )
         self.cldf.add_component('MediaTable')
 
     def add_columns(
@@ -122,12 +199,46 @@ class CLDFWriter(cldfbench.CLDFWriter):
         """
         rename = rename or {}
         for k, v in (row or {}).items():
-            k = rename.get(k, k)
-            if k in TERMS:
-                k = TERMS[k].to_column().name
-            d[k] = v
+            d[column_name(rename.get(k, k))] = v
         self.objects[table].append(d)
 
+    def add_rows(
+            self,
+            table: str,
+            keys: Sequence[str],
+            rows: Iterable[Sequence[Any]],
+            rename: Optional[dict[str, str]] = None,
+    ) -> int:
+        """
+        Add rows to table `table` in bulk.
+
+        Other than with `add_obj`, column names are resolved - i.e. keys renamed and CLDF terms
+        mapped to column names - only once, for all rows.
+
+        :param keys: The keys for the values in each row. Later keys override earlier ones when \
+        resolving to the same column name.
+        :param rows: Rows specified as sequences of values in the order of `keys`.
+        :return: The number of rows added.
+        """
+        rename = rename or {}
+        columns = [column_name(rename.get(k, k)) for k in keys]
+        objects, n = self.objects[table], 0
+        for n, row in enumerate(rows, start=1):
+            objects.append(dict(zip(columns, row)))
+        return n
+
+    def add_batch(
+            self,
+            table: str,
+            columns: dict[str, Sequence[Any]],
+            rename: Optional[dict[str, str]] = None,
+    ) -> int:
+        """
+        Add rows to table `table` in bulk, specified in columnar form, i.e. as `dict` mapping keys
+        to equal-length sequences of values.
+        """
+        return self.add_rows(table, list(columns), zip(*columns.values()), rename=rename)
+
     def add_tree(  # pylint: disable=R0913,R0917
             self,
             tree: TreeType,
@@ -140,33 +251,42 @@ class CLDFWriter(cldfbench.CLDFWriter):
             rooted: Optional[bool] = None,
     ):
         """Add a tree to a NexusFile and record it in MediaTable and TreeTable."""
-        nex.append(tree, tid, self._lids, metadata.scaling, log, rooted=rooted)
+        stats = nex.append(tree, tid, self._lids, metadata.scaling, log, rooted=rooted)
         if source is None:
             bibkeys = list(self.cldf.sources.keys())
             if len(bibkeys) == 1:
                 source = bibkeys[0]
 
-        # Add media file only if necessary!
-        mids = [m['ID'] for m in self.objects['MediaTable']]
-        if nex.path.stem not in mids:
-            is_summary = nex.path.stem == 'summary'
+        mid = self._add_media(nex, nex.member)
+
+        if self.memory_budget and 'TreeTable' not in self.objects:
+            self.objects['TreeTable'] = SpillList(self.memory_budget)
+        self.add_rows('TreeTable', TREE_TABLE_KEYS, [(
+            tid,
+            tid,
+            mid,
+            rooted,
+            type_,
+            metadata.analysis,
+            None if nex.scaling in {'none', 'arbitrary'} else nex.scaling,
+            [source] if isinstance(source, str) else source,
+            stats.ntips,
+            stats.height,
+            stats.length,
+            stats.ultrametric,
+        )])
+
+    def _add_media(self, nex: NexusFile, member: str) -> str:
+        """Add a MediaTable row for a Nexus file - only if necessary! - returning its ID."""
+        mid = pathlib.Path(member).stem
+        if mid not in [m['ID'] for m in self.objects['MediaTable']]:
             self.objects['MediaTable'].append(dict(  # pylint: disable=R1735
-                ID=nex.path.stem,
+                ID=mid,
                 Media_Type='text/plain',
-                Download_URL=f"file:///{nex.path.name}{'' if is_summary else '.zip'}",
-                Path_In_Zip=None if is_summary else 'posterior.trees',
+                Download_URL=f"file:///{nex.archive.name if nex.zipped else member}",
+                Path_In_Zip=member if nex.zipped else None,
             ))
-
-        self.objects['TreeTable'].append(dict(  # pylint: disable=R1735
-            ID=tid,
-            Name=tid,
-            Media_ID=nex.path.stem,
-            Tree_Is_Rooted=rooted,
-            Tree_Type=type_,
-            Description=metadata.analysis,
-            Tree_Branch_Length_Unit=None if nex.scaling in {'none', 'arbitrary'} else nex.scaling,
-            Source=[source] if isinstance(source, str) else source,
-        ))
+        return mid
 
     def add_summary(
             self,
@@ -175,30 +295,65 @@ class CLDFWriter(cldfbench.CLDFWriter):
             log: logging.Logger,
             source: Optional[str] = None,
             rooted: Optional[bool] = None,
+            annotations: Union[bool, NodeAnnotations] = False,
     ):
         """
         Add `tree` as summary tree to the dataset.
+
+        :param annotations: Flag signaling whether to extract node annotations - e.g. heights \
+        and HPD intervals as computed by TreeAnnotator - from `tree` into a zipped CSV file \
+        `summary_annotations.csv.zip`, registered in MediaTable, leaving only node keys in the \
+        Newick. Alternatively, a `NodeAnnotations` table holding the annotations extracted when \
+        reading the tree (see `PhlorestDir.read_trees`) can be passed.
         """
+        if annotations is True:
+            annotations = NodeAnnotations()
+            tree = annotations(tree)
         self.add_tree(
             tree, self.summary, 'summary', metadata, log, 'summary', source=source, rooted=rooted)
         log.info("added summary tree")
+        if annotations:
+            self._add_zipped_csv(
+                'summary_annotations',
+                annotations.iter_rows(),
+                annotations.header,
+                'Node annotations of the summary tree. The Node column corresponds to the node '
+                'keys, given as comments [&node=<Node>] in the Newick representation of the tree.')
+            log.info("added summary tree annotations (n=%d)", len(annotations))
 
     def add_posterior(  # pylint: disable=R0913,R0917
             self,
-            trees: list[TreeType],
+            trees: Iterable[TreeType],
             metadata: Metadata,
             log: logging.Logger,
             source: Optional[str] = None,
             verbose: bool = False,
             rooted: Optional[bool] = None,
+            translate: bool = False,
+            append: bool = False,
     ):
         """
         Add `trees` as posterior sample of trees to the dataset.
+
+        :param translate: Flag signaling whether to write the trees with a TRANSLATE command, \
+        using integer tokens as leaf labels.
+        :param append: Flag signaling whether to add `trees` to the posterior sample in an \
+        existing `posterior.trees.zip` - continuing the `STATE_<n>` numbering - rather than \
+        replacing it. This requires a writer which does not clean the CLDF directory; the \
+        TreeTable rows of the existing trees are read from the existing `trees.csv`. A \
+        `ValueError` is raised if there is no such archive or `trees.csv`.
         """
-        i = 0
+        if append:
+            self._append_posterior()
+        if translate:
+            self.posterior.translate = True
+        start = self.posterior.archived + 1
+        i = start - 1
         for i, tree in (
-                tqdm.tqdm(enumerate(trees, start=1), total=len(trees))
-                if verbose else enumerate(trees, start=1)):
+                tqdm.tqdm(
+                    enumerate(trees, start=start),
+                    total=len(trees) if isinstance(trees, Sized) else None)
+                if verbose else enumerate(trees, start=start)):
             self.add_tree(
                 tree,
                 self.posterior,
@@ -209,11 +364,146 @@ class CLDFWriter(cldfbench.CLDFWriter):
                 'sample',
                 source=source,
                 rooted=rooted)
-        log.info("added posterior trees (n=%d)", i)
+        log.info("added posterior trees (n=%d)", i - start + 1)
+        log.info("posterior tree processing: %s", self.posterior.cache)
+
+    def _append_posterior(self):
+        """
+        Switch to appending to an existing posterior sample, carrying over MediaTable and
+        TreeTable rows for the trees in the archive.
+        """
+        if len(self.posterior):
+            raise ValueError('Posterior trees have already been added.')
+        self.posterior.__exit__(None, None, None)
+        self.posterior = NexusFile(
+            self.posterior.path,
+            zipped=True,
+            index=True,
+            memory_budget=self.memory_budget,
+            append=True)
+        self.posterior.__enter__()
+        mids = {self._add_media(self.posterior, member) for member in self.posterior.members}
+        table = self.cldf['TreeTable']
+        if not self.cldf_spec.dir.joinpath(str(table.url)).exists():
+            raise ValueError(f'No {table.url} to read the TreeTable rows of the archive from')
+        if self.memory_budget and 'TreeTable' not in self.objects:
+            self.objects['TreeTable'] = SpillList(self.memory_budget)
+        n = self.add_rows('TreeTable', TREE_TABLE_KEYS, (
+            [row.get(column_name(key)) for key in TREE_TABLE_KEYS]
+            for row in table.iterdicts() if row[column_name('Media_ID')] in mids))
+        if n != self.posterior.archived:
+            raise ValueError(
+                f'{table.url} does not list the {self.posterior.archived} trees in the archive')
+
+    def add_distances(self, log: logging.Logger, posterior: bool = False):
+        """
+        Add the matrix of patristic distances between the tips of the summary tree - and
+        optionally the mean distances over the posterior sample - as zipped CSV files, registered
+        in MediaTable.
+
+        Must be called after the trees have been added.
+
+        :param posterior: Flag signaling whether to compute mean distances over the posterior.
+        """
+        def iter_trees(nex):
+            mapping = nex.translate_mapping
+            for tree in nex:
+                tree = ArrayTree.from_newick(tree.newick)
+                if mapping:
+                    tree.names = [mapping.get(n, n) for n in tree.names]
+                yield tree
+
+        trees = iter_trees(self.summary)
+        summary = next(trees, None)
+        if summary:
+            names, matrix = summary.patristic_distances()
+            order = sorted(range(len(names)), key=lambda i: names[i])
+            self._add_distances(
+                'summary_distances', [names[i] for i in order], matrix[np.ix_(order, order)])
+            log.info("added patristic distances for summary tree")
+        else:
+            log.warning('No summary tree to compute patristic distances from')
+        if posterior:
+            self._add_distances(
+                'posterior_distances', *mean_patristic_distances(iter_trees(self.posterior)))
+            log.info("added mean patristic distances for posterior trees")
+
+    def _add_distances(self, mid: str, names: list[str], matrix: np.ndarray):
+        self._add_zipped_csv(
+            mid,
+            ((name, *[f'{d:.10g}' for d in row]) for name, row in zip(names, matrix)),
+            header=[''] + names,
+            description='Matrix of patristic distances between taxa, i.e. sums of the branch '
+                        'lengths on the paths connecting taxa in the tree.')
+
+    def add_rf_distances(
+            self,
+            log: logging.Logger,
+            sample: int = 1000,
+            seed: int = 1,
+            processes: Optional[int] = None,
+    ):
+        """
+        Add (weighted) Robinson-Foulds distances between each posterior tree and the summary tree
+        - and between a random sample of pairs of posterior trees - as zipped CSV file, registered
+        in MediaTable.
+
+        Must be called after the trees have been added.
+
+        :param sample: Number of pairs of posterior trees to compare.
+        :param processes: Number of worker processes to use for comparing trees with the summary.
+        """
+        summary = next(iter(self.summary), None)
+        if not (summary and len(self.posterior)):
+            log.warning('Need summary and posterior trees to compute RF distances')
+            return
+        taxa = {lid: i for i, lid in enumerate(r['ID'] for r in self.objects['LanguageTable'])}
+        # In translate mode, the leaf labels of the posterior trees are TRANSLATE tokens - which
+        # must not be confused with taxon IDs, e.g. if these are numbers, too.
+        tokens = {
+            token: taxa[name] for token, name in self.posterior.translate_mapping.items()
+            if name in taxa} if self.posterior.translate else taxa
+        rows = []
+        for tree, (rf, wrf) in zip(
+                self.posterior,
+                rf_distances(
+                    summary, self.posterior, taxa, processes=processes, tree_taxa=tokens)):
+            rows.append((summary.name, tree.name, rf, f'{wrf:.10g}'))
+        log.info(
+            "RF distances to summary tree: mean=%.2f max=%d",
+            sum(r[2] for r in rows) / len(rows), max(r[2] for r in rows))
+        # Read the posterior trees in one pass again - rather than keeping them all in memory:
+        names = [row[1] for row in rows]
+        for i, j, rf, wrf in sampled_rf_distances(
+                iter(self.posterior), tokens, n=sample, seed=seed, ntrees=len(names)):
+            rows.append((names[i], names[j], rf, f'{wrf:.10g}'))
+        self._add_zipped_csv(
+            'rf_distances',
+            rows,
+            header=['Tree_1', 'Tree_2', 'RF_Distance', 'Weighted_RF_Distance'],
+            description='Robinson-Foulds distances - i.e. number of splits not shared - and '
+                        'weighted Robinson-Foulds distances between posterior trees and the '
+                        'summary tree and between a sample of pairs of posterior trees.')
+
+    def _add_zipped_csv(self, mid: str, rows: Iterable, header: list[str], description: str):
+        with write_if_changed(self.cldf_spec.dir / f'{mid}.csv.zip') as archive:
+            with zipfile.ZipFile(archive, 'w') as zf:
+                with zf.open(zip_info(f'{mid}.csv'), 'w') as f:
+                    with io.TextIOWrapper(f, encoding='utf8', newline='') as stream:
+                        writer = csv.writer(stream)
+                        writer.writerow(header)
+                        writer.writerows(rows)
+        self.add_obj('MediaTable', {
+            'ID': mid,
+            'Media_Type': 'text/csv',
+            'Download_URL': f'file:///{mid}.csv.zip',
+            'Path_In_Zip': f'{mid}.csv',
+            'Description': description,
+        })
 
     def add_data(
             self,
-            input_: Union[BeastFile, pathlib.Path, str, Nexus],
+            input_: Union[BeastFile, pathlib.Path, str, Nexus, CharacterData],
             characters: Iterable[dict[str, str]],
             log,
             binarise: bool = False,
@@ -221,20 +511,28 @@ class CLDFWriter(cldfbench.CLDFWriter):
         """
         Add character data from which the tree(s) in the dataset were computed.
 
-        :param input_: Character data can be read from BEAST files and NEXUS files.
+        :param input_: Character data can be read from BEAST files and NEXUS files - or passed \
+        as `CharacterData`, e.g. with compact rows of one-character states. Unless the NEXUS \
+        content contains more than just the character data, `data.nex` is written row by row.
         :param characters: Character metadata, per site.
         :param log:
         """
-        if isinstance(input_, BeastFile):
-            nex = input_.nexus()
-        elif isinstance(input_, pathlib.Path):
-            nex = Nexus.from_file(input_)
-        elif isinstance(input_, str):
-            nex = Nexus(input_)
+        nex, data = None, None
+        if isinstance(input_, CharacterData):
+            data = input_
+        elif isinstance(input_, BeastFile):
+            data = input_.character_data()
         else:
-            nex = input_
-        assert isinstance(nex, Nexus)
-        charlabels, _ = nex.characters.get_charstatelabels()
+            if isinstance(input_, pathlib.Path):
+                nex = Nexus.from_file(input_)
+            elif isinstance(input_, str):
+                nex = Nexus(input_)
+            else:
+                nex = input_
+            assert isinstance(nex, Nexus)
+            # If possible, we write the normalised data row by row:
+            data = CharacterData.from_nexus(nex)
+        charlabels = data.charlabels if data else nex.characters.get_charstatelabels()[0]
 
         md = {int(row.pop('Site')): row for row in characters}
         t = self.cldf.add_component(
@@ -256,22 +554,38 @@ class CLDFWriter(cldfbench.CLDFWriter):
                 'ParameterTable', list(md.values())[0], log, exclude=['Label'])
         self.cldf['ParameterTable', 'ID'].common_props['dc:description'] = \
             "Sequence index of the site in the corresponding Nexus file."
-        for site, label in charlabels.items():
-            d = {'ID': site, 'Name': label, 'Nexus_File': 'data'}
-            self.add_obj('ParameterTable', d, md.get(site, {}), rename={'Label': 'Name'})
+        mdkeys = [k for k in (list(md.values())[0] if md else {}) if k != 'Label']
+        self.add_rows(
+            'ParameterTable',
+            ['ID', 'Name', 'Nexus_File'] + mdkeys,
+            ((site, md.get(site, {}).get('Label', label), 'data',
+              *[md.get(site, {}).get(k) for k in mdkeys]) for site, label in charlabels.items()))
         self.add_obj(
             'MediaTable',
             {'ID': 'data', 'Media_Type': 'text/plain', 'Download_URL': 'file:///data.nex'})
 
         if binarise:
-            _, statelabels = nex.characters.get_charstatelabels()
-            new = CharacterMatrix.binarised(nex.characters.get_matrix(), statelabels=statelabels)
-            nex.replace_block(nex.characters, Characters.from_data(new))
-
-        nex = normalise(nex, rename_taxa=lambda t: t.replace('-', '_'))
-        assert all(t in self._lids for t in nex.taxa), \
-            f"Taxa in nexus not in taxa.csv: {[t for t in nex.taxa if t not in self._lids]}"
-        nex.to_file(self.cldf_spec.dir / 'data.nex')
+            if data:
+                matrix, statelabels = data.matrix(), data.statelabels
+            else:
+                matrix = nex.characters.get_matrix()
+                _, statelabels = nex.characters.get_charstatelabels()
+            new = Characters.from_data(CharacterMatrix.binarised(matrix, statelabels=statelabels))
+            if data:
+                data = CharacterData.from_nexus(Nexus.from_blocks(new))
+            else:
+                nex.replace_block(nex.characters, new)
+
+        if data:
+            data.write(
+                self.cldf_spec.dir / 'data.nex', rename_taxa=norm_taxon_name, taxa=self._lids)
+        else:
+            nex = normalise(nex, rename_taxa=lambda t: t.replace('-', '_'))
+            assert all(t in self._lids for t in nex.taxa), \
+                f"Taxa in nexus not in taxa.csv: {[t for t in nex.taxa if t not in self._lids]}"
+            text = str(nex)
+            with write_if_changed(self.cldf_spec.dir / 'data.nex') as f:
+                f.write((text if text.endswith('\n') else text + '\n').encode(nex.cfg.encoding))
         self.cldf.add_provenance(
             wasDerivedFrom={
                 "rdf:about": "data.nex",
@@ -293,32 +607,38 @@ class CLDFWriter(cldfbench.CLDFWriter):
         #
         # log warnings if taxa are mapped to bookkeeping languoids!?
         #
-        for i, row in enumerate(taxa):
-            if i == 0:
-                self.add_columns(
-                    'LanguageTable',
-                    row,
-                    log,
-                    exclude=['taxon', 'glottocode', 'soc_ids', 'xd_ids'])
-                self.cldf.add_columns('LanguageTable', 'Glottolog_Name')
-            lid = norm_taxon_name(row['taxon'])
-            self._lids.add(lid)
-            glang = None
-            if row['glottocode']:
-                try:
-                    glang = glangs[row['glottocode']]
-                except KeyError:  # pragma: no cover
-                    log.error('Invalid glottocode in taxa.csv: %s', row['glottocode'])
-            d = dict(  # pylint: disable=R1735
-                ID=lid,
-                Name=row['taxon'],
-                Glottocode=row['glottocode'] or None,
-                Glottolog_Name=glang.name if glang else None,
-                Latitude=glang.latitude if glang else None,
-                Longitude=glang.longitude if glang else None,
-                xd_ids=[x.strip() for x in (row.get('xd_ids') or '').split(',') if x.strip()],
-            )
-            if 'xd_ids' in row:
-                del row['xd_ids']
-            self.add_obj('LanguageTable', d, row)
+        if taxa:
+            self.add_columns(
+                'LanguageTable',
+                taxa[0],
+                log,
+                exclude=['taxon', 'glottocode', 'soc_ids', 'xd_ids'])
+            self.cldf.add_columns('LanguageTable', 'Glottolog_Name')
+        keys = [k for k in (taxa[0] if taxa else {}) if k != 'xd_ids']
+
+        def iter_rows():
+            for row in taxa:
+                lid = norm_taxon_name(row['taxon'])
+                self._lids.add(lid)
+                glang = None
+                if row['glottocode']:
+                    try:
+                        glang = glangs[row['glottocode']]
+                    except KeyError:  # pragma: no cover
+                        log.error('Invalid glottocode in taxa.csv: %s', row['glottocode'])
+                yield (
+                    lid,
+                    row['taxon'],
+                    row['glottocode'] or None,
+                    glang.name if glang else None,
+                    glang.latitude if glang else None,
+                    glang.longitude if glang else None,
+                    [x.strip() for x in (row.get('xd_ids') or '').split(',') if x.strip()],
+                    *[row.get(k) for k in keys])
+
+        self.add_rows(
+            'LanguageTable',
+            ['ID', 'Name', 'Glottocode', 'Glottolog_Name', 'Latitude', 'Longitude', 'xd_ids']
+            + keys,
+            iter_rows())
         log.info("added taxa (taxa=%d)", len(taxa))
@@ -0,0 +1,60 @@
+"""
+Runs `makecldf` for many phlorest datasets in parallel - e.g. to rebuild all datasets for a new
+Glottolog release.
+
+Datasets are searched in the specified directories and their immediate subdirectories. Each worker
+process opens the Glottolog catalog once. Failing builds do not abort the batch; their tracebacks
+are written to the per-dataset log files in --log-dir.
+"""
+import argparse
+
+from clldutils.clilib import PathType, Table, add_format
+from cldfbench.cli_util import add_catalog_spec
+
+from phlorest.index import find_datasets
+from phlorest.batch import build_datasets
+
+
+def register(parser):  # pragma: no cover  # pylint: disable=C0116
+    add_catalog_spec(parser, 'glottolog')
+    parser.add_argument(
+        'directories',
+        help="Dataset directories or directories containing dataset directories.",
+        metavar="DIR",
+        nargs='+',
+        type=PathType(type='dir'))
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help="Number of worker processes to use for building datasets.",
+        default=None)
+    parser.add_argument(
+        '--log-dir',
+        help="Directory to write per-dataset log files to.",
+        type=PathType(type='dir', must_exist=False),
+        default=None)
+    add_format(parser, 'simple')
+
+
+def run(args: argparse.Namespace):  # pylint: disable=C0116
+    results = []
+    for res in build_datasets(
+            find_datasets(args.directories),
+            glottolog=args.glottolog.dir if args.glottolog else None,
+            workers=args.workers,
+            log_dir=args.log_dir):
+        (args.log.info if res.success else args.log.error)(
+            '%s: %s in %.1fs', res.dataset or res.directory,
+            'built' if res.success else 'failed', res.seconds)
+        results.append(res)
+
+    with Table(args, 'Dataset', 'Status', 'Seconds', 'Error') as t:
+        for res in sorted(results, key=lambda r: (r.success, r.dataset or r.directory)):
+            t.append([
+                res.dataset or res.directory,
+                'ok' if res.success else 'FAILED',
+                round(res.seconds, 1),
+                res.error or ''])
+    args.log.info(
+        '%s of %s datasets built, %.1fs total build time',
+        sum(1 for r in results if r.success), len(results), sum(r.seconds for r in results))
@@ -16,6 +16,8 @@ from commonnexus import Nexus
 from phlorest.cli_util import get_dataset
 from phlorest.dataset import Dataset
 from phlorest.check import run_checks
+from phlorest.archive import TreeArchive
+from phlorest.nexuslib import norm_taxon_name, rf_distances
 
 
 def register(parser):  # pragma: no cover  # pylint: disable=C0116
@@ -27,6 +29,38 @@ def register(parser):  # pragma: no cover  # pylint: disable=C0116
              "\nNOTE: This requires the Rscript command and an R installation with the relevant "
              "packages.",
         default=False)
+    parser.add_argument(
+        '--rf',
+        action='store_true',
+        help="Report Robinson-Foulds distances between the posterior trees and the summary tree.",
+        default=False)
+    parser.add_argument(
+        '--processes',
+        type=int,
+        help="Number of worker processes to use for computing Robinson-Foulds distances.",
+        default=None)
+
+
+def check_rf(d: Dataset, log, processes: Optional[int] = None):
+    """Report Robinson-Foulds distances between the posterior trees and the summary tree."""
+    if not (d.cldf_dir.joinpath('summary.trees').exists()
+            and d.cldf_dir.joinpath('posterior.trees.zip').exists()):
+        log.warning('Need summary and posterior trees to compute RF distances')
+        return
+    taxa = {norm_taxon_name(r['taxon']): i for i, r in enumerate(d.taxa)}
+    with TreeArchive(d.cldf_dir / 'summary.trees') as trees:
+        summary = trees[0]
+    with TreeArchive(d.cldf_dir / 'posterior.trees.zip') as trees:
+        try:
+            # Read the archive in one pass, leaving the parsing of the Newick to `rf_distances`:
+            rfs = [rf for rf, _ in rf_distances(
+                summary, trees.iter_trees(parse=False), taxa, processes=processes)]
+        except ValueError as e:
+            log.warning('Cannot compute RF distances: %s', e)
+            return
+    log.info(
+        'RF distances of %d posterior trees to the summary tree: mean=%.2f min=%d max=%d',
+        len(rfs), sum(rfs) / len(rfs), min(rfs), max(rfs))
 
 
 def run(args: argparse.Namespace, d: Optional[Dataset] = None):  # pylint: disable=C0116
@@ -37,25 +71,29 @@ def run(args: argparse.Namespace, d: Optional[Dataset] = None):  # pylint: disab
     if args.with_R:  # pragma: no cover
         for fname in ['summary.trees', 'posterior.trees.zip']:
             if d.cldf_dir.joinpath(fname).exists():
-                p = d.cldf_dir / fname
                 with TemporaryDirectory() as tmp:
                     if fname.endswith('.zip'):
-                        with zipfile.ZipFile(p) as zipf:
-                            zipf.extract(zipf.infolist()[0], tmp)
-                            assert tmp.joinpath(p.stem).exists()
-                            p = tmp / p.stem
+                        # Archives which have been appended to contain multiple Nexus files.
+                        with zipfile.ZipFile(d.cldf_dir / fname) as zipf:
+                            paths = [
+                                pathlib.Path(zipf.extract(info, tmp)) for info in zipf.infolist()
+                                if not info.filename.endswith('.idx')]
                     else:
-                        shutil.copy(p, tmp / p.name)
-                        p = tmp / p.name
-                    ntrees = len(Nexus.from_file(p).TREES.commands['TREE'])
-                    res = subprocess.call([
-                        ensure_cmd('Rscript'),
-                        str(pathlib.Path(__file__).parent.parent / 'check.R'),
-                        str(p),
-                        str(ntrees),
-                    ])
-                    if res:
-                        success = False
+                        shutil.copy(d.cldf_dir / fname, tmp / fname)
+                        paths = [tmp / fname]
+                    for p in paths:
+                        ntrees = len(Nexus.from_file(p).TREES.commands['TREE'])
+                        res = subprocess.call([
+                            ensure_cmd('Rscript'),
+                            str(pathlib.Path(__file__).parent.parent / 'check.R'),
+                            str(p),
+                            str(ntrees),
+                        ])
+                        if res:
+                            success = False
+
+    if args.rf:
+        check_rf(d, args.log, processes=args.processes)
 
     msg, color = ('PASS', 'green') if run_checks(d, args.log) and success else ('FAIL', 'red')
     print(f"{colored(msg, color, attrs=['bold'])} {d.id}")
@@ -0,0 +1,37 @@
+"""
+Builds - or updates - an SQLite index of phlorest datasets.
+
+Datasets are searched in the specified directories and their immediate subdirectories. Only
+datasets which changed since the last update are re-indexed.
+"""
+import argparse
+
+from clldutils.clilib import PathType
+
+from phlorest.index import Index
+
+
+def register(parser):  # pragma: no cover  # pylint: disable=C0116
+    parser.add_argument(
+        'db',
+        help="Path of the SQLite database file.",
+        metavar="DB",
+        type=PathType(type='file', must_exist=False))
+    parser.add_argument(
+        'directories',
+        help="Dataset directories or directories containing dataset directories.",
+        metavar="DIR",
+        nargs='+',
+        type=PathType(type='dir'))
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help="Number of worker processes to use for reading datasets.",
+        default=None)
+
+
+def run(args: argparse.Namespace):  # pylint: disable=C0116
+    with Index(args.db) as index:
+        counts = index.update(args.directories, workers=args.workers, log=args.log)
+    args.log.info(
+        'datasets: %s', ', '.join(f'{k}={v}' for k, v in counts.items()))
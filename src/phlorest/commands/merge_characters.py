@@ -7,6 +7,8 @@ from csvw.dsv import reader, UnicodeWriter
 from clldutils.clilib import PathType
 from cldfbench.cli_util import add_catalog_spec, add_dataset_spec, get_dataset
 
+from phlorest.concepticon import ConcepticonIndex
+
 
 def register(parser):  # pragma: no cover  # pylint: disable=C0116
     add_catalog_spec(parser, 'concepticon')
@@ -16,12 +18,17 @@ def register(parser):  # pragma: no cover  # pylint: disable=C0116
         help="CSV file with columns Site,Label,Word.",
         metavar="MAPPING",
         type=PathType(type='file'))
+    parser.add_argument(
+        '--normalise-glosses',
+        help="Look up glosses ignoring case and whitespace differences.",
+        action='store_true',
+        default=False)
 
 
 def run(args):  # pragma: no cover  # pylint: disable=C0116
     ds = get_dataset(args)
 
-    conceptsets = {cs.gloss: cs for cs in args.concepticon.api.conceptsets.values()}
+    conceptsets = ConcepticonIndex.from_repos(args.concepticon.dir)
 
     chars = collections.OrderedDict([(c['Site'], c) for c in ds.characters])
     for mapping in reader(args.mapping, dicts=True):
@@ -33,9 +40,10 @@ def run(args):  # pragma: no cover  # pylint: disable=C0116
             if 'Label' in mapping and 'Label' in chars[mapping['Site']]:
                 assert mapping['Label'] == chars[mapping['Site']]['Label']
 
-        assert mapping['Word'] in conceptsets
-        chars[mapping['Site']]['concepticonReference'] = conceptsets[mapping['Word']].id
-        chars[mapping['Site']]['Concepticon_Gloss'] = mapping['Word']
+        cid = conceptsets.id(mapping['Word'], normalised=args.normalise_glosses)
+        assert cid, f"Unknown Concepticon gloss: {mapping['Word']}"
+        chars[mapping['Site']]['concepticonReference'] = cid
+        chars[mapping['Site']]['Concepticon_Gloss'] = conceptsets.gloss(cid)
 
     with UnicodeWriter(ds.etc_dir / 'characters.csv') as w:
         for i, char in enumerate(chars.values()):
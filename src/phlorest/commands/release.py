@@ -18,7 +18,8 @@ def run(args: argparse.Namespace):  # pragma: no cover  # pylint: disable=C0116
     if not tag.startswith('v'):
         tag = 'v' + tag
     ds = get_dataset(args)
-    props = ds.cldf_reader().properties
+    # We only need metadata, thus only read the JSON descriptor.
+    props = ds.cldf_metadata()
     ds.dir.joinpath('relnotes.txt').write_text(
         f"Cite the source as\n\n> {props['dc:bibliographicCitation']}\n\n"
         f"and the Phlorest phylogeny as\n\nDOI",
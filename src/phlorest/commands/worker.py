@@ -0,0 +1,33 @@
+"""
+Starts a long-lived worker process, building and checking datasets on request.
+
+The worker keeps imports, Glottolog data and parsed raw data in memory, thus repeated builds of a
+dataset skip most of the startup cost. Send requests with `python -m phlorest.worker build|check`.
+"""
+import argparse
+
+from clldutils.clilib import PathType
+from cldfbench.cli_util import add_catalog_spec
+
+from phlorest.worker import Worker, DEFAULT_SOCKET
+
+
+def register(parser):  # pragma: no cover  # pylint: disable=C0116
+    add_catalog_spec(parser, 'glottolog')
+    parser.add_argument(
+        '--socket',
+        help="Path of the Unix socket to listen on.",
+        type=PathType(type='file', must_exist=False),
+        default=DEFAULT_SOCKET)
+    parser.add_argument(
+        '--memo-size',
+        type=int,
+        help="Maximal size in MB of parsed raw data to keep in memory.",
+        default=1024)
+
+
+def run(args: argparse.Namespace):  # pragma: no cover  # pylint: disable=C0116
+    with Worker(args.socket, args.glottolog.dir, memo_size=args.memo_size * 2 ** 20) as worker:
+        args.log.info('phlorest worker listening on %s', worker.path)
+        worker.serve()
+    args.log.info('phlorest worker stopped after %s requests', worker.requests)
@@ -0,0 +1,81 @@
+"""
+Lookup of Concepticon conceptsets - without loading the full Concepticon catalog.
+
+.. code-block:: python
+
+    >>> from phlorest.concepticon import ConcepticonIndex
+    >>> index = ConcepticonIndex.from_repos(args.concepticon.dir)
+    >>> index.id('hand', normalised=True)
+    '1277'
+"""
+import pathlib
+from typing import Optional
+
+from csvw.dsv import reader
+
+from .nexuslib import PathType
+from .cache import ResultCache
+
+__all__ = ['ConcepticonIndex', 'norm_gloss']
+
+
+def norm_gloss(gloss: str) -> str:
+    """Normalise a gloss for case- and whitespace-insensitive lookup."""
+    return ' '.join(gloss.split()).upper()
+
+
+class ConcepticonIndex:
+    """
+    Maps conceptset glosses to conceptset IDs.
+
+    The index is built from `concepticondata/concepticon.tsv` - i.e. the file from which the
+    conceptsets are read by `pyconcepticon` - and stored in a `ResultCache` keyed by the content
+    of this file. Thus, it is only rebuilt for a new version of Concepticon.
+    """
+    def __init__(self, glosses: dict[str, str]):
+        """
+        :param glosses: Maps glosses to IDs.
+        """
+        self.glosses = glosses
+        self.ids = {cid: gloss for gloss, cid in glosses.items()}
+        self._normalised = None
+
+    @classmethod
+    def from_repos(
+            cls,
+            repos: PathType,
+            cache: Optional[ResultCache] = None,
+    ) -> 'ConcepticonIndex':
+        """
+        :param repos: Path to a clone of concepticon-data.
+        :param cache: `ResultCache` to store the index in (defaults to the user cache).
+        """
+        tsv = pathlib.Path(repos) / 'concepticondata' / 'concepticon.tsv'
+        cache = cache or ResultCache()
+        key = cache.key('concepticon-index', tsv)
+        text = cache.get(key)
+        if text is None:
+            text = cache.set(key, ''.join(
+                f"{row['GLOSS']}\t{row['ID']}\n"
+                for row in reader(tsv, delimiter='\t', dicts=True)))
+        return cls(dict(line.split('\t') for line in text.splitlines()))
+
+    def __len__(self):
+        return len(self.glosses)
+
+    def id(self, gloss: str, normalised: bool = False) -> Optional[str]:
+        """
+        Look up the ID of the conceptset with gloss `gloss`.
+
+        :param normalised: Flag signaling whether to compare glosses normalised for case and \
+        whitespace.
+        """
+        if not normalised:
+            return self.glosses.get(gloss)
+        if self._normalised is None:
+            self._normalised = {norm_gloss(g): cid for g, cid in self.glosses.items()}
+        return self._normalised.get(norm_gloss(gloss))
+
+    def gloss(self, cid: str) -> Optional[str]:
+        """Look up the gloss of the conceptset with ID `cid`."""
+        return self.ids.get(str(cid))
@@ -1,16 +1,29 @@
 """
 A phlorest-specific cldfbench.Dataset implementation.
 """
+import re
 import bz2
+import json
 import gzip
+import pickle
+import hashlib
 import shlex
 import shutil
+import asyncio
+import pathlib
 import random
+import types
 import argparse
+import contextlib
+import collections
 import subprocess
+import concurrent.futures
 from typing import Optional, Callable, Union
+from collections.abc import Sequence, Generator, Iterable
 
+import newick
 import cldfbench
+import commonnexus
 from cldfbench.datadir import DataDir
 from pyglottolog.languoids import Glottocode
 from clldutils.path import TemporaryDirectory, ensure_cmd
@@ -19,30 +32,199 @@ from cldfviz.tree import render
 from commonnexus import Nexus
 from commonnexus.tools.normalise import normalise as nexus_norm
 
-from .nexuslib import Tree, PathType
+from .nexuslib import Tree, PathType, TreeCache, LazyNexus
+from .cache import ResultCache, MemoryCache, tool_version
+from .annotations import NodeAnnotations, filter_annotations
+from .scan import scan_trees, select_trees, select_blocks
 from .metadata import Metadata
 from .cldfwriter import CLDFWriter
 
 CsvRowType = dict[str, str]
+BurninType = Union[int, float, str]
+
+
+def resolve_burnin(burnin: BurninType, ntrees: int) -> int:
+    """
+    Resolve a burn-in specification to the number of trees to discard.
+
+    :param burnin: Number of trees or - if a `float` or a percentage like `"10%"` is passed - \
+    fraction of trees.
+    :param ntrees: Total number of trees.
+    """
+    if isinstance(burnin, str):
+        if not burnin.endswith('%'):
+            raise ValueError(f'Invalid burn-in: {burnin}')
+        burnin = float(burnin[:-1]) / 100
+    if isinstance(burnin, float):
+        if not 0 <= burnin < 1:
+            raise ValueError(f'Invalid burn-in fraction: {burnin}')
+        return int(burnin * ntrees)
+    return burnin
+
+
+def _code_parts(code: types.CodeType, names: set[str]) -> Generator[bytes, None, None]:
+    """Byte code, names and constants of a code object - recursing into nested code objects."""
+    names.update(code.co_names)
+    yield code.co_code
+    yield repr(code.co_names).encode('utf8')
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            yield from _code_parts(const, names)
+        else:
+            yield repr(const).encode('utf8')
+
+
+def _value_key(value, seen: set[int]) -> str:
+    if getattr(value, '__code__', None) is not None:
+        return callable_key(value, _seen=seen)
+    if isinstance(value, types.ModuleType):
+        return value.__name__
+    return repr(value)
+
+
+def callable_key(func: Callable, _seen: Optional[set[int]] = None) -> str:
+    """
+    An identifier for a function - e.g. a preprocessor - which changes when the function's code
+    (including nested functions), its default arguments, the values it closes over or the global
+    names it references change, but is stable across module reloads.
+
+    Referenced functions are identified recursively, other values by their `repr`. Thus, values
+    with a `repr` which does not reflect their state - e.g. instances of classes without custom
+    `__repr__` - may result in different keys for the same function, i.e. in cache misses.
+    """
+    code = getattr(func, '__code__', None)
+    if code is None:
+        return repr(func)
+    seen = set() if _seen is None else _seen
+    if id(code) in seen:  # Recursive reference.
+        return f'{func.__module__}.{func.__qualname__}'
+    seen.add(id(code))
+    names = set()
+    parts = [f'{func.__module__}.{func.__qualname__}'.encode('utf8')]
+    parts.extend(_code_parts(code, names))
+    parts.append(repr((func.__defaults__, func.__kwdefaults__)).encode('utf8'))
+    for cell in func.__closure__ or []:
+        parts.append(_value_key(cell.cell_contents, seen).encode('utf8'))
+    globals_ = getattr(func, '__globals__', {})
+    for name in sorted(names):
+        if name in globals_:
+            parts.append(f'{name}={_value_key(globals_[name], seen)}'.encode('utf8'))
+    return hashlib.sha256(b'\0'.join(parts)).hexdigest()
+
+
+def allocate_sample(sample: int, sizes: Sequence[int]) -> list[int]:
+    """
+    Spread a sample evenly over groups of the given sizes - redistributing the shortfall of
+    groups which are smaller than their share to the other groups.
+
+    .. code-block:: python
+
+        >>> allocate_sample(10, [2, 100, 100])
+        [2, 4, 4]
+    """
+    res, remaining = [0] * len(sizes), sample
+    todo = [i for i, size in enumerate(sizes) if size]
+    while todo and remaining:
+        share, extra = divmod(remaining, len(todo))
+        for k, i in enumerate(todo):
+            n = min(share + (1 if k < extra else 0), sizes[i] - res[i])
+            res[i] += n
+            remaining -= n
+        todo = [i for i in todo if res[i] < sizes[i]]
+    return res
 
 
 class PhlorestDir(DataDir):
     """
     Enhanced `DataDir`, adding methods to access phylogenetic data.
     """
+    #: If set, the results of reading files - i.e. `Nexus` objects or lists of `Tree` - are \
+    #: memoised, keyed by the content of the file and the read options. This is used by the \
+    #: phlorest worker (see `phlorest.worker`) to keep parsed raw data across builds.
+    memo: Optional[MemoryCache] = None
+
+    def _memo_key(self, path: Optional[PathType], *args) -> Optional[str]:
+        if self.memo is None or path is None:
+            return None
+        digest = hashlib.sha256()
+        with self._path(path).open('rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):  # pylint: disable=W0640
+                digest.update(chunk)
+        digest.update(repr(args).encode('utf8'))
+        return digest.hexdigest()
+
     def read_nexus(
             self,
             path: Optional[PathType] = None,
             text: Optional[str] = None,
             encoding: str = 'utf-8-sig',
             normalise: bool = False,
-            preprocessor: Callable[[str], str] = lambda s: s,
+            preprocessor: Optional[Callable[[str], str]] = None,
+            blocks: Optional[Iterable[str]] = None,
+            cache: Union[bool, ResultCache] = False,
+            cache_key: Optional[str] = None,
     ) -> Nexus:
         """
         :param path: path to nexus file (or `None`).
         :param text: text content of a nexus file.
+        :param blocks: names of the blocks to read, e.g. `['TAXA', 'TREES']`. If passed, all \
+        other blocks are skipped without parsing them, and the selected blocks are parsed when \
+        first accessed. See `phlorest.nexuslib.LazyNexus`.
+        :param cache: Flag signaling whether to look up the normalised `Nexus` in - or add it \
+        to - the default `ResultCache`, or a `ResultCache` instance to use. Only used with \
+        `normalise=True`. Results are keyed by the raw content, preprocessor, read options and \
+        `commonnexus` version, and stored compressed. A cache hit skips parsing entirely. \
+        Note that cached results are pickles in the user cache directory, which are loaded \
+        without further checks - i.e. the cache directory must be trusted.
+        :param cache_key: Explicit identifier of the preprocessor for the cache key. Required \
+        when caching results of a `preprocessor`, because a key derived from the code (see \
+        `callable_key`) cannot capture everything the preprocessor depends on, and stale results \
+        would persist across runs.
         :return: Initialized `Nexus` object.
         """
+        if normalise and cache and preprocessor and not cache_key:
+            raise ValueError('Caching results of a preprocessor requires a cache_key')
+        blocks = sorted({name.upper() for name in blocks}) if blocks is not None else None
+        key = self._memo_key(
+            path, 'nexus', encoding, normalise, cache_key or callable_key(preprocessor), blocks)
+        if key:
+            res = self.memo.get(key)
+            if res is not None:
+                return res
+        cache = ResultCache() if cache is True else cache
+        if normalise and cache:
+            ckey = cache.key(
+                'nexus-normalise',
+                commonnexus.__version__,
+                self._path(path) if path else text,
+                cache_key or callable_key(preprocessor),
+                encoding,
+                repr(blocks))
+            data = cache.get(ckey, binary=True)
+            if data is not None:
+                res = pickle.loads(gzip.decompress(data))
+                return self.memo.set(key, res) if key else res
+        text = self._read_text(
+            path, text, encoding=encoding, preprocessor=preprocessor or (lambda s: s))
+        if blocks is None:
+            res = Nexus(text)
+        else:
+            # Parse now, if we have to normalise - or memoise the parsed blocks.
+            res = LazyNexus(text, blocks=blocks)
+            res = res.load() if normalise or key else res
+        res = nexus_norm(res) if normalise else res
+        if normalise and cache:
+            cache.set(ckey, gzip.compress(
+                pickle.dumps(res, protocol=pickle.HIGHEST_PROTOCOL), compresslevel=1))
+        return self.memo.set(key, res) if key else res
+
+    def _read_text(
+            self,
+            path: Optional[PathType] = None,
+            text: Optional[str] = None,
+            encoding: str = 'utf-8-sig',
+            preprocessor: Callable[[str], str] = lambda s: s,
+    ) -> str:
         assert (path or text) and not (path and text), 'Must pass either path or text'
         if path:
             path = self._path(path)
@@ -52,61 +234,230 @@ class PhlorestDir(DataDir):
             if path.suffix == '.bz2':
                 with bz2.open(path, 'rt', encoding='utf8') as fp:
                     text = fp.read()
-        res = Nexus(preprocessor(text or self.read(path, encoding=encoding)))
-        return nexus_norm(res) if normalise else res
+        return preprocessor(text or self.read(path, encoding=encoding))
 
     def read_trees(  # pylint: disable=R0913,R0917
             self,
             path: Optional[PathType] = None,
             text: Optional[str] = None,
             detranslate: bool = False,
-            burnin: int = 0,
+            burnin: BurninType = 0,
             sample: int = 0,
             strip_annotation: bool = False,
             seed: int = 12345,
             preprocessor: Callable[[str], str] = lambda s: s,
+            cache: Optional[TreeCache] = None,
+            burnin_state: int = 0,
+            annotations: Optional[NodeAnnotations] = None,
+            keep_annotations: Optional[Union[Iterable[str], re.Pattern]] = None,
+            blocks: Iterable[str] = ('TAXA', 'TREES'),
     ) -> list[Tree]:
         """
         Reads trees from `path` and transforms them as required.
 
         Processing order:
-            burnin -> sample -> strip_annotation -> remove_rate -> detranslate
+            burnin -> sample -> keep_annotations -> annotations -> detranslate -> strip_annotation
+
+        Burn-in and sample are determined from a lightweight scan of the TREE commands, thus only
+        the selected trees are parsed.
 
         :param path: path to nexus file.
         :param text: nexus content in text.
         :param detranslate: return trees with translate blocks removed (default=False).
-        :param burnin: number of trees to remove as burn-in (default=none).
+        :param burnin: number of trees to remove as burn-in (default=none) - or fraction of trees \
+        if a `float` or a percentage like `"10%"` is passed.
+        :param burnin_state: minimal MCMC state of trees to keep, for trees named like \
+        `STATE_<n>`. Applied before `burnin`.
         :param sample: number of trees to sample (default=all).
-        :param remove_rate: remove extra rate information.
-        :param strip_annotation: remove comments and annotations in trees (default=False).
+        :param keep_annotations: keys of node annotations to keep - or a regular expression \
+        pattern matching them, e.g. `re.compile('height|rate')`. All other annotations are removed \
+        from the selected TREE commands before they are parsed. See \
+        `phlorest.annotations.filter_annotations`.
+        :param strip_annotation: remove comments and annotations in trees (default=False). If \
+        `annotations` are extracted, the node keys are kept.
         :param preprocessor: function to preprocess nexus text.
+        :param cache: If a `TreeCache` is passed, trees with identical Newick strings are parsed \
+        and transformed only once - and returned with the transformed Newick string as \
+        `Tree.newick`.
+        :param annotations: If a `NodeAnnotations` table is passed, node annotations are moved \
+        from the trees to this table - before parsing the Newick strings - and replaced with node \
+        keys. See `CLDFWriter.add_summary` for how to add the table to the CLDF dataset.
+        :param blocks: names of the blocks to keep. All other blocks - e.g. big DATA or CHARACTERS \
+        blocks in MrBayes output - are skipped before any content is parsed.
         :return:
         """
-        nex = self.read_nexus(path=path, text=text, preprocessor=preprocessor)
-        trees = nex.TREES.trees
-        # remove burn-in first
-        if burnin:
-            trees = trees[burnin:]
-        # ..then sample if needed
-        if sample and len(trees) > sample:
-            random.seed(seed)
-            trees = random.sample(trees, sample)
-
-        trees = [Tree(tree.name, tree.newick, tree.rooted) for tree in trees]
+        blocks = sorted({name.upper() for name in blocks})
+        key, keep = None, keep_annotations
+        if keep_annotations is not None and not isinstance(keep_annotations, re.Pattern):
+            keep_annotations = set(keep_annotations)
+            keep = sorted(keep_annotations)
+        if cache is None and annotations is None:
+            # Results which depend on - or modify - state passed in cannot be memoised.
+            key = self._memo_key(
+                path, 'trees', detranslate, burnin, sample, strip_annotation, seed,
+                callable_key(preprocessor), burnin_state,
+                keep.pattern if isinstance(keep, re.Pattern) else keep, blocks)
+        if key:
+            res = self.memo.get(key)
+            if res is not None:
+                return res
+        text = select_blocks(self._read_text(path, text, preprocessor=preprocessor), blocks)
+        spans = scan_trees(text)
+        selected = self._select(spans, burnin, burnin_state, sample, seed)
+
+        # Now we parse the selected trees only.
+        text = select_trees(text, spans, set(selected)) if spans else text
+        if keep_annotations is not None:
+            text = filter_annotations(text, keep_annotations)
+        nex = Nexus(text)
+        block = nex.TREES
+        trees = dict(zip(sorted(selected), block.trees))
+        trees = [trees[i] for i in selected]
+
+        if cache is not None:
+            return self._read_cached_trees(
+                block, trees, cache, detranslate, strip_annotation, annotations)
+
+        trees = [
+            Tree(
+                tree.name,
+                newick.loads(
+                    self._extract(annotations, tree.newick_string, strip_annotation))[0]
+                if annotations is not None else tree.newick,
+                tree.rooted)
+            for tree in trees]
         # ...then detranslate.
         if detranslate:
             # We must use a reference to the same block in order to make the translation-mapping
             # caching work.
-            cmd = nex.TREES.translate
+            cmd = block.translate
             for tree in trees:
                 tree.newick = cmd(tree.newick)
 
-        # remove comments if asked
-        if strip_annotation:
+        # remove comments if asked - node keys have been kept when extracting annotations.
+        if strip_annotation and annotations is None:
             for tree in trees:
                 tree.newick.strip_comments()
 
-        return trees
+        return self.memo.set(key, trees) if key else trees
+
+    @staticmethod
+    def _select(
+            spans: list,
+            burnin: BurninType = 0,
+            burnin_state: int = 0,
+            sample: int = 0,
+            seed: int = 12345,
+    ) -> list[int]:
+        """Select the indices of the trees to read - after removing burn-in and sampling."""
+        selected = list(range(len(spans)))
+        # remove burn-in first
+        if burnin_state:
+            if any(span.state is None for span in spans):
+                raise ValueError('Burn-in by state requires tree names like STATE_<n>')
+            selected = [i for i in selected if spans[i].state >= burnin_state]
+        burnin = resolve_burnin(burnin, len(selected))
+        if burnin:
+            selected = selected[burnin:]
+        # ..then sample if needed
+        if sample and len(selected) > sample:
+            selected = random.Random(seed).sample(selected, sample)
+        return selected
+
+    @staticmethod
+    def _extract(annotations: NodeAnnotations, nwk: str, strip_annotation: bool) -> str:
+        """
+        Extract annotations, replacing them with node keys - which must survive stripping the
+        other comments, to keep the trees joinable with the annotations table.
+        """
+        nwk = annotations.extract(nwk)
+        return annotations.strip_comments(nwk) if strip_annotation else nwk
+
+    @staticmethod
+    def _read_cached_trees(  # pylint: disable=R0913,R0917
+            block, trees, cache, detranslate, strip_annotation, annotations) -> list[Tree]:
+        # The cache key must reflect all information the transformation depends on.
+        key = hashlib.md5(repr((
+            sorted(block.translate_mapping.items()) if detranslate else None,
+            strip_annotation,
+        )).encode('utf8')).hexdigest()
+        res = []
+        for tree in trees:
+            nwk_string = tree.newick_string
+            if annotations is not None:
+                # Node keys are unique, so trees with extracted annotations will hardly ever hit
+                # the cache.
+                nwk_string = PhlorestDir._extract(annotations, nwk_string, strip_annotation)
+            nwk = cache.get((nwk_string, key))
+            if nwk is None:
+                node = newick.loads(nwk_string)[0] if annotations is not None else tree.newick
+                node = block.translate(node) if detranslate else node
+                if strip_annotation and annotations is None:
+                    node.strip_comments()
+                nwk = cache.set((nwk_string, key), f'{node.newick};')
+            res.append(Tree(tree.name, nwk, tree.rooted))
+        return res
+
+    def iter_runs(  # pylint: disable=R0913,R0917
+            self,
+            paths: Sequence[PathType],
+            burnin: Union[BurninType, Sequence[BurninType]] = 0,
+            sample: int = 0,
+            seed: int = 12345,
+            executor: Optional[concurrent.futures.Executor] = None,
+            **kw,
+    ) -> Generator[Tree, None, None]:
+        """
+        Read trees from multiple independent runs of an MCMC analysis as one stream of trees.
+
+        Trees are yielded run by run, and only the current run and the next one are held in
+        memory: While the trees of one run are consumed, the next run is read using `executor` -
+        by default a thread, thus overlapping I/O and decompression, but not parsing Newick, which
+        holds the GIL. Pass a `ProcessPoolExecutor` to parse runs in parallel.
+
+        .. code-block:: python
+
+            args.writer.add_posterior(
+                self.raw_dir.iter_runs(['run1.trees.gz', 'run2.trees.gz'], burnin=0.1, sample=1000),
+                self.metadata,
+                args.log)
+
+        :param paths: paths to the nexus files of the runs.
+        :param burnin: burn-in for all runs or list of burn-in specifications per run. See \
+        :meth:`PhlorestDir.read_trees`.
+        :param sample: total number of trees to sample, spread evenly across the runs. If a run \
+        has fewer trees than its share - after burn-in - the shortfall is sampled from the other \
+        runs. This requires scanning all runs for TREE commands beforehand.
+        :param executor: `concurrent.futures.Executor` to read the runs.
+        :param kw: Additional keyword arguments are passed into :meth:`PhlorestDir.read_trees`.
+        """
+        burnins = list(burnin) if isinstance(burnin, (list, tuple)) else [burnin] * len(paths)
+        assert len(burnins) == len(paths), 'Burn-in must be specified for all runs'
+        samples = [0] * len(paths)
+        if sample:
+            samples = allocate_sample(sample, [
+                len(self._select(
+                    scan_trees(select_blocks(
+                        self._read_text(path, preprocessor=kw.get('preprocessor', lambda s: s)),
+                        kw.get('blocks', ('TAXA', 'TREES')))),
+                    burnin=b,
+                    burnin_state=kw.get('burnin_state', 0)))
+                for path, b in zip(paths, burnins)])
+        runs = [
+            (path, b, n, seed + i) for i, (path, b, n) in enumerate(zip(paths, burnins, samples))
+            if n or not sample]  # Skip runs from which no trees are sampled.
+
+        with contextlib.ExitStack() as stack:
+            if executor is None:
+                executor = stack.enter_context(concurrent.futures.ThreadPoolExecutor(max_workers=1))
+            futures = collections.deque()
+            for path, b, n, s in runs:
+                futures.append(executor.submit(
+                    self.read_trees, path, burnin=b, sample=n, seed=s, **kw))
+                if len(futures) > 1:  # Prefetch one run ahead.
+                    yield from futures.popleft().result()
+            while futures:
+                yield from futures.popleft().result()
 
     def read_tree(  # pylint: disable=R0913,R0917
             self,
@@ -143,6 +494,12 @@ class Dataset(cldfbench.Dataset):
     """
     metadata_cls = Metadata
     datadir_cls = PhlorestDir
+    #: Maximal number of bytes of posterior trees - and of TreeTable rows - to keep in memory \
+    #: while creating the CLDF data. Set this for datasets with huge posterior samples.
+    memory_budget: Optional[int] = None
+    #: Flag signaling whether to write summary tree, posterior sample and CSV files concurrently \
+    #: when finalising the CLDF data. Set this to speed up creating datasets with big posteriors.
+    concurrent_exit: bool = False
 
     def __init__(self):
         cldfbench.Dataset.__init__(self)
@@ -152,6 +509,13 @@ class Dataset(cldfbench.Dataset):
         """Phlorest phylogenies typically just contain one CLDF dataset."""
         return cldfbench.CLDFSpec(dir=self.cldf_dir, writer_cls=CLDFWriter)
 
+    def cldf_metadata(self) -> dict:
+        """
+        The metadata of the CLDF dataset - read from the JSON descriptor only, i.e. without loading
+        the dataset with `pycldf`.
+        """
+        return json.loads(self.cldf_specs().metadata_path.read_text(encoding='utf8'))
+
     def cmd_download(self, args: argparse.Namespace):  # pragma: no cover
         """Overwrite the behaviour of cldfbench.Dataset.cmd_download."""
 
@@ -165,31 +529,64 @@ class Dataset(cldfbench.Dataset):
         # Call default CLDF creation.
         cldfbench.Dataset._cmd_makecldf(self, args)  # pylint: disable=W0212
 
-        cldf = self.cldf_reader()
-        for tree in TreeTable(cldf):  # See, if we can find a summary tree.
+        writer = getattr(args, 'writer', None)
+        if isinstance(writer, CLDFWriter):
+            # We reuse the data of the writer rather than re-reading the CLDF data just written.
+            tree = next(iter(writer.summary), None)
+            if tree is None:
+                return None  # pragma: no cover
+            nwk = newick.loads(str(tree))[0]
+            if writer.summary.translate:  # pragma: no cover
+                mapping = writer.summary.translate_mapping
+                for node in nwk.walk():
+                    if node.is_leaf:
+                        node.name = mapping.get(node.name, node.name)
+            nwk.strip_comments()
+            return self._render_summary_tree(
+                nwk,
+                None if writer.summary.scaling in {'none', 'arbitrary'}
+                else writer.summary.scaling,
+                writer.cldf.properties,
+                writer.objects['LanguageTable'])
+
+        cldf = self.cldf_reader()  # pragma: no cover
+        for tree in TreeTable(cldf):  # pragma: no cover
             if tree.tree_type == 'summary':
-                legend = "Summary tree"
-                if cldf.properties.get('dc:subject', {}).get('analysis'):
-                    title = cldf.properties['dc:subject']['analysis'].title()
-                    legend += f' of a {title} analysis'
-                if cldf.properties.get('dc:subject', {}).get('family'):
-                    family = cldf.properties['dc:subject']['family']
-                    legend += f' of the {family} family'
-                if tree.tree_branch_length_unit:
-                    legend += f' with branches in {tree.tree_branch_length_unit}'
-
-                return render(
-                    tree,
-                    output=self.dir / 'summary_tree.svg',
-                    glottolog_mapping={
-                        r['ID']: (r['Glottocode'], r.get('Glottolog_Name'))
-                        for r in cldf['LanguageTable'] if r['Glottocode']},
-                    legend=legend,
-                    width=1000,
-                    with_glottolog_links=True
-                )
+                return self._render_summary_tree(
+                    tree.newick(strip_comments=True),
+                    tree.tree_branch_length_unit,
+                    cldf.properties,
+                    cldf['LanguageTable'])
         return None  # pragma: no cover
 
+    def _render_summary_tree(
+            self,
+            nwk: newick.Node,
+            unit: Optional[str],
+            properties: dict,
+            languages: Iterable[CsvRowType],
+    ) -> PathType:
+        """Render the summary tree as SVG."""
+        legend = "Summary tree"
+        if properties.get('dc:subject', {}).get('analysis'):
+            legend += f" of a {properties['dc:subject']['analysis'].title()} analysis"
+        if properties.get('dc:subject', {}).get('family'):
+            legend += f" of the {properties['dc:subject']['family']} family"
+        if unit:
+            legend += f' with branches in {unit}'
+
+        return render(
+            nwk,
+            tree_object=argparse.Namespace(tree_branch_length_unit=unit),
+            output=self.dir / 'summary_tree.svg',
+            glottolog_mapping={
+                r['ID']: (r['Glottocode'], r.get('Glottolog_Name'))
+                for r in languages if r.get('Glottocode')},
+            legend=legend,
+            width=1000,
+            with_glottolog_links=True
+        )
+
     def init(self, args: argparse.Namespace):
         """
         Create rows in LanguageTable according to `etc/taxa.csv` and add sources from
@@ -254,8 +651,29 @@ class Dataset(cldfbench.Dataset):
         return self._read_from_etc('characters.csv')
 
     @staticmethod
-    def run_treeannotator(cmd: str, input_: Union[str, PathType]) -> Nexus:
-        """Run a treeannotator command on the Nexus string or file specified as `input_`."""
+    def run_treeannotator(
+            cmd: str,
+            input_: Union[str, PathType],
+            cache: Union[bool, ResultCache] = False,
+    ) -> Nexus:
+        """
+        Run a treeannotator command on the Nexus string or file specified as `input_`.
+
+        :param cache: Flag signaling whether to look up the result in - or add it to - the \
+        default `ResultCache`, or a `ResultCache` instance to use. Results are keyed by input \
+        content, command and treeannotator version.
+        """
+        exe = ensure_cmd('treeannotator')
+        cache = ResultCache() if cache is True else cache
+        if cache:
+            key = cache.key(
+                'treeannotator',
+                tool_version(exe),
+                cmd,
+                input_ if isinstance(input_, str) else pathlib.Path(input_))
+            res = cache.get(key)
+            if res is not None:
+                return Nexus(res)
         with TemporaryDirectory() as d:
             in_ = d / 'in.nex'
             if isinstance(input_, str):
@@ -264,17 +682,69 @@ class Dataset(cldfbench.Dataset):
                 shutil.copy(input_, in_)
             out = d / 'out.nex'
             subprocess.check_call(
-                [ensure_cmd('treeannotator')] + shlex.split(cmd) + [str(in_), str(out)],
+                [exe] + shlex.split(cmd) + [str(in_), str(out)],
                 stderr=subprocess.DEVNULL,
             )
-            return Nexus(out.read_text(encoding='utf8'))
+            res = out.read_text(encoding='utf8')
+            return Nexus(cache.set(key, res) if cache else res)
+
+    @classmethod
+    async def arun_treeannotator(
+            cls,
+            cmd: str,
+            input_: Union[str, PathType],
+            cache: Union[bool, ResultCache] = False,
+    ) -> Nexus:
+        """
+        Coroutine running `run_treeannotator` in a separate thread - to run multiple independent
+        tools concurrently:
+
+        .. code-block:: python
+
+            async def annotate():
+                return await asyncio.gather(
+                    self.arun_treeannotator('-burnin 10', self.raw_dir / 'run1.trees'),
+                    self.arun_treeannotator('-burnin 10', self.raw_dir / 'run2.trees'))
+
+            mcc1, mcc2 = asyncio.run(annotate())
+        """
+        return await asyncio.to_thread(cls.run_treeannotator, cmd, input_, cache=cache)
 
     @staticmethod
-    def run_rscript(script: str, output_fname: str) -> str:
+    def run_rscript(
+            script: str,
+            output_fname: str,
+            cache: Union[bool, ResultCache] = False,
+    ) -> str:
         """
         Run an R script and return whatever it has written to `output_fname` as string.
+
+        :param cache: Flag signaling whether to look up the result in - or add it to - the \
+        default `ResultCache`, or a `ResultCache` instance to use. Results are keyed by script, \
+        output file name and Rscript version - thus, only cache results of scripts which do not \
+        read other input.
         """
+        exe = ensure_cmd('Rscript')
+        cache = ResultCache() if cache is True else cache
+        if cache:
+            key = cache.key('Rscript', tool_version(exe), script, output_fname)
+            res = cache.get(key)
+            if res is not None:
+                return res
         with TemporaryDirectory() as d:
             d.joinpath('script.r').write_text(script, encoding='utf8')
-            subprocess.check_call([ensure_cmd('Rscript'), str(d / 'script.r')], cwd=d)
-            return d.joinpath(output_fname).read_text(encoding='utf8')
+            subprocess.check_call([exe, str(d / 'script.r')], cwd=d)
+            res = d.joinpath(output_fname).read_text(encoding='utf8')
+            return cache.set(key, res) if cache else res
+
+    @classmethod
+    async def arun_rscript(
+            cls,
+            script: str,
+            output_fname: str,
+            cache: Union[bool, ResultCache] = False,
+    ) -> str:
+        """
+        Coroutine running `run_rscript` in a separate thread. See `Dataset.arun_treeannotator`.
+        """
+        return await asyncio.to_thread(cls.run_rscript, script, output_fname, cache=cache)
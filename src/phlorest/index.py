@@ -0,0 +1,269 @@
+"""
+An SQLite index of many phlorest datasets - to answer questions like "Which phylogenies include
+Glottocode X?" without loading each dataset with `pycldf` and parsing trees.
+
+.. code-block:: python
+
+    >>> from phlorest.index import Index
+    >>> with Index('phlorest.sqlite') as index:
+    ...     index.update(pathlib.Path('phlorest').iterdir(), workers=8)
+    ...     index.query('SELECT dataset_id FROM language WHERE glottocode = ?', ('stan1295',))
+"""
+import json
+import hashlib
+import pathlib
+import sqlite3
+import logging
+import dataclasses
+import concurrent.futures
+from typing import Optional, Any
+from collections.abc import Iterable
+
+from csvw.dsv import reader
+
+from .nexuslib import PathType
+from .metadata import Metadata
+
+__all__ = ['Index', 'find_datasets', 'scan_dataset', 'SOURCES']
+
+#: The files - relative to the dataset directory - from which the index is built.
+SOURCES = ('metadata.json', 'cldf/languages.csv', 'cldf/trees.csv')
+# Datasets are keyed by directory, because clones of the same dataset - i.e. with the same ID -
+# may be indexed, e.g. checked out at different versions.
+SCHEMA_VERSION = 2
+SCHEMA = """\
+CREATE TABLE IF NOT EXISTS dataset (
+    directory TEXT PRIMARY KEY,
+    id TEXT NOT NULL,
+    fingerprint TEXT,
+    hash TEXT,
+    title TEXT,
+    name TEXT,
+    author TEXT,
+    year TEXT,
+    scaling TEXT,
+    analysis TEXT,
+    family TEXT,
+    url TEXT,
+    metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS dataset_id ON dataset(id);
+CREATE TABLE IF NOT EXISTS language (
+    directory TEXT NOT NULL REFERENCES dataset(directory) ON DELETE CASCADE,
+    dataset_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT,
+    glottocode TEXT,
+    PRIMARY KEY (directory, id)
+);
+CREATE INDEX IF NOT EXISTS language_glottocode ON language(glottocode);
+CREATE TABLE IF NOT EXISTS tree (
+    directory TEXT NOT NULL REFERENCES dataset(directory) ON DELETE CASCADE,
+    dataset_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT,
+    media_id TEXT,
+    type TEXT,
+    rooted INTEGER,
+    branch_length_unit TEXT,
+    ntips INTEGER,
+    height REAL,
+    length REAL,
+    ultrametric INTEGER,
+    PRIMARY KEY (directory, id)
+);
+CREATE INDEX IF NOT EXISTS tree_type ON tree(type);
+"""
+METADATA_COLUMNS = (
+    'title', 'name', 'author', 'year', 'scaling', 'analysis', 'family', 'url')
+# TreeTable columns - and the names used in datasets created with older versions of phlorest.
+TREE_COLUMNS = (
+    ('ID',),
+    ('Name',),
+    ('Media_ID', 'Nexus_File'),
+    ('Tree_Type', 'type'),
+    ('Tree_Is_Rooted', 'rooted'),
+    ('Tree_Branch_Length_Unit', 'scaling'),
+    ('Number_Of_Tips',),
+    ('Tree_Height',),
+    ('Tree_Length',),
+    ('Tree_Is_Ultrametric',),
+)
+
+
+def find_datasets(directories: Iterable[PathType]) -> list[pathlib.Path]:
+    """
+    Find dataset directories, i.e. directories containing `metadata.json` and a `cldf`
+    directory, among `directories` and their immediate subdirectories.
+    """
+    res = []
+    for d in map(pathlib.Path, directories):
+        if d.joinpath('metadata.json').exists() and d.joinpath('cldf').is_dir():
+            res.append(d)
+        elif d.is_dir():
+            res.extend(find_datasets(sorted(
+                p for p in d.iterdir() if p.joinpath('metadata.json').exists())))
+    return res
+
+
+def dataset_id(d: pathlib.Path) -> str:
+    """The ID of a dataset as encoded in the name of its cldfbench module - or its directory."""
+    modules = sorted(d.glob('cldfbench_*.py'))
+    return modules[0].stem[len('cldfbench_'):] if modules else d.name
+
+
+def fingerprint(d: pathlib.Path) -> str:
+    """A cheap fingerprint of the files in a dataset from which the index is built."""
+    res = []
+    for name in SOURCES:
+        p = d / name
+        if p.exists():
+            stat = p.stat()
+            res.append(f'{name}:{stat.st_size}:{stat.st_mtime_ns}')
+    return ';'.join(res)
+
+
+def content_hash(d: pathlib.Path) -> str:
+    """The SHA-256 hash of the content of the files in a dataset from which the index is built."""
+    digest = hashlib.sha256()
+    for name in SOURCES:
+        if d.joinpath(name).exists():
+            digest.update(name.encode('utf8'))
+            digest.update(d.joinpath(name).read_bytes())
+    return digest.hexdigest()
+
+
+def _bool(s: Optional[str]) -> Optional[int]:
+    return None if s in (None, '') else int(s.lower() == 'true')
+
+
+def scan_dataset(d: pathlib.Path, known: Optional[str] = None) -> dict[str, Any]:
+    """
+    Read the data to index for a dataset.
+
+    :param known: Content hash of the dataset as indexed before. If it matches, only the \
+    fingerprint and hash are returned.
+    """
+    res = {'id': dataset_id(d), 'directory': str(d.resolve()), 'fingerprint': fingerprint(d)}
+    res['hash'] = content_hash(d)
+    if res['hash'] == known:
+        return res
+    md = Metadata.from_file(d / 'metadata.json')
+    res.update({col: getattr(md, col) for col in METADATA_COLUMNS})
+    res['year'] = None if md.year is None else str(md.year)
+    res['metadata'] = json.dumps(dataclasses.asdict(md), ensure_ascii=False, sort_keys=True)
+    res['languages'], res['trees'] = [], []
+    if d.joinpath(SOURCES[1]).exists():
+        res['languages'] = [
+            (row['ID'], row.get('Name'), row.get('Glottocode') or None)
+            for row in reader(d / SOURCES[1], dicts=True)]
+    if d.joinpath(SOURCES[2]).exists():
+        for row in reader(d / SOURCES[2], dicts=True):
+            values = [next((row[c] for c in cols if c in row), None) for cols in TREE_COLUMNS]
+            res['trees'].append(tuple(values[:4]) + (
+                _bool(values[4]),
+                values[5] or None,
+                values[6] or None,
+                values[7] or None,
+                values[8] or None,
+                _bool(values[9])))
+    return res
+
+
+class Index:
+    """
+    An SQLite database indexing phlorest datasets.
+    """
+    def __init__(self, path: PathType):
+        self.path = pathlib.Path(path)
+        self.db = sqlite3.connect(str(self.path))
+        self.db.execute('PRAGMA foreign_keys = ON')
+        if self.db.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            # An index built with an older schema is simply rebuilt.
+            self.db.executescript(
+                'DROP TABLE IF EXISTS tree; DROP TABLE IF EXISTS language; '
+                'DROP TABLE IF EXISTS dataset;')
+            self.db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Close the database connection."""
+        self.db.close()
+
+    def query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        """Run an SQL query against the index."""
+        return self.db.execute(sql, params).fetchall()
+
+    def update(
+            self,
+            directories: Iterable[PathType],
+            workers: Optional[int] = None,
+            log: Optional[logging.Logger] = None,
+    ) -> dict[str, int]:
+        """
+        Add or update the datasets found in `directories`.
+
+        Datasets whose files have the same size and modification time as when they were indexed
+        are skipped. For others, the content hash is computed and compared, and only datasets with
+        changed content are re-read - in parallel, using `workers` processes.
+
+        :return: Counts of `added`, `updated`, `unchanged` and `removed` datasets.
+        """
+        counts = {'added': 0, 'updated': 0, 'unchanged': 0, 'removed': 0}
+        known = {
+            row[0]: row[1:] for row in self.query(
+                'SELECT directory, fingerprint, hash FROM dataset')}
+        todo = []
+        for d in find_datasets(directories):
+            fp, hash_ = known.get(str(d.resolve()), (None, None))
+            if fp == fingerprint(d):
+                counts['unchanged'] += 1
+            else:
+                todo.append((d, hash_))
+
+        args = (
+            [d for d, _ in todo],
+            [hash_ for _, hash_ in todo])
+        if workers and workers > 1 and len(todo) > 1:
+            with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+                results = list(executor.map(scan_dataset, *args))
+        else:
+            results = map(scan_dataset, *args)
+
+        for (_, hash_), res in zip(todo, results):
+            if res['hash'] == hash_:
+                self.db.execute(
+                    'UPDATE dataset SET fingerprint = ? WHERE directory = ?',
+                    (res['fingerprint'], res['directory']))
+                counts['unchanged'] += 1
+                continue
+            counts['updated' if hash_ else 'added'] += 1
+            self._write(res)
+            if log:
+                log.info('indexed %s', res['id'])
+
+        for directory in known:
+            if not pathlib.Path(directory).joinpath('metadata.json').exists():
+                self.db.execute('DELETE FROM dataset WHERE directory = ?', (directory,))
+                counts['removed'] += 1
+        self.db.commit()
+        return counts
+
+    def _write(self, res: dict[str, Any]):
+        self.db.execute('DELETE FROM dataset WHERE directory = ?', (res['directory'],))
+        cols = ['directory', 'id', 'fingerprint', 'hash', 'metadata'] + list(METADATA_COLUMNS)
+        self.db.execute(
+            f"INSERT INTO dataset ({','.join(cols)}) VALUES ({','.join('?' * len(cols))})",
+            [res[col] for col in cols])
+        self.db.executemany(
+            'INSERT INTO language VALUES (?, ?, ?, ?, ?)',
+            [(res['directory'], res['id']) + row for row in res['languages']])
+        self.db.executemany(
+            'INSERT INTO tree VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(res['directory'], res['id']) + row for row in res['trees']])
@@ -1,25 +1,50 @@
 """
-Functionality to write trees to Nexus files in a standardized way.
+Functionality to write trees and character data to Nexus files in a standardized way.
 """
-import copy
+import io
+import os
+import copyreg
+import shutil
+import pickle
+import hashlib
+import contextlib
+import random
 import logging
+import tempfile
+import itertools
+import collections
 import pathlib
 import zipfile
 import functools
 import dataclasses
-from typing import Optional, Union
+import concurrent.futures
+from typing import Optional, Union, Any, Callable, BinaryIO
+from collections.abc import Hashable, Iterable, Container, Generator
 
+import numpy as np
 import newick
 from commonnexus import Nexus
 from commonnexus.blocks import Trees
+from commonnexus.blocks.characters import GAP
+from commonnexus.tokenizer import Word, Token
 
+from .scan import iter_blocks
 from .metadata import RESCALE_TO_YEARS, YearMultiplesType
+from .arraytree import ArrayTree, TreeStats, Pruner
 
-__all__ = ['NexusFile', 'Tree', 'rescale_to_years', 'norm_taxon_name']
+__all__ = ['NexusFile', 'Tree', 'rescale_to_years', 'norm_taxon_name', 'index_path',
+           'TreeCache', 'SpillList', 'CharacterData', 'Splits', 'rf_distances',
+           'sampled_rf_distances', 'prune_trees', 'write_if_changed', 'zip_info', 'LazyNexus']
 
 PathType = Union[str, pathlib.Path]
+#: Timestamp of members of zip archives - the earliest date representable in the ZIP format.
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
 TreeType = Union['Tree', str, newick.Node]
 
+# `commonnexus` tokens are frozen dataclasses with slots, which cannot be unpickled - but `Nexus`
+# objects must be picklable to be memoised (see `PhlorestDir.memo`) or passed to other processes.
+copyreg.pickle(Token, lambda t: (Token, (t.text, t.type)))
+
 
 def norm_taxon_name(s: Optional[str]) -> Optional[str]:
     """
@@ -74,74 +99,816 @@ class Tree:
         return self.newick if isinstance(self.newick, str) else f'{self.newick.newick};'
 
 
+class LazyNexus(Nexus):
+    """
+    A `Nexus` object, parsing - i.e. tokenizing - blocks only when they are first accessed.
+
+    Blocks are located with a lightweight scan of the NEXUS content (see `phlorest.scan`). Only
+    blocks listed in `blocks` are kept, all others are skipped without tokenizing them.
+
+    .. code-block:: python
+
+        >>> nex = LazyNexus(text, blocks=['TAXA', 'TREES'])
+        >>> nex.TREES  # Only now the TREES block is parsed.
+
+    Accessing a block as attribute - like `nex.TREES` or via convenience properties like \
+    `nex.characters` - parses just this block. Methods which operate on all blocks, like \
+    `iter_blocks` or `str`, parse all selected blocks first. Iterating over the object itself \
+    only yields commands of blocks parsed so far - call `load()` before.
+    """
+    def __init__(self, text: str, blocks: Optional[Iterable[str]] = None, **kw):
+        Nexus.__init__(self, **kw)
+        names = {name.upper() for name in blocks} if blocks is not None else None
+        # List of blocks as pairs (name, text or list of commands once parsed):
+        self._blocks = [
+            [name, text[start:end]] for name, start, end in iter_blocks(text)
+            if names is None or name in names]
+
+    def load(self, name: Optional[str] = None) -> 'LazyNexus':
+        """
+        Parse all blocks - or all blocks with name `name` - which haven't been parsed yet.
+        """
+        blocks = list.__getattribute__(self, '_blocks')
+        changed = False
+        for block in blocks:
+            if isinstance(block[1], str) and (name is None or block[0] == name):
+                block[1] = list(Nexus(
+                    '#NEXUS\n' + block[1], config=list.__getattribute__(self, 'cfg')))
+                changed = True
+        if changed:
+            list.__init__(self, itertools.chain.from_iterable(
+                block[1] for block in blocks if not isinstance(block[1], str)))
+        return self
+
+    def __getattribute__(self, name: str) -> Any:
+        if name.isupper():
+            LazyNexus.load(self, name)
+        return Nexus.__getattribute__(self, name)
+
+    def iter_blocks(self):
+        self.load()
+        yield from Nexus.iter_blocks(self)
+
+    def __str__(self):
+        return Nexus.__str__(self.load())
+
+
+def index_path(path: PathType) -> pathlib.Path:
+    """
+    The path of the index of the Nexus file `path` - or the member name within a zip archive.
+    """
+    path = pathlib.Path(path)
+    return path.parent / (path.name + '.idx')
+
+
+def zip_info(name: str) -> zipfile.ZipInfo:
+    """
+    Metadata for a (deflated) zip archive member with a fixed timestamp - to make archives with
+    the same content byte-identical.
+    """
+    info = zipfile.ZipInfo(name, date_time=ZIP_DATE_TIME)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = 0o644 << 16
+    return info
+
+
+class _HashingWriter:
+    """
+    A minimal - unseekable - binary file object, computing the hash of the content written to it.
+    """
+    def __init__(self, f: BinaryIO):
+        self._f = f
+        self.hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        """Write (and hash) `data`."""
+        self.hash.update(data)
+        self.size += len(data)
+        return self._f.write(data)
+
+    def tell(self) -> int:
+        """The number of bytes written so far."""
+        return self.size
+
+    def flush(self):
+        """Flush the underlying file."""
+        self._f.flush()
+
+
+@contextlib.contextmanager
+def write_if_changed(path: PathType) -> Generator[BinaryIO, None, None]:
+    """
+    Context manager yielding a (write-only, unseekable) binary file object to write the content of
+    `path` to.
+
+    Content is written to a temporary file, hashing it as it streams out. The temporary file only
+    replaces an existing file at `path` if sizes or hashes differ. Thus, rebuilding unchanged
+    outputs does not touch the files.
+    """
+    path = pathlib.Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            writer = _HashingWriter(f)
+            yield writer
+        if path.exists() and path.stat().st_size == writer.size:
+            digest = hashlib.sha256()
+            with path.open('rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            if digest.hexdigest() == writer.hash.hexdigest():
+                return
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class TreeCache:
+    """
+    A bounded LRU cache for the results of processing trees, keyed by Newick string (for parsed
+    and normalised trees) or by the set of node names (for validation results).
+
+    Since trees are keyed by the exact Newick string - including branch lengths - processing only
+    hits the cache for samples containing identical trees, e.g. samples of topologies. Validation
+    results, on the other hand, are shared by all trees with the same node names. Thus, hits and
+    misses are counted separately for each kind of lookup.
+    """
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        #: Counts of hits and misses, keyed by pairs (kind of lookup, `hits` or `misses`).
+        self.counts = collections.Counter()
+        self._items = collections.OrderedDict()
+
+    @property
+    def hits(self) -> int:
+        """Total number of cache hits."""
+        return sum(n for (_, what), n in self.counts.items() if what == 'hits')
+
+    @property
+    def misses(self) -> int:
+        """Total number of cache misses."""
+        return sum(n for (_, what), n in self.counts.items() if what == 'misses')
+
+    def get(self, key: Hashable, default: Any = None, kind: str = 'tree') -> Any:
+        """
+        Return the cached value for `key` and mark it as most recently used.
+
+        :param kind: The kind of lookup to count the hit or miss for.
+        """
+        if key in self._items:
+            self.counts[kind, 'hits'] += 1
+            self._items.move_to_end(key)
+            return self._items[key]
+        self.counts[kind, 'misses'] += 1
+        return default
+
+    def set(self, key: Hashable, value: Any) -> Any:
+        """Cache `value` under `key`, evicting the least recently used items if necessary."""
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+        return value
+
+    def __len__(self):
+        return len(self._items)
+
+    def __str__(self):
+        counts = '; '.join(
+            f"{kind} hits={self.counts[kind, 'hits']} misses={self.counts[kind, 'misses']}"
+            for kind in sorted({kind for kind, _ in self.counts}))
+        return f"cache {counts or 'hits=0 misses=0'}"
+
+
+class SpillList:
+    """
+    An append-only list which keeps at most `budget` bytes of (pickled) items in memory, spilling
+    items to a temporary file on disk when the budget is exceeded.
+
+    Iterating over a `SpillList` yields the items in the order they were appended.
+    """
+    def __init__(self, budget: int):
+        self.budget = budget
+        self._buffer = io.BytesIO()
+        self._spilled = None
+        self._len = 0
+
+    def append(self, item: Any):
+        """Append an item."""
+        pickle.dump(item, self._buffer, protocol=pickle.HIGHEST_PROTOCOL)
+        self._len += 1
+        if self._buffer.tell() > self.budget:
+            if self._spilled is None:
+                self._spilled = tempfile.TemporaryFile()  # pylint: disable=R1732
+            self._spilled.write(self._buffer.getbuffer())
+            self._buffer = io.BytesIO()
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        if self._spilled is not None:
+            self._spilled.seek(0)
+            yield from self._iter_pickled(self._spilled)
+            self._spilled.seek(0, io.SEEK_END)
+        yield from self._iter_pickled(io.BytesIO(self._buffer.getbuffer()))
+
+    @staticmethod
+    def _iter_pickled(f):
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                break
+
+    def close(self):
+        """Remove the temporary file."""
+        if self._spilled is not None:
+            self._spilled.close()
+            self._spilled = None
+
+
 class NexusFile:
-    """A Nexus file as context manager, which will write to disk on exit."""
-    def __init__(self, path: PathType, zipped: bool = False):
-        self.path = path
-        self._trees = []
+    """
+    A Nexus file as context manager, which will write to disk on exit.
+
+    If `index` is `True`, an index mapping tree names to byte offset and length of the
+    corresponding TREE command in the (uncompressed) Nexus file is written as well - as sidecar
+    file `<name>.idx` or as additional member of the zip archive. See
+    :class:`phlorest.archive.TreeArchive` for how to make use of such an index.
+
+    Trees passed as Newick strings are processed using a `TreeCache`, thus repeated trees - i.e.
+    identical Newick strings - are parsed and normalised only once, and trees with the same node
+    names are validated only once.
+
+    If `translate` is `True`, a TRANSLATE command mapping integer tokens to taxon names is written
+    and leaf labels in the trees are replaced with these tokens. This reduces file size
+    considerably for big posterior samples with long taxon names.
+
+    If a `memory_budget` (in bytes) is specified, serialised trees exceeding the budget are spilled
+    to a temporary file, and only merged into the Nexus file on exit. Note that the budget only
+    covers the serialised trees: The `TreeCache` holds up to `cache.maxsize` processed trees on
+    top of it - so pass a smaller cache for very big trees.
+
+    If `append` is `True`, trees are added to an existing zip archive rather than replacing it:
+    They are written to a new Nexus file within the archive (see `NexusFile.member`), thus the
+    existing content is neither decompressed nor re-parsed. This requires an existing archive
+    with an index for each Nexus file in it.
+    """
+    def __init__(  # pylint: disable=R0913,R0917
+            self,
+            path: PathType,
+            zipped: bool = False,
+            index: bool = False,
+            cache: Optional[TreeCache] = None,
+            translate: bool = False,
+            memory_budget: Optional[int] = None,
+            append: bool = False,
+    ):
+        self.path = pathlib.Path(path)
+        self._trees: Union[list, SpillList] = SpillList(memory_budget) if memory_budget else []
         self.scaling = None
         self.zipped = zipped
+        self.index = index
+        self.cache = cache if cache is not None else TreeCache()
+        self._translate = None  # Maps normalised taxon names to tokens.
+        self._tokens = {}  # Maps leaf labels to pairs (normalised taxon name, token).
+        self._scope = object()  # Scopes cached results which depend on the token assignment.
+        self.translate = translate
+        #: Names of the Nexus files in the existing zip archive we append to.
+        self.members: list[str] = []
+        #: Number of trees in the existing zip archive we append to.
+        self.archived = 0
+        if append:
+            if not zipped:
+                raise ValueError('Only zipped Nexus files can be appended to.')
+            if not self.archive.exists():
+                raise ValueError(f'No archive to append to: {self.archive}')
+            with zipfile.ZipFile(self.archive) as zf:
+                names = zf.namelist()
+                self.members = [name for name in names if not name.endswith('.idx')]
+                for member in self.members:
+                    # Counting trees without an index would require decompressing the member.
+                    if index_path(member).name not in names:
+                        raise ValueError(f'Cannot append to archive without index for {member}')
+                    self.archived += zf.read(index_path(member).name).count(b'\n')
+
+    @property
+    def archive(self) -> pathlib.Path:
+        """The path of the zip archive for zipped Nexus files."""
+        return self.path.parent / (self.path.name + '.zip')
+
+    @property
+    def member(self) -> str:
+        """
+        The name of the Nexus file to write - within the zip archive for zipped Nexus files. When
+        appending to an archive, this is a new name like `posterior_2.trees`.
+        """
+        name, i = self.path.name, 1
+        while name in self.members:
+            i += 1
+            name = f'{self.path.stem}_{i}{self.path.suffix}'
+        return name
+
+    @property
+    def translate(self) -> bool:
+        """Flag signaling whether trees are written with a TRANSLATE command."""
+        return self._translate is not None
+
+    @translate.setter
+    def translate(self, value: bool):
+        if self._trees and value != self.translate:
+            raise ValueError('TRANSLATE mode can only be changed before adding trees.')
+        self._translate = {} if value else None
+
+    @property
+    def translate_mapping(self) -> dict[str, str]:
+        """Maps TRANSLATE tokens to taxon names."""
+        return {token: name for name, token in (self._translate or {}).items()}
+
+    def __len__(self):
+        return len(self._trees)
 
-    def _get_tree(self, tree, tid, rooted) -> tuple[newick.Node, str, Optional[bool]]:
+    def __iter__(self) -> Generator[Tree, None, None]:
+        """
+        Yields the trees added so far - with TRANSLATE tokens as leaf labels in translate mode.
+        """
+        for tid, nwk, rooted in self._trees:
+            yield Tree(tid, f'{nwk};', rooted)
+
+    def _token(self, node: newick.Node) -> tuple[str, str]:
+        """Look up - or assign - the TRANSLATE token for the label of a leaf node."""
+        if node.name not in self._tokens:
+            taxon = norm_taxon_name(node.unquoted_name)
+            self._tokens[node.name] = (
+                norm_taxon_name(node.name),
+                self._translate.setdefault(taxon, str(len(self._translate) + 1)))
+        return self._tokens[node.name]
+
+    @staticmethod
+    def _get_tree(tree, tid, rooted) -> tuple[Union[str, newick.Node], str, Optional[bool]]:
         if isinstance(tree, Tree):
             tid = tid or tree.name
             rooted = rooted or tree.rooted
             tree = tree.newick
-        if isinstance(tree, str):
-            tree = newick.loads(tree)[0]
-        assert isinstance(tree, newick.Node)
+        assert isinstance(tree, (str, newick.Node))
         return tree, tid, rooted
 
+    def _normalise(
+            self,
+            tree: Union[str, newick.Node],
+    ) -> tuple[str, Optional[str], tuple, TreeStats]:
+        """
+        Normalise taxon names in a tree.
+
+        :return: A quadruple (Newick string, name of the root, node names keyed for validation, \
+        tree statistics).
+        """
+        if isinstance(tree, str):
+            # With TRANSLATE, the result depends on the token assignment of this NexusFile.
+            key = (tree, self._scope) if self.translate else tree
+            res = self.cache.get(key)
+            if res is None:
+                res = self.cache.set(key, self._normalise(newick.loads(tree)[0]))
+            return res
+
+        leafs, nodes, labels = [], [], []
+        for node in tree.walk():
+            if node.is_leaf:
+                assert node.name
+                if self.translate:
+                    # Tokens are only substituted for serialisation - the caller's tree keeps
+                    # the taxon names.
+                    labels.append((node, node.name))
+                    name, node.name = self._token(node)
+                else:
+                    name = node.name = norm_taxon_name(node.name)
+                if name != 'root':
+                    leafs.append(name)
+            elif node.name:
+                node.name = norm_taxon_name(node.name)
+                if node.name != 'root':
+                    nodes.append(node.name)
+        nwk = tree.newick
+        for node, label in labels:
+            node.name = label
+        return (
+            nwk,
+            tree.name,
+            (tuple(sorted(leafs)), tuple(sorted(nodes))),
+            ArrayTree.from_newick(tree).stats())
+
+    def _validate(
+            self,
+            names: tuple,
+            lids: Union[list[str], set[str]],
+    ) -> tuple[list[str], list[str], frozenset]:
+        """
+        Validate the node names of a tree against the taxa in LanguageTable.
+
+        :return: A triple (undefined leaf names, undefined inner node names, unused taxa).
+        """
+        lids = frozenset(lids)
+        res = self.cache.get((names, lids), kind='validation')
+        if res is None:
+            leafs, nodes, seen = [], [], set()
+            for name, is_leaf in itertools.chain(
+                    ((n, True) for n in names[0]), ((n, False) for n in names[1])):
+                if name in seen or name not in lids:
+                    (leafs if is_leaf else nodes).append(name)
+                seen.add(name)
+            res = self.cache.set((names, lids), (leafs, nodes, lids - seen))
+        return res
+
     def append(self,  # pylint: disable=R0917,R0913
                tree: Union[Tree, str, newick.Node],
                tid: str,
                lids: Union[list[str], set[str]],
                scaling,
                log: logging.Logger,
-               rooted: Optional[bool] = None):
-        """Add a tree."""
+               rooted: Optional[bool] = None) -> TreeStats:
+        """
+        Add a tree.
+
+        :return: Summary statistics of the tree, computed while it is parsed anyway.
+        """
         tree, tid, rooted = self._get_tree(tree, tid, rooted)
-        tree.visit(norm_taxon_name_visitor)
+        nwk, root, names, stats = self._normalise(tree)
 
-        with_lids = bool(lids)
-        if with_lids:
-            lids = copy.copy(lids)
-        for node in tree.walk():
-            if node.name == 'root':
-                continue
-            if node.is_leaf:
-                assert node.name
-            if node.name and with_lids:
-                try:
-                    lids.remove(node.name)
-                except (ValueError, KeyError):  # set.remove may raise KeyError!
-                    if node.is_leaf:
-                        log.error('%s references undefined leaf %s', tree.name, node.name)
-                    else:  # pragma: no cover
-                        log.warning('%s references undefined inner node %s', tree.name, node.name)
-
-        if with_lids and lids:
-            log.warning('extra taxa specified in LanguageTable: %s', lids)
+        if lids:
+            leafs, nodes, extra = self._validate(names, lids)
+            for name in leafs:
+                log.error('%s references undefined leaf %s', root, name)
+            for name in nodes:  # pragma: no cover
+                log.warning('%s references undefined inner node %s', root, name)
+            if extra:
+                log.warning('extra taxa specified in LanguageTable: %s', set(extra))
 
         if self.scaling:
             if scaling != self.scaling:
                 raise ValueError('All trees in a NexusFile must have the same scaling!')
         else:  # First appended tree determines the scaling.
             self.scaling = scaling
-        self._trees.append((tid, tree, rooted))
+        self._trees.append((tid, nwk, rooted))
+        return stats
 
     def __enter__(self):
         return self
 
+    def _write(self, f: BinaryIO) -> list[tuple[str, int, int]]:
+        """
+        Write the TREES block to `f`, returning offset and length of each TREE command.
+        """
+        index, offset = [], 0
+        for line in ['#NEXUS\n', 'BEGIN TREES;\n']:
+            offset += f.write(line.encode('utf8'))
+        if self.translate:
+            offset += f.write(self._translate_command().encode('utf8'))
+        for tid, tree, rooted in self._trees:
+            rooting = '' if rooted is None else f"[&{'R' if rooted else 'U'}] "
+            line = f'tree {Word(tid).as_nexus_string()} = {rooting}{tree};\n'.encode('utf8')
+            index.append((tid, offset, len(line)))
+            offset += f.write(line)
+        f.write(b'END;\n')
+        return index
+
+    def _write_member(self, zf: zipfile.ZipFile, tmp: BinaryIO, index: list[tuple[str, int, int]]):
+        """Copy the Nexus content from `tmp` - and the index - to the zip archive."""
+        member, size = self.member, tmp.tell()
+        tmp.seek(0)
+        with zf.open(zip_info(member), 'w', force_zip64=size > zipfile.ZIP64_LIMIT) as f:
+            shutil.copyfileobj(tmp, f)
+        if self.index:
+            zf.writestr(zip_info(index_path(member).name), self._format_index(index))
+
+    @staticmethod
+    def _format_index(index: list[tuple[str, int, int]]) -> str:
+        return ''.join(f'{tid}\t{offset}\t{length}\n' for tid, offset, length in index)
+
+    def _translate_command(self) -> str:
+        """
+        Format the TRANSLATE command, with one mapping per line - as written by BEAST - to make
+        sure R packages like `ape` can read it.
+        """
+        mappings = ',\n'.join(
+            f'\t\t{token} {Word(name).as_nexus_string()}'
+            for name, token in sorted(self._translate.items(), key=lambda i: int(i[1])))
+        return f'\tTRANSLATE\n{mappings}\n\t\t;\n'
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self._trees:
-            nex = Nexus.from_blocks(Trees.from_data(*self._trees, lowercase_command=True))
-            nex.to_file(self.path)
             if self.zipped:
-                with zipfile.ZipFile(
-                    self.path.parent / (self.path.name + '.zip'),
-                    'w',
-                    compression=zipfile.ZIP_DEFLATED
-                ) as zf:
-                    zf.write(self.path, self.path.name)
-                self.path.unlink()
+                with tempfile.TemporaryFile() as tmp:
+                    index = self._write(tmp)
+                    if self.members:  # Append a new member to the existing archive.
+                        with zipfile.ZipFile(self.archive, 'a') as zf:
+                            self._write_member(zf, tmp, index)
+                    else:
+                        with write_if_changed(self.archive) as f:
+                            with zipfile.ZipFile(f, 'w') as zf:
+                                self._write_member(zf, tmp, index)
+            else:
+                with write_if_changed(self.path) as f:
+                    index = self._write(f)
+                if self.index:
+                    with write_if_changed(index_path(self.path)) as f:
+                        f.write(self._format_index(index).encode('utf8'))
+        if isinstance(self._trees, SpillList):
+            self._trees.close()
+
+
+@dataclasses.dataclass
+class CharacterData:
+    """
+    Character data to be written to a Nexus file row by row - i.e. without materialising the full
+    normalised Nexus content in memory.
+
+    The output is the same as formatting the data with `commonnexus.tools.normalise`: A TAXA block
+    followed by a CHARACTERS (or DATA) block with a non-interleaved MATRIX. Since building the
+    blocks with `commonnexus` would require the full matrix in memory, the format is replicated
+    here - and tested against the output of `commonnexus`.
+    """
+    #: Pairs (taxon, states) where states are given either as `dict` mapping character labels to \
+    #: states (as in a `commonnexus` StateMatrix) or - more compact - as `str` of one-character \
+    #: states with `?` marking missing data and `-` gaps.
+    rows: Iterable[tuple[str, Union[str, dict]]]
+    #: Maps 1-based character numbers to character labels.
+    charlabels: dict[int, str]
+    #: Maps character labels to `dict`s of state labels.
+    statelabels: Optional[dict[str, dict[str, str]]] = None
+    block: str = 'CHARACTERS'
+
+    @classmethod
+    def from_nexus(cls, nex: Nexus) -> Optional['CharacterData']:
+        """
+        Read character data from a Nexus object - if writing it row by row results in the same
+        content as normalising the Nexus object, i.e. if the Nexus object contains nothing but
+        the character data and an optional TAXA block preceding it.
+        """
+        blocks = [block.name for block in nex.iter_blocks()]
+        if blocks not in (['CHARACTERS'], ['DATA'], ['TAXA', 'CHARACTERS'], ['TAXA', 'DATA']):
+            return None
+        charlabels, statelabels = nex.characters.get_charstatelabels()
+        return cls(
+            rows=nex.characters.get_matrix().items(),
+            charlabels=charlabels,
+            statelabels=statelabels,
+            block=blocks[-1])
+
+    def matrix(self) -> collections.OrderedDict:
+        """
+        The character data as `commonnexus` StateMatrix.
+        """
+        res = collections.OrderedDict()
+        for taxon, states in self.rows:
+            if isinstance(states, str):
+                states = collections.OrderedDict(
+                    (self.charlabels.get(i, str(i)), None if c == '?' else (GAP if c == '-' else c))
+                    for i, c in enumerate(states, start=1))
+            res[taxon] = states
+        return res
+
+    @staticmethod
+    def _format(states: Union[str, dict], symbols: set) -> str:
+        if isinstance(states, str):
+            symbols.update(states)
+            symbols.difference_update('?-')
+            return states
+
+        def symbol(c):
+            return '?' if c is None else ('-' if c == GAP else c)
+
+        row = []
+        for entry in states.values():
+            if entry:
+                symbols.update(entry)
+            if isinstance(entry, tuple):  # polymorphism
+                row.append(f"({''.join(symbol(c) for c in entry)})")
+            elif isinstance(entry, set):  # uncertainty
+                row.append(f"{{{''.join(sorted(symbol(c) for c in entry))}}}")
+            else:
+                row.append(symbol(entry))
+        symbols.discard(GAP)
+        return ''.join(row)
+
+    def _header(self, taxa: list[str], nchar: int, symbols: set) -> str:
+        symbols = ''.join(sorted(symbols))
+        if '?' in symbols or '-' in symbols:
+            raise ValueError(f'MISSING or GAP markers must be distinct from "{symbols}"')
+        respectcase = any(c.isupper() for c in symbols) and any(c.islower() for c in symbols)
+        lines = [
+            '#NEXUS',
+            'BEGIN TAXA;',
+            f'DIMENSIONS NTAX={len(taxa)};',
+            f"TAXLABELS {' '.join(taxa)};",
+            'END;',
+            f'BEGIN {self.block};',
+            f'DIMENSIONS NCHAR={nchar};',
+            f"FORMAT DATATYPE=STANDARD {'RESPECTCASE ' if respectcase else ''}"
+            f'MISSING=? GAP=- SYMBOLS="{symbols}";',
+        ]
+        if any(str(n) != label for n, label in self.charlabels.items()):
+            statelabels = self.statelabels or {}
+            lines.append('CHARSTATELABELS {};'.format(', '.join(  # pylint: disable=C0209
+                '\n    {} {}{}'.format(  # pylint: disable=C0209
+                    n,
+                    Word(label).as_nexus_string(),
+                    '/' + ' '.join(Word(sl).as_nexus_string() for sl in statelabels[label].values())
+                    if statelabels.get(label) else '')
+                for n, label in self.charlabels.items())))
+        lines.append('MATRIX ')
+        return '\n'.join(lines)
+
+    def write(
+            self,
+            path: PathType,
+            rename_taxa: Optional[Callable[[str], str]] = None,
+            taxa: Optional[Container[str]] = None,
+            encoding: str = 'utf8',
+    ) -> list[str]:
+        """
+        Write the character data to `path`.
+
+        Rows are formatted one at a time and buffered in a temporary file, because the header
+        of the CHARACTERS block (listing the symbols) and the padding of taxon labels can only be
+        computed after all rows have been read.
+
+        :param rename_taxa: Callable to compute the taxon label to write from the original label.
+        :param taxa: Container of valid taxon labels.
+        :return: The list of (renamed) taxa.
+        """
+        labels, symbols, nchar = [], set(), None
+        with tempfile.TemporaryFile('w+', encoding=encoding) as rows:
+            for taxon, states in self.rows:
+                labels.append(rename_taxa(taxon) if rename_taxa else taxon)
+                if nchar is None:
+                    nchar = len(states)
+                rows.write(self._format(states, symbols) + '\n')
+            assert taxa is None or all(t in taxa for t in labels), \
+                f"Taxa in nexus not in taxa.csv: {[t for t in labels if t not in taxa]}"
+
+            words = [Word(t).as_nexus_string() for t in labels]
+            maxlen = max(len(w) for w in words)
+            rows.seek(0)
+            with write_if_changed(path) as f:
+                f.write(self._header(words, nchar, symbols).encode(encoding))
+                for word, row in zip(words, rows):
+                    f.write(f'\n{word.ljust(maxlen)} {row[:-1]}'.encode(encoding))
+                f.write('\n;\nEND;\n'.encode(encoding))
+        return labels
+
+
+@dataclasses.dataclass
+class Splits:
+    """
+    The splits (a.k.a. bipartitions) of a tree, encoded as integer bit masks over an ordered list
+    of taxa. Since splits are unrooted, each split is represented by the mask of the side which
+    does not contain the first taxon of the tree.
+    """
+    #: Maps split masks - including the trivial ones, i.e. terminal branches - to branch lengths.
+    lengths: dict[int, float]
+    #: The non-trivial splits.
+    nontrivial: frozenset
+
+    @classmethod
+    def from_tree(cls, tree: TreeType, taxa: dict[str, int]) -> 'Splits':
+        """
+        :param taxa: Maps taxon names to bit positions - e.g. `{t: i for i, t in enumerate(lids)}`.
+        """
+        if isinstance(tree, Tree):
+            tree = tree.newick
+        tree = ArrayTree.from_newick(tree)
+        parent, lengths = tree.parent.tolist(), np.nan_to_num(tree.lengths).tolist()
+        masks = [0] * len(parent)
+        for i in tree.tips.tolist():
+            try:
+                masks[i] = 1 << taxa[norm_taxon_name(tree.names[i])]
+            except KeyError as e:
+                raise ValueError(f'Unknown taxon {tree.names[i]}') from e
+        for i in range(len(parent) - 1, 0, -1):  # Accumulate masks in postorder.
+            masks[parent[i]] |= masks[i]
+        full = masks[0]
+        first = full & -full
+        splits = {}
+        for mask, length in zip(masks[1:], lengths[1:]):
+            if mask & first:
+                mask ^= full
+            if mask:  # Branches to a bifurcating root represent the same split.
+                splits[mask] = splits.get(mask, 0) + length
+        return cls(
+            splits,
+            frozenset(m for m in splits if 1 < bin(m).count('1') < bin(full).count('1') - 1))
+
+    def rf(self, other: 'Splits') -> int:
+        """The Robinson-Foulds distance, i.e. the number of non-trivial splits not shared."""
+        return len(self.nontrivial ^ other.nontrivial)
+
+    def weighted_rf(self, other: 'Splits') -> float:
+        """The weighted Robinson-Foulds distance, i.e. the sum of branch length differences."""
+        return sum(
+            abs(self.lengths.get(m, 0) - other.lengths.get(m, 0))
+            for m in self.lengths.keys() | other.lengths.keys())
+
+
+def _rf_distances(
+        reference: Splits,
+        taxa: dict[str, int],
+        trees: list[TreeType],
+) -> list[tuple[int, float]]:
+    res = []
+    for tree in trees:
+        splits = Splits.from_tree(tree, taxa)
+        res.append((reference.rf(splits), reference.weighted_rf(splits)))
+    return res
+
+
+def rf_distances(
+        reference: TreeType,
+        trees: Iterable[TreeType],
+        taxa: dict[str, int],
+        processes: Optional[int] = None,
+        chunksize: int = 500,
+        tree_taxa: Optional[dict[str, int]] = None,
+) -> Generator[tuple[int, float], None, None]:
+    """
+    Compute (weighted) Robinson-Foulds distances between a reference tree - typically the summary
+    tree - and a stream of trees - typically the posterior sample.
+
+    :param taxa: Maps taxon names to bit positions.
+    :param processes: Number of worker processes to use (`None` means no process pool).
+    :param tree_taxa: Maps the leaf labels of `trees` to bit positions, if these are different \
+    from the leaf labels of `reference` - e.g. TRANSLATE tokens.
+    :return: Generator of pairs (RF distance, weighted RF distance) in the order of `trees`.
+    """
+    reference = Splits.from_tree(reference, taxa)
+    taxa = taxa if tree_taxa is None else tree_taxa
+
+    def chunks(it):
+        while True:
+            chunk = [str(t) if isinstance(t, Tree) else t for t in itertools.islice(it, chunksize)]
+            if not chunk:
+                break
+            yield chunk
+
+    if not processes:
+        for chunk in chunks(iter(trees)):
+            yield from _rf_distances(reference, taxa, chunk)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        for res in executor.map(
+                functools.partial(_rf_distances, reference, taxa), chunks(iter(trees))):
+            yield from res
+
+
+def sampled_rf_distances(
+        trees: Iterable[TreeType],
+        taxa: dict[str, int],
+        n: int = 1000,
+        seed: int = 1,
+        ntrees: Optional[int] = None,
+) -> list[tuple[int, int, int, float]]:
+    """
+    Compute (weighted) Robinson-Foulds distances for a random sample of pairs of trees, e.g. to
+    assess the variability in a posterior sample.
+
+    The trees are read in one pass, keeping only the splits of the sampled trees in memory.
+
+    :param ntrees: Number of trees - required if `trees` is not a `Sequence`.
+    :return: List of quadruples (index of first tree, index of second tree, RF distance, weighted \
+    RF distance).
+    """
+    ntrees = len(trees) if ntrees is None else ntrees
+    if ntrees < 2:
+        return []
+    rng = random.Random(seed)
+    pairs = [tuple(sorted(rng.sample(range(ntrees), 2))) for _ in range(n)]
+    sampled = {i for pair in pairs for i in pair}
+    splits = {i: Splits.from_tree(tree, taxa) for i, tree in enumerate(trees) if i in sampled}
+    return [(i, j, splits[i].rf(splits[j]), splits[i].weighted_rf(splits[j])) for i, j in pairs]
+
+
+def prune_trees(
+        trees: Iterable[TreeType],
+        keep: Container[str],
+) -> Generator[TreeType, None, None]:
+    """
+    Prune a stream of trees - e.g. as returned by `PhlorestDir.read_trees` - to the subtrees
+    induced by the taxa in `keep`, collapsing unary nodes and summing their branch lengths.
+
+    Trees are yielded in the same form as they are passed, but with `newick.Node` objects
+    reparsed from the pruned Newick string. See `phlorest.arraytree.Pruner` for details.
+
+    .. code-block:: python
+
+        >>> trees = prune_trees(ds.raw_dir.read_trees('posterior.trees'), {'Jeju', 'NorthJeolla'})
+    """
+    pruner = Pruner(keep)
+    for tree in trees:
+        if isinstance(tree, Tree):
+            yield Tree(tree.name, pruner(str(tree)), tree.rooted)
+        elif isinstance(tree, str):
+            yield pruner(tree)
+        else:
+            yield newick.loads(pruner(f'{tree.newick};'))[0]
@@ -0,0 +1,107 @@
+"""
+Lightweight scanning of NEXUS content.
+
+Tokenizing NEXUS with `commonnexus` is expensive for big files. Often, though, we only need to know
+where commands start and end - e.g. to count the trees in a posterior sample or to read their names
+to determine the burn-in - or where blocks start and end, to skip blocks we are not interested in.
+This can be done with a regular expression which only knows about the
+NEXUS constructs which may contain semicolons, i.e. comments and quoted words.
+"""
+import re
+import dataclasses
+from typing import Optional
+from collections.abc import Generator, Container, Iterable
+
+__all__ = [
+    'iter_commands', 'iter_blocks', 'select_blocks', 'scan_trees', 'select_trees', 'TreeSpan']
+
+# A command is a sequence of "normal" characters, comments and quoted words, terminated by ";".
+# (The pattern is "unrolled" to avoid catastrophic backtracking.)
+COMMAND = re.compile(r"[^;\['\"]*(?:(?:\[[^\]]*]|'[^']*'|\"[^\"]*\")[^;\['\"]*)*;")
+COMMAND_NAME = re.compile(
+    r"\s*(?:#NEXUS)?\s*(?:\[[^\]]*]\s*)*(?P<name>[a-z]+)", flags=re.IGNORECASE)
+TREE_NAME = re.compile(
+    r"\s*(?:\[[^\]]*]\s*)*tree\s+(?:\*\s*)?(?P<name>'(?:[^']|'')*'|[^\s=]+)", flags=re.IGNORECASE)
+BLOCK_NAME = re.compile(
+    r"\s*(?:#NEXUS)?\s*(?:\[[^\]]*]\s*)*(?P<begin>begin)\s+(?P<name>[^\s;]+)",
+    flags=re.IGNORECASE)
+STATE = re.compile(r'STATE_(?P<state>[0-9]+)$')
+
+
+def iter_commands(text: str) -> Generator[tuple[str, int, int], None, None]:
+    """
+    Yields triples (uppercase command name, start, end) for the commands in NEXUS content.
+    """
+    for m in COMMAND.finditer(text):
+        name = COMMAND_NAME.match(text, m.start())
+        yield name.group('name').upper() if name else '', m.start(), m.end()
+
+
+def iter_blocks(text: str) -> Generator[tuple[str, int, int], None, None]:
+    """
+    Yields triples (uppercase block name, start, end) for the blocks in NEXUS content, where
+    `text[start:end]` is the block from `BEGIN` up to and including the semicolon of `END`.
+    """
+    name, start = None, None
+    for cmd, cstart, end in iter_commands(text):
+        if cmd == 'BEGIN':
+            m = BLOCK_NAME.match(text, cstart)
+            name, start = m.group('name').upper(), m.start('begin')
+        elif cmd in ('END', 'ENDBLOCK') and name:
+            yield name, start, end
+            name = None
+
+
+def select_blocks(text: str, names: Iterable[str]) -> str:
+    """
+    Remove the blocks not listed in `names` from NEXUS content - without tokenizing any of it.
+
+    :param names: Names of the blocks to keep.
+    """
+    names = {n.upper() for n in names}
+    return '#NEXUS\n' + '\n'.join(
+        text[start:end] for name, start, end in iter_blocks(text) if name in names)
+
+
+@dataclasses.dataclass
+class TreeSpan:
+    """The location of a TREE command in NEXUS content."""
+    name: str
+    start: int
+    end: int
+
+    @property
+    def state(self) -> Optional[int]:
+        """The MCMC state for trees named like `STATE_<n>` as is common with BEAST."""
+        m = STATE.search(self.name)
+        return int(m.group('state')) if m else None
+
+
+def scan_trees(text: str) -> list[TreeSpan]:
+    """
+    Locate the TREE commands in NEXUS content - without parsing any Newick.
+    """
+    res = []
+    for name, start, end in iter_commands(text):
+        if name == 'TREE':
+            tree_name = TREE_NAME.match(text, start).group('name')
+            if tree_name.startswith("'"):
+                tree_name = tree_name[1:-1].replace("''", "'")
+            res.append(TreeSpan(tree_name, start, end))
+    return res
+
+
+def select_trees(text: str, spans: list[TreeSpan], selected: Container[int]) -> str:
+    """
+    Remove the TREE commands not listed in `selected` from NEXUS content.
+
+    :param spans: The TREE commands in `text` as returned by `scan_trees`.
+    :param selected: Indices of the TREE commands to keep.
+    """
+    chunks, pos = [], 0
+    for i, span in enumerate(spans):
+        if i not in selected:
+            chunks.append(text[pos:span.start])
+            pos = span.end
+    chunks.append(text[pos:])
+    return ''.join(chunks)
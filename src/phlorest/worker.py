@@ -0,0 +1,221 @@
+"""
+A long-lived local worker process, building and checking datasets on request - to take Python
+startup, heavy imports and Glottolog loading out of the edit-build cycle of curating a dataset.
+
+The worker keeps
+
+- all imported modules - only the dataset's `cldfbench_*.py` module is re-loaded for each request,
+- a Glottolog API caching `Languoid` objects,
+- parsed raw data - memoised by `PhlorestDir.read_nexus` and `PhlorestDir.read_trees` keyed by \
+  file content and read options.
+
+Start the worker with
+
+.. code-block:: shell
+
+    phlorest worker --glottolog-version v5.0
+
+and send requests with the thin client - which does not import any of the heavy dependencies:
+
+.. code-block:: shell
+
+    python -m phlorest.worker build path/to/dataset
+    python -m phlorest.worker check path/to/dataset
+
+Requests and responses are JSON objects, sent as one line of text over a Unix socket.
+"""
+import io
+import sys
+import json
+import time
+import socket
+import logging
+import pathlib
+import argparse
+import contextlib
+import socketserver
+from typing import Optional, Any
+
+import platformdirs
+
+__all__ = ['Worker', 'request', 'DEFAULT_SOCKET', 'main']
+
+DEFAULT_SOCKET = pathlib.Path(platformdirs.user_cache_dir('cldf')) / 'phlorest-worker.sock'
+COMMANDS = ('build', 'check', 'ping', 'stop')
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            req = json.loads(self.rfile.readline().decode('utf8'))
+            res = self.server.dispatch(req)
+        except Exception as e:  # pylint: disable=W0718
+            res = {'success': False, 'error': f'{e.__class__.__name__}: {e}'}
+        self.wfile.write(json.dumps(res).encode('utf8') + b'\n')
+
+
+class Worker(socketserver.UnixStreamServer):
+    """
+    A server handling build and check requests - one at a time.
+    """
+    def __init__(
+            self,
+            path: Optional[pathlib.Path] = None,
+            glottolog: Optional[pathlib.Path] = None,
+            memo_size: int = 2 ** 30,
+    ):
+        """
+        :param path: Path of the Unix socket to listen on.
+        :param glottolog: Path to a Glottolog clone, checked out at the desired version.
+        :param memo_size: Maximal size in bytes of parsed raw data to keep in memory.
+        """
+        from phlorest import batch  # pylint: disable=C0415
+        from phlorest.cache import MemoryCache  # pylint: disable=C0415
+        from phlorest.dataset import PhlorestDir  # pylint: disable=C0415
+
+        self.path = pathlib.Path(path or DEFAULT_SOCKET)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            if _alive(self.path):
+                raise ValueError(f'A worker is already listening on {self.path}')
+            self.path.unlink()  # A stale socket of a worker which did not shut down cleanly.
+        batch._init_worker(str(glottolog) if glottolog else None)  # pylint: disable=W0212
+        PhlorestDir.memo = MemoryCache(memo_size)
+        self.requests, self.stopped = 0, False
+        socketserver.UnixStreamServer.__init__(self, str(self.path), _Handler)
+
+    def serve(self):
+        """Handle requests until a `stop` request is received."""
+        while not self.stopped:
+            self.handle_request()
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        self.path.unlink(missing_ok=True)
+
+    def dispatch(self, req: dict[str, Any]) -> dict[str, Any]:
+        """Handle a request."""
+        cmd = req.get('command')
+        if cmd not in COMMANDS:
+            raise ValueError(f'Unknown command: {cmd}')
+        self.requests += 1
+        if cmd == 'ping':
+            return {'success': True, 'requests': self.requests}
+        if cmd == 'stop':
+            self.stopped = True
+            return {'success': True}
+        return getattr(self, f'_{cmd}')(req)
+
+    @staticmethod
+    def _build(req: dict[str, Any]) -> dict[str, Any]:
+        from phlorest.batch import build_dataset  # pylint: disable=C0415
+
+        with _capture() as (handler, out):
+            res = build_dataset(req['dataset'], handler=handler)
+        return {
+            'success': res.success,
+            'dataset': res.dataset,
+            'seconds': res.seconds,
+            'error': res.error,
+            'output': out.getvalue()}
+
+    @staticmethod
+    def _check(req: dict[str, Any]) -> dict[str, Any]:
+        from phlorest.batch import load_dataset  # pylint: disable=C0415
+        from phlorest.check import run_checks  # pylint: disable=C0415
+        from phlorest.commands.check import check_rf  # pylint: disable=C0415
+
+        start = time.perf_counter()
+        with _capture() as (handler, out):
+            log = logging.getLogger(f'{__name__}.check')
+            log.setLevel(logging.INFO)
+            log.propagate = False
+            log.addHandler(handler)
+            try:
+                ds = load_dataset(req['dataset'])
+                if req.get('rf'):
+                    check_rf(ds, log, processes=req.get('processes'))
+                success = run_checks(ds, log)
+            finally:
+                log.removeHandler(handler)
+        return {
+            'success': success,
+            'dataset': ds.id,
+            'seconds': time.perf_counter() - start,
+            'error': None,
+            'output': out.getvalue()}
+
+
+@contextlib.contextmanager
+def _capture():
+    """Capture log records and printed output."""
+    out = io.StringIO()
+    handler = logging.StreamHandler(out)
+    handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+    with contextlib.redirect_stdout(out):
+        yield handler, out
+
+
+def _alive(path: pathlib.Path) -> bool:
+    try:
+        request('ping', socket_path=path)
+        return True
+    except OSError:
+        return False
+
+
+def request(
+        command: str,
+        dataset: Optional[str] = None,
+        socket_path: Optional[pathlib.Path] = None,
+        **kw,
+) -> dict[str, Any]:
+    """
+    Send a request to a worker.
+
+    :param command: One of `build`, `check`, `ping` or `stop`.
+    :param dataset: Path to the dataset directory.
+    :param kw: Additional options of the command, e.g. `rf=True` for `check`.
+    :return: The response, a `dict` with keys `success`, `error`, `seconds` and `output`.
+    """
+    req = dict(command=command, **kw)
+    if dataset:
+        req['dataset'] = str(pathlib.Path(dataset).resolve())
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(socket_path or DEFAULT_SOCKET))
+        sock.sendall(json.dumps(req).encode('utf8') + b'\n')
+        with sock.makefile('rb') as f:
+            return json.loads(f.readline().decode('utf8'))
+
+
+def main(args=None) -> int:  # pragma: no cover
+    """The thin client."""
+    parser = argparse.ArgumentParser(
+        prog='python -m phlorest.worker', description='Send a request to a phlorest worker.')
+    parser.add_argument('command', choices=COMMANDS)
+    parser.add_argument('dataset', nargs='?', default='.', help='Dataset directory.')
+    parser.add_argument('--socket', type=pathlib.Path, default=DEFAULT_SOCKET)
+    parser.add_argument(
+        '--rf', action='store_true', default=False, help='Check Robinson-Foulds distances.')
+    args = parser.parse_args(args)
+    try:
+        res = request(
+            args.command,
+            args.dataset if args.command in ('build', 'check') else None,
+            socket_path=args.socket,
+            **({'rf': True} if args.rf else {}))
+    except OSError as e:
+        print(f'No phlorest worker listening on {args.socket}: {e}', file=sys.stderr)
+        return 2
+    if res.get('output'):
+        print(res['output'], end='')
+    if res.get('error'):
+        print(res['error'], file=sys.stderr)
+    if 'seconds' in res:
+        print(f"{'PASS' if res['success'] else 'FAIL'} {res.get('dataset')} "
+              f"({res['seconds']:.2f}s)")
+    return 0 if res['success'] else 1
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
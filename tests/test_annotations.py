@@ -0,0 +1,54 @@
+import re
+
+import newick
+import numpy as np
+import pytest
+
+from phlorest.nexuslib import Tree
+from phlorest.annotations import parse_annotation, filter_annotations, NodeAnnotations
+
+
+@pytest.mark.parametrize(
+    'comment,expected',
+    [
+        ('[&height=1.5,rate=0.3]', {'height': '1.5', 'rate': '0.3'}),
+        ('&height_95%_HPD={1.2,1.8}', {'height_95%_HPD': ['1.2', '1.8']}),
+        ('[&location="A",location.set={"A","B"}]', {'location': 'A', 'location.set': ['A', 'B']}),
+        ('[&loc={{1,2},{3,4}}]', {'loc': ['1', '2', '3', '4']}),
+        ('[&R]', {}),
+    ]
+)
+def test_parse_annotation(comment, expected):
+    assert parse_annotation(comment) == expected
+
+
+@pytest.mark.parametrize(
+    'keep,expected',
+    [
+        ({'height'}, 'tree t = [&R] (A[&height=0]:[c]1,B[x]);'),
+        (re.compile('h.*'), 'tree t = [&R] (A[&height=0,hpd={0, 1}]:[c]1,B[x]);'),
+        ([], 'tree t = [&R] (A:[c]1,B[x]);'),
+    ]
+)
+def test_filter_annotations(keep, expected):
+    text = 'tree t = [&R] (A[&height=0,hpd={0, 1}]:[c][&rate=1]1,B[x][&rate=2]);'
+    assert filter_annotations(text, keep) == expected
+
+
+def test_NodeAnnotations():
+    annotations = NodeAnnotations()
+    assert annotations('(A[&height=0]:[&rate=0.5]1,B:1)[&height=1,hpd={0.5,1.5}];') == \
+        '(A[&node=0]:1,B:1)[&node=1];'
+    res = annotations(Tree('t', "('A [&x]'[&height=2],B[c][&rate=1])", None))
+    assert res.newick == "('A [&x]'[&node=2],B[c][&node=3])"
+    assert NodeAnnotations.strip_comments(res.newick) == "('A [&x]'[&node=2],B[&node=3])"
+    res = annotations(newick.loads('(A,B)C[&height=3]')[0])
+    assert res.comment == '&node=4'
+    assert len(annotations) == 5
+    assert annotations.header == ['Node', 'height', 'rate', 'hpd[1]', 'hpd[2]']
+    rows = list(annotations.iter_rows())
+    assert rows[0] == [0, '0', '0.5', None, None]
+    assert rows[1] == [1, '1', None, '0.5', '1.5']
+    assert rows[-1] == [4, '3', None, None, None]
+    assert np.array_equal(
+        annotations.array('rate'), [0.5, np.nan, np.nan, 1, np.nan], equal_nan=True)
@@ -0,0 +1,98 @@
+import time
+import logging
+import zipfile
+
+import pytest
+from commonnexus import Nexus
+
+from phlorest.nexuslib import NexusFile, Tree
+from phlorest.archive import TreeArchive, parse_tree_command
+
+
+def _write(path, ntrees, **kw):
+    with NexusFile(path, **kw) as nex:
+        for i in range(1, ntrees + 1):
+            nex.append(
+                Tree('t', f"((A:{i},B:2):1,'C c':3);"),
+                f'STATE_{i}',
+                set(),
+                'years',
+                logging.getLogger(__name__),
+                rooted=True)
+
+
+@pytest.mark.parametrize(
+    'zipped,index,translate',
+    [(True, True, False), (True, False, False), (False, True, False), (True, True, True)])
+def test_TreeArchive(tmp_path, zipped, index, translate):
+    _write(tmp_path / 'posterior.trees', 20, zipped=zipped, index=index, translate=translate)
+    with TreeArchive(tmp_path / ('posterior.trees' + ('.zip' if zipped else ''))) as trees:
+        assert len(trees) == 20
+        assert trees['STATE_7'].newick.descendants[0].descendants[0].length == 7
+        assert trees[0].name == 'STATE_1' and trees[0].rooted
+        assert trees[0].newick.get_leaf_names() == ['A', 'B', "'C c'"]
+        assert [t.name for t in trees[3:6]] == ['STATE_4', 'STATE_5', 'STATE_6']
+        assert [t.name for t in trees[3:8:2]] == ['STATE_4', 'STATE_6', 'STATE_8']
+        assert trees[30:] == []
+        assert [str(t) for t in trees] == [str(t) for t in trees[:]]
+        unparsed = list(trees.iter_trees(parse=False))
+        assert all(isinstance(t.newick, str) for t in unparsed)
+        assert [t.newick for t in unparsed] == [str(t) for t in trees[:]]
+    if zipped:
+        with zipfile.ZipFile(tmp_path / 'posterior.trees.zip') as zf:
+            assert zf.infolist()[0].filename == 'posterior.trees'
+
+
+def test_TreeArchive_appended(tmp_path):
+    with pytest.raises(ValueError):  # No archive.
+        NexusFile(tmp_path / 'posterior.trees', zipped=True, append=True)
+    _write(tmp_path / 'posterior.trees', 3, zipped=True, index=False)
+    with pytest.raises(ValueError):  # No index.
+        NexusFile(tmp_path / 'posterior.trees', zipped=True, append=True)
+    _write(tmp_path / 'posterior.trees', 3, zipped=True, index=True)
+    with NexusFile(tmp_path / 'posterior.trees', zipped=True, append=True, translate=True) as nex:
+        assert nex.archived == 3 and nex.member == 'posterior_2.trees'
+        nex.append("('C c':1,A:2);", 'STATE_4', set(), 'years', logging.getLogger(__name__))
+    with TreeArchive(tmp_path / 'posterior.trees.zip') as trees:
+        assert len(trees) == 4
+        assert trees['STATE_4'].newick.get_leaf_names() == ["'C c'", 'A']
+        assert [t.name for t in trees[2:]] == ['STATE_3', 'STATE_4']
+    with pytest.raises(ValueError):
+        NexusFile(tmp_path / 'posterior.trees', append=True)
+
+
+def test_parse_tree_command():
+    tree = parse_tree_command("tree 'a ''b''' = (A,B);", parse=False)
+    assert tree.name == "a 'b'" and tree.rooted is None and tree.newick == '(A,B);'
+    with pytest.raises(ValueError):
+        parse_tree_command('(A,B);')
+
+
+@pytest.mark.slow
+def test_TreeArchive_benchmark(tmp_path, mocker):
+    _write(tmp_path / 'posterior.trees', 5000, zipped=True, index=True)
+    p = tmp_path / 'posterior.trees.zip'
+
+    start = time.perf_counter()
+    with zipfile.ZipFile(p) as zf:
+        zf.extract('posterior.trees', tmp_path)
+    full = Nexus.from_file(tmp_path / 'posterior.trees').TREES.trees[4000].newick
+    full_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with TreeArchive(p) as trees:
+        single = trees['STATE_4001'].newick
+    single_time = time.perf_counter() - start
+
+    assert single.newick == full.newick
+    assert single_time < full_time
+
+    with TreeArchive(p) as trees:
+        assert trees['STATE_4000'].name == 'STATE_4000'
+        opened = mocker.spy(trees, '_open')
+        names = [trees[name].name for name in trees.names[4000:4100]]
+        assert names == trees.names[4000:4100]
+        # Lookups in file order continue reading the open stream:
+        assert opened.call_count == 0
+        assert trees['STATE_1'].name == 'STATE_1'
+        assert opened.call_count == 1
@@ -0,0 +1,81 @@
+import pytest
+
+from phlorest.arraytree import ArrayTree, mean_patristic_distances, Pruner
+
+
+@pytest.mark.parametrize(
+    'nwk,ntips,height,length,ultrametric',
+    [
+        ('((A:1,B:1)C:2,D:3)R;', 3, 3, 7, True),
+        ('((A:1,B:2):2,D:3);', 3, 4, 8, False),
+        ('((A,B),D);', 3, None, None, None),
+        ('A:5;', 1, None, None, None),
+    ]
+)
+def test_ArrayTree_stats(nwk, ntips, height, length, ultrametric):
+    stats = ArrayTree.from_newick(nwk).stats()
+    assert stats.ntips == ntips
+    assert stats.height == height
+    assert stats.length == length
+    assert stats.ultrametric is ultrametric
+
+
+def test_ArrayTree_depths():
+    tree = ArrayTree.from_newick('(((A:1,B:1):1,C:2):1,D:3);')
+    assert len(tree) == 7
+    assert tree.depths.tolist() == [0, 1, 2, 3, 3, 3, 3]
+    assert [n for n, leaf in zip(tree.names, tree.is_leaf) if leaf] == ['A', 'B', 'C', 'D']
+
+
+def test_ArrayTree_patristic_distances():
+    tree = ArrayTree.from_newick('(((A:1,B:1):1,C:2):1,(D:3,E:1):2);')
+    names, matrix = tree.patristic_distances()
+    assert names == ['A', 'B', 'C', 'D', 'E']
+    assert matrix[0].tolist() == [0, 2, 4, 8, 6]
+    assert matrix[4].tolist() == [6, 6, 6, 4, 0]
+    assert (matrix == matrix.T).all()
+
+
+def test_mean_patristic_distances():
+    names, matrix = mean_patristic_distances(
+        ArrayTree.from_newick(nwk) for nwk in ['((A:1,B:1):1,C:2);', '((C:1,B:1):1,A:2);'])
+    assert names == ['A', 'B', 'C']
+    assert matrix[0].tolist() == [0, 3, 4]
+    with pytest.raises(ValueError):
+        mean_patristic_distances(ArrayTree.from_newick(nwk) for nwk in ['(A,B);', '(A,C);'])
+    with pytest.raises(ValueError):
+        mean_patristic_distances([])
+
+
+@pytest.mark.parametrize(
+    'keep,nwk,expected',
+    [
+        ({'A', 'C', 'D'}, '((A:1,B:2)x:3,(C:1,D:1):2)r;', '(A:4.0,(C:1,D:1):2)r;'),
+        ({'C', 'D'}, '((A:1,B:2)x:3,(C:1[&a=1],D:1):2)r;', '(C[&a=1]:1,D:1);'),
+        ({'A'}, '((A:1,B:2)x:3,(C:1,D:1):2)r;', 'A;'),
+        ({'A', 'C c'}, "((A,B),('C c',D));", "(A,'C c');"),
+        ({'A', 'C'}, '((A,B),(C,D));', '(A,C);'),
+    ]
+)
+def test_Pruner(keep, nwk, expected):
+    assert Pruner(keep)(nwk) == expected
+
+
+def test_Pruner_plans():
+    prune = Pruner({'A', 'C'})
+    assert prune('((A:1[&x=1],B:1):1,C:2);') == '(A[&x=1]:2.0,C:2);'
+    assert prune('((A:5[&x=2],B:1):1,C:2);') == '(A[&x=2]:6.0,C:2);'
+    assert len(prune._plans) == 1
+    assert prune('((A:5,B:1):1,C:2);') == '(A:6.0,C:2);'
+    with pytest.raises(ValueError):
+        prune('(X,Y);')
+
+
+def test_Pruner_plans_evicted():
+    prune = Pruner({'A', 'C'}, maxsize=2)
+    for nwk in ['((A,B),C);', '(A,(B,C));', '((A,C),B);']:
+        prune(nwk)
+    assert len(prune._plans) == 2
+    assert prune('((A,B),C);') == '(A,C);' and prune._plans.counts['tree', 'hits'] == 0
+    prune('((A,C),B);')
+    assert prune._plans.counts['tree', 'hits'] == 1 and len(prune._plans) == 2
@@ -0,0 +1,40 @@
+import shutil
+import pathlib
+
+import pytest
+
+from phlorest.batch import build_datasets, build_dataset
+
+
+@pytest.fixture
+def datasets(repos, tmp_path):
+    shutil.copytree(repos, tmp_path / 'phy')
+    shutil.copytree(repos, tmp_path / 'broken')
+    # Rename the dataset to avoid clashes in the module namespace:
+    broken = tmp_path / 'broken' / 'cldfbench_broken.py'
+    tmp_path.joinpath('broken', 'cldfbench_phy.py').rename(broken)
+    broken.write_text(
+        broken.read_text(encoding='utf8').replace("'phy'", "'broken'").replace(
+            "self.init(args)", "raise ValueError('oops')"),
+        encoding='utf8')
+    return tmp_path
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_build_datasets(datasets, tmp_path, workers):
+    glottolog = pathlib.Path(__file__).parent / 'glottolog'
+    res = {
+        r.dataset: r for r in build_datasets(
+            [datasets / 'phy', datasets / 'broken'],
+            glottolog=glottolog,
+            workers=workers,
+            log_dir=tmp_path / 'logs')}
+    assert res['phy'].success and res['phy'].seconds > 0
+    assert datasets.joinpath('phy', 'cldf', 'trees.csv').exists()
+    assert not res['broken'].success and 'oops' in res['broken'].error
+    assert 'ValueError' in pathlib.Path(res['broken'].log).read_text(encoding='utf8')
+
+
+def test_build_dataset_no_module(tmp_path):
+    res = build_dataset(tmp_path)
+    assert not res.success and 'No cldfbench module' in res.error
@@ -1,3 +1,5 @@
+import pytest
+
 from phlorest import BeastFile
 
 
@@ -17,3 +19,13 @@ def test_BeastFile_2(dataset):
     assert nex.taxa == ['Jeju', 'SouthJeolla', 'NorthJeolla']
     assert len(matrix['Jeju']) == 384
     assert list(matrix['Jeju'])[1] == '2'  # no character labels
+
+
+def test_BeastFile_character_data(dataset, repos, tmp_path):
+    bf = BeastFile(None, text=dataset.raw_dir.read('beast.xml'))
+    bf.character_data().write(tmp_path / 'data.nex')
+    # The expected output is the normalised NEXUS as written by commonnexus 2.0.
+    assert (tmp_path / 'data.nex').read_bytes() == \
+        repos.joinpath('raw', 'beast_characters.nex').read_bytes()
+    with pytest.raises(ValueError):
+        BeastFile(None, text='<beast><data></data></beast>').character_data()
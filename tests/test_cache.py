@@ -0,0 +1,41 @@
+import os
+import sys
+
+from phlorest.cache import ResultCache, MemoryCache, tool_version
+
+
+def test_ResultCache(tmp_path):
+    cache = ResultCache(tmp_path / 'cache', max_size=10)
+    p = tmp_path / 'in.txt'
+    p.write_text('abc', encoding='utf8')
+    assert cache.key(p) == cache.key('abc')
+    assert cache.key('a', 'bc') != cache.key('ab', 'c')
+
+    k1, k2 = cache.key('1'), cache.key('2')
+    assert cache.get(k1) is None
+    assert cache.set(k1, '123456') == '123456'
+    assert cache.get(k1) == '123456'
+    # Make sure k1 is less recently used:
+    p1 = cache._path(k1)
+    os.utime(p1, ns=(p1.stat().st_atime_ns, p1.stat().st_mtime_ns - 10 ** 9))
+    cache.set(k2, '123456')
+    assert cache.get(k1) is None and cache.get(k2) == '123456'
+    cache.max_size = 100
+    cache.set(k1, b'\x00\x01')
+    assert cache.get(k1, binary=True) == b'\x00\x01'
+
+
+def test_MemoryCache():
+    cache = MemoryCache()
+    obj = cache.set('k1', {'a': [1, 2]})
+    assert cache.get('k1') == obj and cache.get('k1') is not obj
+    cache.get('k1')['a'].append(3)
+    assert cache.get('k1') == {'a': [1, 2]}
+    cache.max_size = cache.size
+    cache.set('k2', {'b': [1, 2]})
+    assert cache.get('k1') is None and len(cache) == 1
+
+
+def test_tool_version():
+    assert tool_version('this-command-does-not-exist') == 'this-command-does-not-exist'
+    assert tool_version(sys.executable).startswith(os.path.realpath(sys.executable) + ':')
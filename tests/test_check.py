@@ -3,9 +3,22 @@ import pathlib
 
 import phlorest
 from phlorest.check import run_checks
+from phlorest.concepticon import ConcepticonIndex
 
 
 def test_run_checks(dataset, caplog):
     assert run_checks(dataset.cldf_reader(), logging.getLogger(__name__)) is False
     assert len(caplog.records) == 5
     assert pathlib.Path(phlorest.__file__).parent.joinpath('check.R').exists()
+
+
+def test_run_checks_concepticon(dataset, caplog, mocker):
+    mocker.patch.object(
+        type(dataset),
+        'characters',
+        new_callable=mocker.PropertyMock,
+        return_value=[
+            {'Site': '1', 'Concepticon_ID': '1277'},
+            {'Site': '2', 'Concepticon_ID': 'x'}])
+    run_checks(dataset, logging.getLogger(__name__), concepticon=ConcepticonIndex({'HAND': '1277'}))
+    assert "invalid Concepticon IDs: ['x']" in caplog.text
@@ -1,8 +1,15 @@
+import zipfile
+
+import pytest
+
 import cldfbench
+from pycldf import Dataset
 
+from phlorest.archive import TreeArchive
 from phlorest.cldfwriter import CLDFWriter
 from phlorest.metadata import Metadata
 from phlorest.beast import BeastFile
+from phlorest.nexuslib import SpillList
 
 
 def test_CLDFWriter(repos, tmp_path, mocker, nexus_tree, dataset, glottolog):
@@ -69,3 +76,141 @@ def test_CLDFWriter_nexus_data_3(repos, tmp_path, mocker, nexus_tree, dataset, g
             Nexus((repos / 'raw' / 'data.nex').read_text(encoding='utf8')),
             [{'Site': '0', 'Gloss': 'abc'}], mocker.Mock())
         assert writer.cldf['ParameterTable', 'Gloss']
+
+
+def test_CLDFWriter_memory_budget(tmp_path, mocker, dataset, glottolog):
+    def write(d, budget=None, concurrent_exit=False):
+        # The writer picks up the settings from the dataset:
+        mocker.patch.object(dataset, 'memory_budget', budget, create=True)
+        mocker.patch.object(dataset, 'concurrent_exit', concurrent_exit, create=True)
+        with CLDFWriter(cldf_spec=cldfbench.CLDFSpec(dir=d), dataset=dataset) as writer:
+            writer.add_taxa(dataset.taxa, glottolog, mocker.Mock())
+            writer.add_posterior(
+                [f'(Jeju:{i},(SouthJeolla:1,NorthJeolla:2):3);' for i in range(100)],
+                Metadata(name='n', author='a', year=2021),
+                mocker.Mock())
+        assert writer.memory_budget == budget and writer.concurrent_exit == concurrent_exit
+        return d
+
+    d1 = write(tmp_path / 'd1')
+    for d2 in [write(tmp_path / 'd2', 500), write(tmp_path / 'd3', concurrent_exit=True)]:
+        for name in ['trees.csv', 'posterior.trees.zip']:
+            assert d1.joinpath(name).read_bytes() == d2.joinpath(name).read_bytes()
+
+
+def test_SpillList():
+    items = SpillList(50)
+    for i in range(20):
+        items.append(('tree', i))
+    assert len(items) == 20 and items._spilled
+    assert [i for _, i in items] == list(range(20))
+    assert [i for _, i in items] == list(range(20))
+    items.close()
+
+
+def test_CLDFWriter_add_rows(tmp_path):
+    with CLDFWriter(cldf_spec=cldfbench.CLDFSpec(dir=tmp_path)) as writer:
+        assert writer.add_rows(
+            'LanguageTable', ['ID', 'glottocode'], [('a', 'abcd1234'), ('b', None)]) == 2
+        assert writer.add_batch(
+            'LanguageTable', {'ID': ['c', 'd'], 'label': ['C', 'D']}, rename={'label': 'Name'}) == 2
+        assert writer.objects['LanguageTable'][0]['Glottocode'] == 'abcd1234'
+        assert writer.objects['LanguageTable'][-1]['Name'] == 'D'
+
+
+def test_CLDFWriter_tree_stats(tmp_path, mocker, dataset, glottolog):
+    with CLDFWriter(cldf_spec=cldfbench.CLDFSpec(dir=tmp_path)) as writer:
+        writer.add_taxa(dataset.taxa, glottolog, mocker.Mock())
+        writer.add_summary(
+            '((Jeju:1,SouthJeolla:1):2,NorthJeolla:3);',
+            Metadata(name='n', author='a', year=2021),
+            mocker.Mock())
+    tree = next(writer.cldf.iter_rows('TreeTable'))
+    assert tree['Number_Of_Tips'] == 3 and tree['Tree_Height'] == 3
+    assert tree['Tree_Is_Ultrametric'] is True
+
+
+def test_CLDFWriter_add_distances(tmp_path, mocker, dataset, glottolog):
+    md = Metadata(name='n', author='a', year=2021)
+    with CLDFWriter(cldf_spec=cldfbench.CLDFSpec(dir=tmp_path)) as writer:
+        writer.add_taxa(dataset.taxa, glottolog, mocker.Mock())
+        writer.add_distances(mocker.Mock(), posterior=False)
+        writer.add_summary('((Jeju:1,SouthJeolla:1):2,NorthJeolla:3);', md, mocker.Mock())
+        writer.add_posterior(
+            [
+                '((Jeju:1,SouthJeolla:1):2,NorthJeolla:3);',
+                '((Jeju:3,NorthJeolla:1):2,SouthJeolla:3);'],
+            md,
+            mocker.Mock(),
+            translate=True)
+        writer.add_distances(mocker.Mock(), posterior=True)
+    with zipfile.ZipFile(tmp_path / 'posterior_distances.csv.zip') as zf:
+        rows = zf.read('posterior_distances.csv').decode('utf8').splitlines()
+    assert rows[0] == ',Jeju,NorthJeolla,SouthJeolla'
+    assert rows[1] == 'Jeju,0,5,5'
+    assert {r['ID'] for r in writer.cldf.iter_rows('MediaTable')} == \
+        {'summary', 'posterior', 'summary_distances', 'posterior_distances'}
+
+
+def test_CLDFWriter_add_summary_annotations(tmp_path, mocker, dataset, glottolog):
+    with CLDFWriter(cldf_spec=cldfbench.CLDFSpec(dir=tmp_path)) as writer:
+        writer.add_taxa(dataset.taxa, glottolog, mocker.Mock())
+        writer.add_summary(
+            '((Jeju[&height=0]:1,SouthJeolla[&height=0]:1)[&height=1]:2,NorthJeolla:3);',
+            Metadata(name='n', author='a', year=2021),
+            mocker.Mock(),
+            annotations=True)
+    assert '[&node=2]' in tmp_path.joinpath('summary.trees').read_text(encoding='utf8')
+    with zipfile.ZipFile(tmp_path / 'summary_annotations.csv.zip') as zf:
+        rows = zf.read('summary_annotations.csv').decode('utf8').splitlines()
+    assert rows == ['Node,height', '0,0', '1,0', '2,1']
+    assert 'summary_annotations' in {r['ID'] for r in writer.cldf.iter_rows('MediaTable')}
+
+
+def test_CLDFWriter_add_rf_distances(tmp_path, mocker, dataset, glottolog):
+    md = Metadata(name='n', author='a', year=2021)
+    with CLDFWriter(cldf_spec=cldfbench.CLDFSpec(dir=tmp_path)) as writer:
+        writer.add_taxa(dataset.taxa, glottolog, mocker.Mock())
+        writer.add_rf_distances(mocker.Mock())
+        writer.add_summary('((Jeju:1,SouthJeolla:1):2,NorthJeolla:3);', md, mocker.Mock())
+        writer.add_posterior(
+            [
+                '((Jeju:1,SouthJeolla:1):2,NorthJeolla:3);',
+                '((Jeju:3,NorthJeolla:1):2,SouthJeolla:3);'],
+            md,
+            mocker.Mock(),
+            translate=True)
+        writer.add_rf_distances(mocker.Mock(), sample=2)
+    with zipfile.ZipFile(tmp_path / 'rf_distances.csv.zip') as zf:
+        rows = zf.read('rf_distances.csv').decode('utf8').splitlines()
+    assert len(rows) == 5
+    assert rows[1] == 'summary,STATE_1,0,0'
+
+
+def test_CLDFWriter_append_posterior(tmp_path, mocker, dataset, glottolog):
+    def write(n, append=False, clean=True):
+        with CLDFWriter(cldf_spec=cldfbench.CLDFSpec(dir=tmp_path), clean=clean) as writer:
+            writer.add_taxa(dataset.taxa, glottolog, mocker.Mock())
+            writer.add_posterior(
+                [f'(Jeju:{i},(SouthJeolla:1,NorthJeolla:2):3);' for i in range(n)],
+                Metadata(name='n', author='a', year=2021),
+                mocker.Mock(),
+                append=append)
+
+    write(3)
+    with pytest.raises(ValueError):  # The clean writer removed the archive.
+        write(2, append=True)
+    write(3)
+    write(2, append=True, clean=False)
+    cldf = Dataset.from_metadata(tmp_path / 'Generic-metadata.json')
+    assert [(r['ID'], r['Media_ID']) for r in cldf['TreeTable']] == [
+        ('STATE_1', 'posterior'), ('STATE_2', 'posterior'), ('STATE_3', 'posterior'),
+        ('STATE_4', 'posterior_2'), ('STATE_5', 'posterior_2')]
+    assert {r['ID']: r['Path_In_Zip'] for r in cldf['MediaTable']} == {
+        'posterior': 'posterior.trees', 'posterior_2': 'posterior_2.trees'}
+    with TreeArchive(tmp_path / 'posterior.trees.zip') as trees:
+        assert trees.names == ['STATE_1', 'STATE_2', 'STATE_3', 'STATE_4', 'STATE_5']
+        assert [t.newick.descendants[0].length for t in trees[2:4]] == [2, 0]
+    tmp_path.joinpath('trees.csv').unlink()
+    with pytest.raises(ValueError):
+        write(2, append=True, clean=False)
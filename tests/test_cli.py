@@ -1,23 +1,82 @@
 import shutil
 import logging
+import pathlib
 import argparse
 
-from phlorest.commands import check, contrib
+import pytest
+
+from cldfbench.catalogs import Glottolog
+
+from phlorest.commands import build, check, contrib, index
 from phlorest.__main__ import main
 from phlorest import Dataset
+from phlorest.nexuslib import NexusFile
 
 
 def test_check(dataset, caplog):
-    check.run(argparse.Namespace(log=logging.getLogger(__name__), with_R=False), dataset)
+    check.run(argparse.Namespace(log=logging.getLogger(__name__), with_R=False, rf=False), dataset)
     assert len(caplog.records) >= 4
 
 
+def test_check_rf(dataset, caplog):
+    with caplog.at_level(logging.INFO):
+        check.run(
+            argparse.Namespace(
+                log=logging.getLogger(__name__), with_R=False, rf=True, processes=None),
+            dataset)
+    assert any('Unknown taxon' in r.message for r in caplog.records)
+
+
+@pytest.fixture
+def rf_dataset(dataset):
+    # Summary and posterior trees with the taxa of the dataset - plus one more taxon, because
+    # trees with three taxa do not have any non-trivial splits.
+    taxa_csv = dataset.etc_dir / 'taxa.csv'
+    taxa_csv.write_text(
+        taxa_csv.read_text(encoding='utf8').rstrip() + '\nSeoul,abcd1237,\n', encoding='utf8')
+    log = logging.getLogger(__name__)
+    taxa = {'Jeju', 'SouthJeolla', 'NorthJeolla', 'Seoul'}
+    with NexusFile(dataset.cldf_dir / 'summary.trees') as nex:
+        nex.append('((Jeju:1,SouthJeolla:1):1,(NorthJeolla:1,Seoul:1):1);', 's', taxa, 'years', log)
+    with NexusFile(
+            dataset.cldf_dir / 'posterior.trees', zipped=True, index=True, translate=True) as nex:
+        for i, nwk in enumerate([
+            '((Jeju:1,SouthJeolla:1):1,(NorthJeolla:1,Seoul:1):1);',
+            '((Jeju:1,NorthJeolla:1):1,(SouthJeolla:1,Seoul:1):1);',
+            '(Jeju:1,SouthJeolla:1,(NorthJeolla:1,Seoul:1):2);',
+        ], start=1):
+            nex.append(nwk, f'STATE_{i}', taxa, 'years', log)
+    return dataset
+
+
+def test_check_rf_computed(rf_dataset, caplog):
+    with caplog.at_level(logging.INFO):
+        check.run(
+            argparse.Namespace(
+                log=logging.getLogger(__name__), with_R=False, rf=True, processes=None),
+            rf_dataset)
+    assert not any('Cannot compute' in r.message for r in caplog.records)
+    assert any(
+        'RF distances of 3 posterior trees to the summary tree: mean=0.67 min=0 max=2'
+        in r.message for r in caplog.records)
+
+
 def test_contrib(dataset, capsys):
     contrib.run(argparse.Namespace(log=logging.getLogger(__name__), format='pipe'), dataset)
     out, _ = capsys.readouterr()
     assert 'GitHub user' in out
 
 
+def test_index(repos, tmp_path, caplog):
+    with caplog.at_level(logging.INFO):
+        index.run(argparse.Namespace(
+            log=logging.getLogger(__name__),
+            db=tmp_path / 'db.sqlite',
+            directories=[repos],
+            workers=None))
+    assert 'added=1' in caplog.text
+
+
 def test_check_characters(tmp_repos):
     tmp_repos.joinpath('etc', 'characters.csv').write_text('a,b\n,', encoding='utf8')
     shutil.rmtree(tmp_repos / 'cldf')
@@ -26,8 +85,24 @@ def test_check_characters(tmp_repos):
         dir = tmp_repos
         id = 'phy'
 
-    check.run(argparse.Namespace(log=logging.getLogger(__name__), with_R=False), DS())
+    check.run(
+        argparse.Namespace(log=logging.getLogger(__name__), with_R=False, rf=True, processes=None),
+        DS())
 
 
 def test_main(dataset):
-    main(parsed_args=argparse.Namespace(dataset=dataset))
\ No newline at end of file
+    main(parsed_args=argparse.Namespace(dataset=dataset))
+
+
+def test_build(repos, tmp_path, caplog, capsys):
+    shutil.copytree(repos, tmp_path / 'phy')
+    with caplog.at_level(logging.INFO):
+        build.run(argparse.Namespace(
+            log=logging.getLogger(__name__),
+            glottolog=Glottolog(pathlib.Path(__file__).parent / 'glottolog'),
+            directories=[tmp_path],
+            workers=None,
+            log_dir=None,
+            format='simple'))
+    assert '1 of 1 datasets built' in caplog.text
+    assert 'phy' in capsys.readouterr().out
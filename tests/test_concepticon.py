@@ -0,0 +1,28 @@
+import pytest
+
+from phlorest.cache import ResultCache
+from phlorest.concepticon import ConcepticonIndex
+
+
+@pytest.fixture
+def concepticon(tmp_path):
+    d = tmp_path / 'concepticon-data' / 'concepticondata'
+    d.mkdir(parents=True)
+    d.joinpath('concepticon.tsv').write_text(
+        'ID\tGLOSS\tSEMANTICFIELD\n1277\tHAND\tThe body\n1301\tBIG ROCK\tThe physical world\n',
+        encoding='utf8')
+    return d.parent
+
+
+def test_ConcepticonIndex(concepticon, tmp_path, mocker):
+    cache = ResultCache(tmp_path / 'cache')
+    index = ConcepticonIndex.from_repos(concepticon, cache=cache)
+    assert len(index) == 2
+    assert index.id('HAND') == '1277' and index.id('hand') is None
+    assert index.id(' big  rock', normalised=True) == '1301'
+    assert index.gloss(1301) == 'BIG ROCK' and index.gloss('1') is None
+
+    # The index is read from the cache:
+    reader = mocker.patch('phlorest.concepticon.reader')
+    assert ConcepticonIndex.from_repos(concepticon, cache=cache).glosses == index.glosses
+    assert not reader.called
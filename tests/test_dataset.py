@@ -1,9 +1,17 @@
 import shutil
+import asyncio
+import concurrent.futures
 import argparse
 
 import pytest
+import newick
+from commonnexus import Nexus
+from commonnexus.tools.normalise import normalise as nexus_norm
 
-from phlorest.dataset import PhlorestDir
+from phlorest.dataset import PhlorestDir, callable_key, allocate_sample
+from phlorest.nexuslib import TreeCache
+from phlorest.annotations import NodeAnnotations
+from phlorest.cache import ResultCache, MemoryCache
 
 
 @pytest.fixture
@@ -31,13 +39,39 @@ def test_PhlorestDir_with_rates(repos):
         if node.name == '1':
             assert ('height' in node.properties) and ('rate' in node.properties)
 
+    annotations = NodeAnnotations()
+    trees = d.read_trees('trees_with_rate.trees', detranslate=True, annotations=annotations)
+    assert trees[0].newick.get_leaves()[0].comment == '&node=0'
+    assert len(annotations) == len(list(trees[0].newick.walk()))
+    assert {'height', 'height_95%_HPD[1]', 'rate'}.issubset(annotations.columns)
+
+    trees = d.read_trees('trees_with_rate.trees', keep_annotations={'rate'})
+    node = trees[0].newick.get_leaves()[0]
+    assert set(node.properties) == {'rate'}
+
+    annotations = NodeAnnotations()
+    trees = d.read_trees('trees_with_rate.trees', annotations=annotations, cache=TreeCache())
+    assert '[&node=0]' in trees[0].newick and len(annotations) > 0
+
+    for cache in [None, TreeCache()]:
+        annotations = NodeAnnotations()
+        trees = d.read_trees(
+            'trees_with_rate.trees', annotations=annotations, strip_annotation=True, cache=cache)
+        nodes = list((newick.loads(trees[0].newick)[0] if cache else trees[0].newick).walk())
+        # Each node still carries its key, joining it to the annotations table:
+        assert sorted(int(n.comment.split('=')[1]) for n in nodes) == list(range(len(nodes)))
+        assert len(annotations) == len(nodes)
+
 
 @pytest.mark.noci
 def test_Dataset(dataset, cldfwriter, mocker, glottolog, tmp_path):
     assert dataset.metadata.title == "Phlorest phylogeny derived from the author 2021 'The name'"
     args = argparse.Namespace(
         writer=cldfwriter, glottolog=mocker.Mock(api=glottolog), log=mocker.Mock())
+    reader = mocker.spy(dataset, 'cldf_reader')
     dataset._cmd_makecldf(args)
+    assert not reader.called  # The summary tree is rendered from the writer's data.
+    assert dataset.dir.joinpath('summary_tree.svg').exists()
     dataset._cmd_readme(args)
 
 
@@ -53,6 +87,26 @@ def test_Dataset_run_treeannotator(dataset, mocker, repos):
     assert res.TREES
 
 
+def test_Dataset_run_treeannotator_cached(dataset, mocker, repos, tmp_path):
+    def annotate(args, **kw):
+        shutil.copy(repos / 'raw' / 'nexus.trees', args[-1])
+
+    mocker.patch('phlorest.dataset.ensure_cmd', mocker.Mock(return_value='cmd'))
+    check_call = mocker.Mock(side_effect=annotate)
+    mocker.patch('phlorest.dataset.subprocess', mocker.Mock(check_call=check_call))
+    cache = ResultCache(tmp_path)
+
+    async def annotate_all():
+        return await asyncio.gather(
+            dataset.arun_treeannotator('-burnin 1', dataset.raw_dir / 'nexus.trees', cache=cache),
+            dataset.arun_treeannotator('-burnin 2', dataset.raw_dir / 'nexus.trees', cache=cache))
+
+    assert all(res.TREES for res in asyncio.run(annotate_all()))
+    res = dataset.run_treeannotator('-burnin 1', dataset.raw_dir / 'nexus.trees', cache=cache)
+    assert res.TREES
+    assert check_call.call_count == 2
+
+
 def test_Dataset_run_rscript(dataset, mocker):
     def rscript(args, **kw):
         kw['cwd'].joinpath('res.txt').write_text('hello', encoding='utf8')
@@ -80,12 +134,38 @@ def test_PhlorestDir_read_trees(dataset):
     assert 'TREE2' == trees[0].name
     assert 'TREE3' == trees[1].name
     
+    trees = dataset.raw_dir.read_trees(tfile, burnin='50%')
+    assert [t.name for t in trees] == ['TREE2', 'TREE3']
+
+    trees = dataset.raw_dir.read_trees(text="""#NEXUS
+begin trees;
+tree STATE_0 = (A,B);
+tree STATE_1000 = (A,B);
+tree STATE_2000 = (A,B);
+end;""", burnin_state=1000, burnin=1)
+    assert [t.name for t in trees] == ['STATE_2000']
+
+    with pytest.raises(ValueError):
+        dataset.raw_dir.read_trees(tfile, burnin_state=1000)
+
+    with pytest.raises(ValueError):
+        dataset.raw_dir.read_trees(tfile, burnin='10')
+
     # strip_annotation
     trees = dataset.raw_dir.read_trees(tfile, burnin=2, strip_annotation=True)
     assert len(trees) == 1
     assert 'TREE3' == trees[0].name
     assert '[' not in trees[0].newick.newick
 
+    # cache
+    cache = TreeCache()
+    trees = dataset.raw_dir.read_trees(tfile, detranslate=True, strip_annotation=True, cache=cache)
+    assert len(trees) == 3 and isinstance(trees[0].newick, str)
+    assert 'Cojubim' in trees[0].newick and '[' not in trees[0].newick
+    assert cache.misses == 1 and cache.hits == 2, 'The sample contains 3 identical trees'
+    trees = dataset.raw_dir.read_trees(tfile, cache=cache)
+    assert '[' in trees[0].newick and cache.misses == 2
+
     # preprocessor
     trees = dataset.raw_dir.read_trees(
         tfile,
@@ -113,3 +193,129 @@ def test_PhlorestDir_read_trees(dataset):
     assert 'TREE1' != trees[0].name, 'Tree1 should never be sampled due to burn-in setting'
     assert '[' not in trees[0].newick.newick
     assert 'Cojubim' in trees[0].newick.newick
+
+
+def test_PhlorestDir_iter_runs(repos, tmp_path):
+    shutil.copy(repos / 'raw' / 'posterior.trees', tmp_path / 'run1.trees')
+    shutil.copy(repos / 'raw' / 'nexus.trees.gz', tmp_path / 'run2.trees.gz')
+    d = PhlorestDir(tmp_path)
+    trees = list(d.iter_runs(['run1.trees', 'run2.trees.gz'], burnin=[1, 0.0]))
+    assert [t.name for t in trees][:2] == ['TREE2', 'TREE3'] and len(trees) == 3
+
+    trees = list(d.iter_runs(['run1.trees', 'run1.trees', 'run1.trees'], burnin=0.4, sample=4))
+    assert len(trees) == 4
+    assert 'TREE1' not in {t.name for t in trees}
+
+    with pytest.raises(ValueError):
+        list(d.iter_runs(['run1.trees'], burnin=1.5))
+
+
+class _SyncExecutor(concurrent.futures.Executor):
+    def submit(self, fn, /, *args, **kwargs):
+        future = concurrent.futures.Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+def test_PhlorestDir_iter_runs_streamed(tmp_path, mocker):
+    tmp_path.joinpath('big.trees').write_text(
+        '#NEXUS\nBEGIN TREES;\n'
+        + ''.join(f'TREE t{i} = (A:{i},B:1);\n' for i in range(1, 11))
+        + 'END;', encoding='utf8')
+    tmp_path.joinpath('small.trees').write_text(
+        '#NEXUS\nBEGIN TREES;\nTREE s1 = (A,B);\nTREE s2 = (A,B);\nEND;', encoding='utf8')
+    d = PhlorestDir(tmp_path)
+    # The shortfall of the small run is sampled from the big one:
+    trees = list(d.iter_runs(['small.trees', 'big.trees'], sample=8))
+    assert len(trees) == 8 and [t.name for t in trees[:2]] == ['s1', 's2']
+    assert len(list(d.iter_runs(['small.trees', 'big.trees'], sample=20))) == 12
+
+    # Runs are read one ahead of the run being consumed:
+    spy = mocker.spy(PhlorestDir, 'read_trees')
+    trees = d.iter_runs(['small.trees', 'big.trees', 'big.trees'], executor=_SyncExecutor())
+    assert next(trees).name == 's1' and spy.call_count == 2
+    assert len(list(trees)) == 21 and spy.call_count == 3
+
+
+def test_allocate_sample():
+    assert allocate_sample(10, [2, 100, 100]) == [2, 4, 4]
+    assert allocate_sample(10, [3, 3, 0]) == [3, 3, 0]
+    assert allocate_sample(7, [100, 100]) == [4, 3]
+    assert allocate_sample(5, [1, 2, 100]) == [1, 2, 2]
+
+
+def test_PhlorestDir_memo(dataset, mocker):
+    mocker.patch.object(PhlorestDir, 'memo', MemoryCache())
+    trees = dataset.raw_dir.read_trees('nexus.trees', keep_annotations=iter(['x']))
+    again = dataset.raw_dir.read_trees('nexus.trees', keep_annotations=['x'])
+    assert [str(t) for t in trees] == [str(t) for t in again] and trees[0] is not again[0]
+    assert len(PhlorestDir.memo) == 1
+    dataset.raw_dir.read_trees('nexus.trees', preprocessor=lambda s: s.replace('A', 'B'))
+    assert len(PhlorestDir.memo) == 2
+    assert callable_key(lambda s: s) != callable_key(lambda s: s.lower())
+    assert callable_key(lambda s: s.lower()) != callable_key(lambda s: s.upper())
+    assert callable_key(lambda s: s.lower()) == callable_key(lambda s: s.lower())
+
+
+def _suffix(s):
+    return s + 'a'
+
+
+def test_callable_key(monkeypatch):
+    def outer(suffix):
+        return lambda s: s + suffix
+
+    def nested(s):
+        return [(lambda x: x.lower())(c) for c in s]
+
+    assert callable_key(outer('a')) != callable_key(outer('b'))
+    assert callable_key(nested) == callable_key(nested)
+    func = lambda s: _suffix(s)  # noqa: E731
+    key = callable_key(func)
+    monkeypatch.setitem(globals(), '_suffix', lambda s: s + 'b')
+    assert callable_key(func) != key
+
+
+def test_PhlorestDir_memo_nexus(dataset, mocker):
+    mocker.patch.object(PhlorestDir, 'memo', MemoryCache())
+    nex = dataset.raw_dir.read_nexus('nexus.trees')
+    assert str(dataset.raw_dir.read_nexus('nexus.trees')) == str(nex)
+    assert len(PhlorestDir.memo) == 1
+
+
+def test_PhlorestDir_read_blocks(tmp_path):
+    tmp_path.joinpath('data.nex').write_text("""#NEXUS
+BEGIN DATA;
+    DIMENSIONS NTAX=2 NCHAR=2;
+    FORMAT DATATYPE=STANDARD SYMBOLS="01";
+    MATRIX A 01 B 10;
+END;
+BEGIN TREES;
+    TREE 1 = (A,B);
+END;""", encoding='utf8')
+    d = PhlorestDir(tmp_path)
+    assert str(d.read_trees('data.nex')[0]) == '(A,B);'
+    nex = d.read_nexus('data.nex', blocks=['trees'])
+    assert nex.DATA is None and nex.TREES.trees[0].name == '1'
+    nex = d.read_nexus('data.nex', blocks=['DATA', 'TREES'], normalise=True)
+    assert nex.characters and nex.TREES
+
+
+def test_PhlorestDir_read_nexus_cached(repos, tmp_path, mocker):
+    d = PhlorestDir(repos / 'raw')
+    cache = ResultCache(tmp_path)
+    nex = d.read_nexus('nexus.trees', normalise=True, cache=cache)
+    norm = mocker.patch('phlorest.dataset.nexus_norm', side_effect=nexus_norm)
+    parse = mocker.patch('phlorest.dataset.Nexus', side_effect=Nexus)
+    assert str(d.read_nexus('nexus.trees', normalise=True, cache=cache)) == str(nex)
+    assert not norm.called and not parse.called
+    d.read_nexus('nexus.trees', normalise=True, cache=cache, cache_key='x')
+    assert norm.called
+    with pytest.raises(ValueError):
+        d.read_nexus('nexus.trees', normalise=True, cache=cache, preprocessor=str.lower)
+    d.read_nexus(
+        'nexus.trees', normalise=True, cache=cache, preprocessor=str.lower, cache_key='lower')
+
+
+def test_Dataset_cldf_metadata(dataset):
+    assert dataset.cldf_metadata()['dc:title'] == dataset.cldf_reader().properties['dc:title']
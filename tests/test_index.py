@@ -0,0 +1,43 @@
+import os
+import shutil
+
+import pytest
+
+from phlorest.index import Index, find_datasets
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_Index(tmp_path, repos, workers):
+    root = tmp_path / 'datasets'
+    for name in ['ds1', 'ds2']:
+        shutil.copytree(repos, root / name)
+        root.joinpath(name, 'cldfbench_phy.py').rename(root / name / f'cldfbench_{name}.py')
+    root.joinpath('other').mkdir()
+    assert [d.name for d in find_datasets([root])] == ['ds1', 'ds2']
+
+    with Index(tmp_path / 'index.sqlite') as index:
+        assert index.update([root], workers=workers)['added'] == 2
+        assert index.query(
+            'SELECT dataset_id FROM language WHERE glottocode = ? ORDER BY dataset_id',
+            ('book1243',)) == [('ds1',), ('ds2',)]
+        assert index.query("SELECT scaling, year FROM dataset WHERE id = 'ds1'") == \
+            [('years', '2021')]
+        assert index.query("SELECT count(*) FROM tree WHERE type = 'summary'") == [(4,)]
+
+        # Touching files without changing content does not trigger re-indexing:
+        os.utime(root / 'ds1' / 'metadata.json')
+        assert index.update([root], workers=workers)['unchanged'] == 2
+
+        with root.joinpath('ds1', 'cldf', 'languages.csv').open('a', encoding='utf8') as f:
+            f.write('l3,lang 3,,,,abcd1234,,z\n')
+        shutil.rmtree(root / 'ds2')
+        counts = index.update([root], workers=workers)
+        assert counts['updated'] == 1 and counts['removed'] == 1
+        assert index.query('SELECT count(*) FROM language') == [(3,)]
+
+        # Clones of the same dataset in different directories are indexed separately:
+        shutil.copytree(root / 'ds1', tmp_path / 'clones' / 'ds1')
+        assert index.update([root, tmp_path / 'clones'], workers=workers)['added'] == 1
+        assert index.query("SELECT count(*) FROM dataset WHERE id = 'ds1'") == [(2,)]
+        assert index.update([root, tmp_path / 'clones'], workers=workers)['unchanged'] == 2
+        assert index.query('SELECT count(*) FROM language') == [(6,)]
@@ -1,8 +1,12 @@
 import pytest
 
+import newick
 from commonnexus import Nexus
 
-from phlorest.nexuslib import NexusFile, rescale_to_years, Tree
+from phlorest.nexuslib import (
+    NexusFile, rescale_to_years, Tree, TreeCache, CharacterData, norm_taxon_name, Splits,
+    rf_distances, sampled_rf_distances, prune_trees, write_if_changed, LazyNexus,
+)
 
 
 def test_rescale_to_years():
@@ -34,6 +38,195 @@ def test_NexusFile(tmp_path, mocker):
     assert len(res.TREES.trees) == 1
 
 
+@pytest.mark.parametrize('zipped', [True, False])
+def test_NexusFile_deterministic(tmp_path, mocker, zipped):
+    def write():
+        with NexusFile(tmp_path / 'test.nex', zipped=zipped, index=True) as nex:
+            nex.append('(A:1,B:2)root:3;', 'a', {'A', 'B'}, 'years', mocker.Mock())
+        return tmp_path / ('test.nex.zip' if zipped else 'test.nex')
+
+    p = write()
+    content = p.read_bytes()
+    p.touch()
+    mtime = p.stat().st_mtime_ns
+    assert write().read_bytes() == content
+    assert p.stat().st_mtime_ns == mtime
+    assert sorted(f.name for f in tmp_path.iterdir()) == \
+        (['test.nex.zip'] if zipped else ['test.nex', 'test.nex.idx'])
+
+
+def test_write_if_changed(tmp_path):
+    p = tmp_path / 'test.txt'
+    with write_if_changed(p) as f:
+        f.write(b'abc')
+    assert p.read_bytes() == b'abc'
+    inode = p.stat().st_ino
+    with write_if_changed(p) as f:
+        f.write(b'abc')
+    assert p.stat().st_ino == inode
+    with write_if_changed(p) as f:
+        f.write(b'abd')
+    assert p.read_bytes() == b'abd'
+
+    with pytest.raises(ValueError):
+        with write_if_changed(p) as f:
+            f.write(b'xyz')
+            raise ValueError()
+    assert p.read_bytes() == b'abd'
+    assert [f.name for f in tmp_path.iterdir()] == ['test.txt']
+
+
 def test_Tree():
     t = Tree('n', '(A:1,B:2)root:3;', None)
     assert str(t) == '(A:1,B:2)root:3;'
+
+
+def test_NexusFile_cache(tmp_path, mocker):
+    log = mocker.Mock()
+    with NexusFile(tmp_path / 'test.nex', cache=TreeCache(maxsize=2)) as nex:
+        for i in range(5):
+            nex.append('(A-x:1,B:2)root:3;', f't{i}', {'A_x', 'C'}, 'years', log)
+        nex.append('(A-x:2,B:2)root:3;', 't6', {'A_x', 'C'}, 'years', log)
+    assert nex.cache.hits == 9 and len(nex.cache) == 2
+    assert nex.cache.counts['tree', 'hits'] == 4 and nex.cache.counts['tree', 'misses'] == 2
+    assert nex.cache.counts['validation', 'hits'] == 5
+    assert str(nex.cache) == 'cache tree hits=4 misses=2; validation hits=5 misses=1'
+    assert log.error.call_count == 6 and log.warning.call_count == 6
+    res = Nexus.from_file(tmp_path / 'test.nex')
+    assert len(res.TREES.trees) == 6
+    assert res.TREES.trees[0].newick_string == '(A_x:1,B:2)root:3;'
+
+
+def test_NexusFile_translate(tmp_path, mocker):
+    with NexusFile(tmp_path / 'test.nex', translate=True) as nex:
+        nex.append('(A-x:1,B:2)root:3;', 't1', {'A_x', 'B'}, 'years', mocker.Mock())
+        nex.append(Tree('n', '(B:1,(C,A-x));'), 't2', None, 'years', mocker.Mock())
+        node = newick.loads('(C:1,B:2);')[0]
+        nex.append(node, 't3', None, 'years', mocker.Mock())
+        assert node.newick == '(C:1,B:2)'
+        with pytest.raises(ValueError):
+            nex.translate = False
+    res = Nexus.from_file(tmp_path / 'test.nex')
+    assert res.TREES.TRANSLATE.mapping == {'1': 'A_x', '2': 'B', '3': 'C'}
+    assert res.TREES.trees[1].newick_string == '(2:1,(3,1));'
+    assert res.TREES.translate(res.TREES.trees[0]).newick == '(A_x:1,B:2)root:3'
+
+
+@pytest.mark.parametrize(
+    'matrix',
+    [
+        """\
+BEGIN DATA;
+DIMENSIONS NTAX=3 NCHAR=1;
+FORMAT DATATYPE=STANDARD MISSING=? GAP=- SYMBOLS="ABC";
+MATRIX
+Jeju A
+South-Jeolla B
+NorthJeolla (AC)
+;
+END;""",
+        """\
+BEGIN TAXA; DIMENSIONS NTAX=3; TAXLABELS a 'b c' d; END;
+BEGIN CHARACTERS;
+DIMENSIONS NCHAR=3;
+FORMAT DATATYPE=STANDARD RESPECTCASE MISSING=? GAP=- SYMBOLS="aB01";
+CHARSTATELABELS 1 x/one two, 2 'y z', 3 w;
+MATRIX
+a a{01}-
+'b c' B?(01)
+d 000
+;
+END;""",
+    ]
+)
+def test_CharacterData(tmp_path, matrix):
+    from commonnexus.tools.normalise import normalise
+
+    nex = Nexus('#NEXUS\n' + matrix)
+    normalise(nex, rename_taxa=norm_taxon_name).to_file(tmp_path / 'expected.nex')
+    data = CharacterData.from_nexus(Nexus('#NEXUS\n' + matrix))
+    data.write(tmp_path / 'data.nex', rename_taxa=norm_taxon_name)
+    assert (tmp_path / 'data.nex').read_bytes() == (tmp_path / 'expected.nex').read_bytes()
+
+
+@pytest.mark.parametrize('fname', ['data.nex', 'beast.xml', 'beast2.xml.gz'])
+def test_CharacterData_fixtures(repos, tmp_path, fname):
+    # Make sure the output does not drift from the normalised format of commonnexus.
+    from commonnexus.tools.normalise import normalise
+    from phlorest.dataset import PhlorestDir
+    from phlorest.beast import BeastFile
+
+    raw = PhlorestDir(repos / 'raw')
+    if fname.endswith('.nex'):
+        data = CharacterData.from_nexus(raw.read_nexus(fname))
+        nex = raw.read_nexus(fname)
+    else:
+        bf = BeastFile(None, text=raw.read(fname))
+        data, nex = bf.character_data(), bf.nexus()
+    data.write(tmp_path / 'data.nex')
+    normalise(nex).to_file(tmp_path / 'expected.nex')
+    assert (tmp_path / 'data.nex').read_bytes() == (tmp_path / 'expected.nex').read_bytes()
+
+
+def test_CharacterData_compact(tmp_path):
+    data = CharacterData(rows=[('a', '01?'), ('b', '1-0')], charlabels={1: '1', 2: '2', 3: 'c'})
+    assert data.matrix()['a']['c'] is None
+    data = CharacterData(rows=iter([('a', '01?'), ('b', '1-0')]), charlabels=data.charlabels)
+    assert data.write(tmp_path / 'data.nex', taxa={'a', 'b'}) == ['a', 'b']
+    nex = Nexus.from_file(tmp_path / 'data.nex')
+    assert nex.characters.get_matrix()['b']['2'] is not None
+    assert 'CHARSTATELABELS' in (tmp_path / 'data.nex').read_text(encoding='utf8')
+    assert CharacterData.from_nexus(Nexus('#NEXUS\nBEGIN TREES; TREE 1 = (a,b); END;')) is None
+
+
+def test_Splits():
+    taxa = {t: i for i, t in enumerate('ABCDE')}
+    s1 = Splits.from_tree('((A:1,B:1):1,(C:1,(D:1,E:1):1):1);', taxa)
+    s2 = Splits.from_tree(Tree('t', '((A:1,C:1):1,(B:1,(D:1,E:1):1):1);'), taxa)
+    assert s1.rf(s1) == 0 and s1.rf(s2) == 2 and s1.weighted_rf(s2) == 4
+    assert Splits.from_tree('(A,B,C,D,E);', taxa).nontrivial == frozenset()
+    with pytest.raises(ValueError):
+        Splits.from_tree('(A,X);', taxa)
+
+
+@pytest.mark.parametrize('processes', [None, 2])
+def test_rf_distances(processes):
+    taxa = {t: i for i, t in enumerate('ABCDE')}
+    trees = ['((A,B),(C,(D,E)));', '((A,C),(B,(D,E)));', '(A,B,C,D,E);']
+    assert list(rf_distances(trees[0], trees, taxa, processes=processes, chunksize=2)) == \
+        [(0, 0), (2, 0), (2, 0)]
+    res = sampled_rf_distances(trees, taxa, n=5)
+    assert len(res) == 5 and all(i < j for i, j, _, _ in res)
+    assert sampled_rf_distances(trees[:1], taxa) == []
+    assert sampled_rf_distances(iter(trees), taxa, n=5, ntrees=3) == res
+    tokens = {str(i + 1): i for i in range(5)}
+    assert list(rf_distances(trees[0], ['((1,3),(2,(4,5)));'], taxa, tree_taxa=tokens)) == \
+        [(2, 0)]
+
+
+def test_prune_trees():
+    import newick
+
+    trees = [
+        Tree('t', '((A:1,B:1):1,C:2);'),
+        '((A:1,B:1):1,C:2);',
+        newick.loads('((A:1,B:1):1,C:2);')[0]]
+    res = list(prune_trees(trees, {'A', 'C'}))
+    assert res[0].name == 't' and res[0].newick == res[1] == '(A:2.0,C:2);'
+    assert res[2].newick == '(A:2.0,C:2)'
+
+
+def test_LazyNexus():
+    text = """#NEXUS
+begin taxa; dimensions ntax=2; taxlabels a b; end;
+begin data; dimensions nchar=2; format datatype=standard symbols="01"; matrix a 01 b 10; end;
+begin trees; tree 1 = (a,b); end;"""
+    nex = LazyNexus(text, blocks=['TAXA', 'trees'])
+    assert len(nex) == 0
+    assert nex.TREES.trees[0].name == '1'
+    assert nex.DATA is None
+    assert nex.taxa == ['a', 'b'] and len(nex) == 7
+    assert 'data' not in str(nex)
+    nex = LazyNexus(text)
+    assert nex.characters.get_matrix()['b']['1'] == '1'
+    assert len(nex.blocks) == 3
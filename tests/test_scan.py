@@ -0,0 +1,29 @@
+from phlorest.scan import iter_commands, iter_blocks, select_blocks, scan_trees, select_trees
+
+NEXUS = """#NEXUS
+[a comment; with semicolon]
+BEGIN TREES;
+    TRANSLATE 1 'a;b', 2 c;
+    TREE STATE_0 = [&R] (1[&x=1;],2);
+    tree * 'the ''tree''' = (1,2);
+END;"""
+
+
+def test_iter_commands():
+    assert [name for name, _, _ in iter_commands(NEXUS)] == \
+        ['BEGIN', 'TRANSLATE', 'TREE', 'TREE', 'END']
+
+
+def test_scan_trees():
+    trees = scan_trees(NEXUS)
+    assert [t.name for t in trees] == ['STATE_0', "the 'tree'"]
+    assert trees[0].state == 0 and trees[1].state is None
+    assert NEXUS[trees[0].start:trees[0].end].strip().endswith('2);')
+    assert 'STATE_0' not in select_trees(NEXUS, trees, {1})
+
+
+def test_iter_blocks():
+    text = "#NEXUS\nBEGIN DATA; MATRIX a 'x;y' b [;] 10; END;\n" + NEXUS[7:]
+    assert [name for name, _, _ in iter_blocks(text)] == ['DATA', 'TREES']
+    res = select_blocks(text, ['trees'])
+    assert 'DATA' not in res and res.startswith('#NEXUS\nBEGIN TREES;')
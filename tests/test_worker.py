@@ -0,0 +1,43 @@
+import shutil
+import pathlib
+import threading
+
+import pytest
+
+from phlorest.worker import Worker, request
+from phlorest.dataset import PhlorestDir
+
+
+@pytest.fixture
+def worker(tmp_path):
+    sock = tmp_path / 'w.sock'
+    with Worker(sock, pathlib.Path(__file__).parent / 'glottolog') as w:
+        t = threading.Thread(target=w.serve)
+        t.start()
+        yield sock
+        request('stop', socket_path=sock)
+        t.join()
+    assert not sock.exists()
+    PhlorestDir.memo = None
+
+
+def test_Worker(worker, repos, tmp_path):
+    shutil.copytree(repos, tmp_path / 'phy')
+    assert request('ping', socket_path=worker)['success']
+    assert not request('unknown', socket_path=worker)['success']
+    for _ in range(2):
+        res = request('build', tmp_path / 'phy', socket_path=worker)
+        assert res['success'] and res['dataset'] == 'phy', res
+        assert 'added taxa' in res['output']
+    assert len(PhlorestDir.memo) == 1
+
+    res = request('check', tmp_path / 'phy', socket_path=worker)
+    assert res['dataset'] == 'phy'
+
+    res = request('build', tmp_path, socket_path=worker)
+    assert not res['success'] and 'No cldfbench module' in res['error']
+
+
+def test_Worker_running(worker):
+    with pytest.raises(ValueError):
+        Worker(worker)